@@ -1,52 +1,189 @@
-from flask import Blueprint, request, jsonify, send_file
+import hashlib
+import json
+
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context, url_for
 
 from io import BytesIO
-import base64
-from services import BookService
+from typing import Any, Dict, Iterable
+from models import BookBase
+from services import (BookService, ChangeFeedService, ExportJobService, ExportOptions, FacetService, ImageService, ImageUploadError,
+                      ImageDimensionsError, ImageTooLargeError, InvalidCursorError, Pagination, ReadCache, SearchService,
+                      StatsService)
 
 # Создаем Blueprint для API
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Запас на заголовки multipart/form-data при проверке размера загрузки
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Срок кеширования обложки по адресу с версией (?v=image_hash), в секундах
+IMAGE_VERSIONED_MAX_AGE = 365 * 24 * 60 * 60
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# Число строк NDJSON в одном фрагменте потокового ответа
+NDJSON_CHUNK_LINES = 100
+
+def _wants_stream() -> bool:
+    """Запрошен ли потоковый ответ NDJSON (stream=1 или Accept: application/x-ndjson)."""
+    if request.args.get('stream') == '1':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def _ndjson_response(records: Iterable[Dict[str, Any]]) -> Response:
+    """Потоковый ответ NDJSON: одна запись в строке, фрагментами по NDJSON_CHUNK_LINES строк."""
+    def generate():
+        lines = []
+        for record in records:
+            lines.append(current_app.json.dumps(record))
+            if len(lines) >= NDJSON_CHUNK_LINES:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
 @api_bp.route('/books', methods=['GET'])
 def get_books():
-    """Получение списка всех книг (без данных изображений)"""
-    books = BookService.get_all_books()
-    return jsonify([book.to_dict(include_image=False) for book in books])
+    """Получение списка книг (без данных изображений)
+
+    Без limit и cursor, как и раньше, возвращается массив всех книг.
+    Страницы: limit — размер страницы, cursor — значение next_cursor
+    предыдущей страницы, with_total=1 — добавить общее число книг.
+    fields — поля книг через запятую (по умолчанию все).
+
+    С stream=1 или Accept: application/x-ndjson все книги отдаются
+    потоком NDJSON (книга в строке) без страниц.
+    """
+    try:
+        fields = BookBase.parse_fields(request.args.get('fields')) or tuple(BookBase.DICT_FIELDS)
+        if _wants_stream():
+            return _ndjson_response(BookBase.serialize(row, fields) for row in BookService.stream_books(fields=fields))
+        if 'limit' not in request.args and 'cursor' not in request.args:
+            return jsonify([BookBase.serialize(row, fields) for row in BookService.stream_books(fields=fields)])
+
+        limit = Pagination.parse_limit(request.args.get('limit'))
+        page = BookService.get_books_page(limit, request.args.get('cursor'),
+                                          with_total=request.args.get('with_total') == '1', fields=fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    result = {
+        'items': [BookBase.serialize(row, fields) for row in page['books']],
+        'next_cursor': page['next_cursor'],
+    }
+    if 'total' in page:
+        result['total'] = page['total']
+    return jsonify(result)
 
 @api_bp.route('/books/<int:book_id>', methods=['GET'])
 def get_book(book_id: int):
-    """Получение конкретной книги по ID"""
-    book = BookService.get_book_with_image(book_id)
-    if book:
-        return jsonify(book.to_dict(include_image=True))
-    return jsonify({'error': 'Book not found'}), 404
+    """Получение конкретной книги по ID
+
+    Обложка передается ссылкой image_src на /books/<id>/image с версией
+    (хешем изображения), которую браузер кеширует; обложка без
+    сохраненного хеша — ссылкой без версии. С include_image=1
+    изображение дополнительно встраивается в поле image_data_base64.
+    """
+    include_image = request.args.get('include_image') == '1'
+    book = BookService.get_book_with_image(book_id) if include_image else BookService.get_book(book_id)
+    if not book:
+        return jsonify({'error': 'Book not found'}), 404
+
+    result = book.to_dict(include_image=include_image, include_characteristics=True)
+    if book.image_hash:
+        result['image_src'] = url_for('api.get_book_image', book_id=book.id, v=book.image_hash)
+    elif BookService.has_image(book.id):
+        result['image_src'] = url_for('api.get_book_image', book_id=book.id)
+    else:
+        result['image_src'] = None
+    return jsonify(result)
 
 @api_bp.route('/books/<int:book_id>/image', methods=['GET'])
 def get_book_image(book_id: int):
-    """Получение изображения книги как файл"""
-    image_data = BookService.get_book_image_data(book_id)
-    if image_data:
-        book = BookService.get_book(book_id)
-        return send_file(
-            BytesIO(image_data),
-            mimetype=f"image/{book.image_type}" if book and book.image_type else 'image/jpeg',
-            as_attachment=False
-        )
-    return jsonify({'error': 'Image not found'}), 404
-
-@api_bp.route('/books/<int:book_id>/image', methods=['POST'])
+    """Получение изображения книги как файл
+
+    Если у обложки есть компактная копия (WebP/AVIF), она отдается клиентам,
+    явно поддерживающим этот формат в заголовке Accept.
+
+    ETag строится по хешу изображения: на запрос с совпадающим
+    If-None-Match отвечаем 304 без чтения изображения из БД. Адрес с
+    версией v=image_hash (image_src в данных книги) кешируется браузером
+    без повторной проверки. Для обложки без сохраненного хеша ETag
+    считается по прочитанным данным.
+    """
+    book = BookService.get_book(book_id)
+    if not book:
+        return jsonify({'error': 'Image not found'}), 404
+
+    etag = None
+    if book.image_hash:
+        compact = ImageService.accepts_compact(book, request.accept_mimetypes)
+        etag = f"{book.image_hash}-{book.image_compact_type if compact else book.image_type}"
+
+    if etag and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        image_data, image_type = ImageService.select_rendition(book, request.accept_mimetypes)
+        if not image_data:
+            return jsonify({'error': 'Image not found'}), 404
+        if etag is None:
+            etag = f"{hashlib.sha256(image_data).hexdigest()}-{image_type}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = send_file(
+                BytesIO(image_data),
+                mimetype=f"image/{image_type}" if image_type else 'image/jpeg',
+                as_attachment=False
+            )
+
+    response.set_etag(etag)
+    if book.image_hash and request.args.get('v') == book.image_hash:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMAGE_VERSIONED_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    if book.image_compact_type:
+        response.vary.add('Accept')
+    return response
+
+@api_bp.route('/books/<int:book_id>/image', methods=['POST', 'PUT'])
 def set_book_image(book_id: int):
-    """Установка изображения для книги"""
+    """Установка изображения для книги
+
+    Поддерживаются три варианта загрузки:
+    - тело запроса с Content-Type image/* или application/octet-stream (потоковая загрузка);
+    - multipart/form-data с файлом в поле image;
+    - JSON с image_data_base64 или image_url.
+    """
+    max_size = ImageService.get_max_size()
+
     try:
-        if 'image' in request.files:
-            # Загрузка файла
-            image_file = request.files['image']
-            image_data = image_file.read()
-            image_type = image_file.content_type
+        if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+            # Потоковая загрузка тела запроса
+            if request.content_length and request.content_length > max_size:
+                return jsonify({'error': f'Image exceeds maximum size of {max_size} bytes'}), 413
 
-            success = BookService.update_book_image(book_id, image_data, None, image_type)
+            chunks = ImageService.iter_stream(request.stream)
+            success = ImageService.save_image_stream(book_id, chunks, request.args.get('image_url'), max_size)
             if success:
                 return jsonify({'message': 'Image updated successfully'}), 200
+            return jsonify({'error': 'Book not found'}), 404
+
+        if request.mimetype == 'multipart/form-data':
+            # Отсекаем заведомо большие запросы до разбора формы
+            if request.content_length and request.content_length > max_size + MULTIPART_OVERHEAD:
+                return jsonify({'error': f'Image exceeds maximum size of {max_size} bytes'}), 413
+
+            if 'image' in request.files:
+                # Загрузка файла
+                chunks = ImageService.iter_stream(request.files['image'].stream)
+                success = ImageService.save_image_stream(book_id, chunks, None, max_size)
+                if success:
+                    return jsonify({'message': 'Image updated successfully'}), 200
+                return jsonify({'error': 'Book not found'}), 404
 
         elif request.is_json:
             # Загрузка через JSON (base64 или URL)
@@ -54,12 +191,15 @@ def set_book_image(book_id: int):
 
             if data.get('image_data_base64'):
                 # Base64 encoded image
-                image_data = base64.b64decode(data['image_data_base64'])
-                image_type = data.get('image_type', 'image/jpeg')
+                image_data_base64 = data['image_data_base64']
+                if ImageService.estimate_base64_size(image_data_base64) > max_size:
+                    return jsonify({'error': f'Image exceeds maximum size of {max_size} bytes'}), 413
 
-                success = BookService.update_book_image(book_id, image_data, data.get('image_url'), image_type)
+                chunks = ImageService.iter_base64(image_data_base64)
+                success = ImageService.save_image_stream(book_id, chunks, data.get('image_url'), max_size)
                 if success:
                     return jsonify({'message': 'Image updated successfully'}), 200
+                return jsonify({'error': 'Book not found'}), 404
 
             elif data.get('image_url'):
                 # Скачивание по URL
@@ -71,6 +211,12 @@ def set_book_image(book_id: int):
 
         return jsonify({'error': 'No image data provided'}), 400
 
+    except ImageTooLargeError as e:
+        return jsonify({'error': str(e)}), 413
+    except ImageDimensionsError as e:
+        return jsonify({'error': str(e)}), 400
+    except ImageUploadError as e:
+        return jsonify({'error': str(e)}), 415
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -88,66 +234,139 @@ def check_book_exists(url: str):
     exists = BookService.book_exists(url)
     return jsonify({'exists': exists, 'url': url})
 
+@api_bp.route('/books/changes', methods=['GET'])
+def get_book_changes():
+    """Лента изменений книг для инкрементальной синхронизации
+
+    Параметры: since — значение next_cursor предыдущего ответа (без него
+    лента начинается с начала каталога), limit. Изменения упорядочены по
+    фиксации записи: op=upsert — книга добавлена или изменена, op=delete — удалена.
+    """
+    try:
+        limit = int(request.args.get('limit', ChangeFeedService.DEFAULT_LIMIT))
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+
+    try:
+        return jsonify(ChangeFeedService.get_changes(request.args.get('since'), limit))
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Метрики кеша чтения: попадания, промахи и их доля по видам чтения"""
+    return jsonify(ReadCache.get_stats())
+
+@api_bp.route('/books/facets', methods=['GET'])
+def get_book_facets():
+    """Значения фильтров списка книг с числом книг
+
+    Параметры: subject, class, program, series и q — выбранные фильтры.
+    Число книг в каждом фасете учитывает остальные выбранные фильтры,
+    total — число книг под всеми фильтрами.
+    """
+    try:
+        selected = FacetService.parse_selected(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'facets': FacetService.get_facets(selected), 'total': FacetService.count(selected)})
+
 @api_bp.route('/books/search', methods=['GET'])
 def search_books():
-    """Поиск книг по URL и характеристикам"""
-    query = request.args.get('q', '')
-    search_in_chars = request.args.get('search_chars', 'true').lower() == 'true'
+    """Полнотекстовый поиск книг
 
-    if not query:
+    Параметры: q — строка поиска (слова ищутся с учетом окончаний и как
+    префиксы), limit, cursor — значение next_cursor предыдущей страницы,
+    with_total=1 — добавить число найденных книг, fields — поля книг через
+    запятую (по умолчанию все). Книги упорядочены по
+    релевантности, snippet содержит фрагмент текста с совпадениями в <mark>.
+
+    С stream=1 или Accept: application/x-ndjson все результаты отдаются
+    потоком NDJSON (книга в строке) без страниц.
+    """
+    query = request.args.get('q', '')
+    if not query.strip():
         return jsonify({'error': 'Query parameter "q" is required'}), 400
 
-    books = BookService.search_books(query, search_in_chars)
-    return jsonify([book.to_dict() for book in books])
+    try:
+        limit = min(Pagination.parse_limit(request.args.get('limit') or str(SearchService.DEFAULT_LIMIT)),
+                    SearchService.MAX_LIMIT)
+        fields = BookBase.parse_fields(request.args.get('fields'))
+        if _wants_stream():
+            return _ndjson_response(
+                {**BookBase.serialize(item['book'], fields), 'rank': item['rank'], 'snippet': item['snippet']}
+                for item in SearchService.stream(query, fields)
+            )
+        page = SearchService.search(query, limit, request.args.get('cursor'), fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    result = {
+        'items': [
+            {**item['book'].to_dict(fields=fields), 'rank': item['rank'], 'snippet': item['snippet']}
+            for item in page['results']
+        ],
+        'next_cursor': page['next_cursor'],
+    }
+    if request.args.get('with_total') == '1':
+        result['total'] = BookService.count_books(BookService.build_filters_query({'q': query}))
+    return jsonify(result)
 
 @api_bp.route('/books/characteristics/<key>', methods=['GET'])
 def get_books_by_characteristic(key: str):
-    """Получение книг по конкретной характеристике"""
+    """Получение книг по конкретной характеристике (fields — поля книг через запятую)
+
+    С stream=1 или Accept: application/x-ndjson книги отдаются потоком
+    NDJSON (книга в строке).
+    """
     value = request.args.get('value')
     if not value:
         return jsonify({'error': 'Value parameter is required'}), 400
 
-    books = BookService.get_books_by_characteristic(key, value)
-    return jsonify([book.to_dict() for book in books])
+    try:
+        fields = BookBase.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if _wants_stream():
+        books = BookService.stream_books(BookService.build_characteristic_query(key, value), fields)
+        return _ndjson_response(BookBase.serialize(book, fields) for book in books)
+
+    books = BookService.get_books_by_characteristic(key, value, fields)
+    return jsonify([book.to_dict(fields=fields) for book in books])
 
 @api_bp.route('/books/characteristics/<key>/values', methods=['GET'])
 def get_characteristic_values(key: str):
-    """Получение уникальных значений для конкретной характеристики"""
-    values = BookService.get_unique_characteristic_values(key)
+    """Получение уникальных значений для конкретной характеристики
+
+    С параметром with_counts=1 вместе со значением возвращается число книг.
+    """
+    if request.args.get('with_counts') == '1':
+        values = [{'value': value, 'count': count}
+                  for value, count in BookService.get_unique_characteristic_values(key, with_counts=True)]
+    else:
+        values = BookService.get_unique_characteristic_values(key)
     return jsonify({'characteristic': key, 'values': values})
 
 @api_bp.route('/books/stats', methods=['GET'])
 def get_stats():
-    """Получение статистики по книгам"""
-    books = BookService.get_all_books()
-
-    # Собираем статистику по характеристикам
-    characteristics_stats = {}
-    for book in books:
-        if book.characteristics:
-            for key, value in book.characteristics.items():
-                if key not in characteristics_stats:
-                    characteristics_stats[key] = {
-                        'count': 0,
-                        'unique_values': set(),
-                        'type': type(value).__name__
-                    }
-                characteristics_stats[key]['count'] += 1
-                characteristics_stats[key]['unique_values'].add(str(value))
-
-    # Преобразуем sets в lists для JSON
-    for key in characteristics_stats:
-        characteristics_stats[key]['unique_values'] = list(characteristics_stats[key]['unique_values'])
-        characteristics_stats[key]['unique_count'] = len(characteristics_stats[key]['unique_values'])
-
-    stats = {
-        'total_books': len(books),
-        'books_with_characteristics': len([b for b in books if b.characteristics]),
-        'total_characteristics_keys': len(characteristics_stats),
-        'characteristics_stats': characteristics_stats
-    }
+    """Получение статистики по книгам
+
+    Для предмета, программы, издательства и класса: число книг со
+    значением и без него, число различных значений и top самых частых
+    значений (параметр top, по умолчанию 10).
+    """
+    try:
+        top = int(request.args.get('top', StatsService.DEFAULT_TOP))
+    except ValueError:
+        return jsonify({'error': 'top must be an integer'}), 400
+    if top < 1:
+        return jsonify({'error': 'top must be positive'}), 400
 
-    return jsonify(stats)
+    return jsonify(StatsService.get_stats(top))
 
 
 @api_bp.route('/books/<int:book_id>', methods=['PUT'])
@@ -177,4 +396,48 @@ def update_book(book_id: int):
         return jsonify({'success': True, 'message': 'Book updated successfully'})
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
\ No newline at end of file
+        return jsonify({'error': str(e)}), 400
+
+
+@api_bp.route('/exports', methods=['POST'])
+def create_export():
+    """Запуск фонового экспорта
+
+    Параметры (JSON или query string) те же, что у /export-books:
+    format, images, since и фильтры книг.
+    """
+    try:
+        options = ExportOptions.from_args(request.get_json(silent=True) or request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    job = ExportJobService.create_job(options)
+    ExportJobService.submit(job)
+
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = url_for('api.get_export', job_id=job.id)
+    return response
+
+@api_bp.route('/exports/<int:job_id>', methods=['GET'])
+def get_export(job_id: int):
+    """Состояние фонового экспорта: прогресс, байты, оценка времени"""
+    job = ExportJobService.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    return jsonify(job.to_dict())
+
+@api_bp.route('/exports/<int:job_id>/download', methods=['GET'])
+def download_export(job_id: int):
+    """Скачивание результата фонового экспорта"""
+    job = ExportJobService.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    if job.status == 'expired':
+        return jsonify({'error': 'Export file has expired'}), 410
+    if job.status != 'completed':
+        return jsonify({'error': f'Export job is {job.status}'}), 409
+
+    options = ExportOptions.from_dict(json.loads(job.params))
+    return send_file(job.file_path, mimetype=options.mimetype, as_attachment=True,
+                     download_name=f'books_export_{job.id}.{options.extension}', conditional=True)
@@ -1,16 +1,19 @@
 import json
+import os
+import shutil
+import tempfile
 from datetime import datetime
 
-from flask import Flask, render_template, request, redirect, url_for, jsonify, send_file
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, send_file, stream_with_context
 from flask_bootstrap import Bootstrap5
 from flask_migrate import Migrate
 
-from models import BookCharacteristick, db
+from models import BookBase, BookCharacteristick, db
 from scraper import Scraper
 from dotenv import load_dotenv
 
 from api import api_bp
-from services import BookService, ExportService
+from services import BookService, ExportCache, ExportOptions, ExportService, FacetService, ImageService, ImportService, OrjsonProvider, ResponseCompressor
 
 load_dotenv()
 
@@ -19,33 +22,96 @@ app = Flask(__name__)
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///books.db"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Максимальный размер загружаемой обложки в байтах
+app.config['IMAGE_MAX_SIZE'] = int(os.getenv('IMAGE_MAX_SIZE', str(10 * 1024 * 1024)))
+# Перекодирование обложек в компактный формат: webp, avif или пусто (отключено)
+app.config['IMAGE_TRANSCODE_FORMAT'] = os.getenv('IMAGE_TRANSCODE_FORMAT', '')
+app.config['IMAGE_TRANSCODE_QUALITY'] = int(os.getenv('IMAGE_TRANSCODE_QUALITY', '80'))
+# Хранить ли оригинал обложки рядом с компактной копией
+app.config['IMAGE_KEEP_ORIGINAL'] = os.getenv('IMAGE_KEEP_ORIGINAL', 'true').lower() == 'true'
+
+# Количество книг в одном INSERT ... ON CONFLICT при пакетной записи
+app.config['BOOK_UPSERT_CHUNK_SIZE'] = int(os.getenv('BOOK_UPSERT_CHUNK_SIZE', '500'))
+# Кеш чтения каталога: число записей в памяти процесса (0 — отключен), время жизни записи в секундах
+# и адрес Redis для общего кеша нескольких процессов (пусто — только память процесса)
+app.config['READ_CACHE_MAX_ENTRIES'] = int(os.getenv('READ_CACHE_MAX_ENTRIES', '1024'))
+app.config['READ_CACHE_TTL'] = int(os.getenv('READ_CACHE_TTL', '300'))
+app.config['READ_CACHE_REDIS_URL'] = os.getenv('READ_CACHE_REDIS_URL', '')
+
+# Сериализатор JSON ответов: orjson (если установлен) или json (стандартный)
+app.config['JSON_SERIALIZER'] = os.getenv('JSON_SERIALIZER', 'orjson')
+if app.config['JSON_SERIALIZER'] == 'orjson' and OrjsonProvider.is_available():
+    app.json = OrjsonProvider(app)
+
+# Сжатие текстовых ответов (HTML, JSON, CSV): алгоритмы по убыванию предпочтения
+# (br требует пакет brotli, пусто — без сжатия), минимальный размер ответа в байтах и уровни сжатия
+app.config['COMPRESS_ENCODINGS'] = os.getenv('COMPRESS_ENCODINGS', 'br,gzip')
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+
+# Число книг на странице таблицы главной страницы (остальные подгружаются при прокрутке)
+app.config['INDEX_PAGE_SIZE'] = int(os.getenv('INDEX_PAGE_SIZE', '50'))
+# Поля книг в строках таблицы главной страницы
+INDEX_ROW_FIELDS = ('url', 'name', 'authors', 'series', 'class_from', 'class_to', 'subject', 'program',
+                    'image_url', 'image_hash')
+
+# Количество книг, читаемых из БД за один запрос при экспорте
+app.config['EXPORT_BATCH_SIZE'] = int(os.getenv('EXPORT_BATCH_SIZE', '200'))
+# Кеш готовых архивов экспорта: каталог (по умолчанию instance/export_cache) и лимит размера (0 — отключен)
+app.config['EXPORT_CACHE_DIR'] = os.getenv('EXPORT_CACHE_DIR', '')
+app.config['EXPORT_CACHE_MAX_SIZE'] = int(os.getenv('EXPORT_CACHE_MAX_SIZE', str(1024 * 1024 * 1024)))
+# Фоновые задачи экспорта: каталог файлов (по умолчанию instance/export_jobs), число потоков,
+# время хранения готового файла и время без сигнала жизни, после которого задача считается прерванной, в секундах
+app.config['EXPORT_JOB_DIR'] = os.getenv('EXPORT_JOB_DIR', '')
+app.config['EXPORT_JOB_WORKERS'] = int(os.getenv('EXPORT_JOB_WORKERS', '2'))
+app.config['EXPORT_JOB_RETENTION'] = int(os.getenv('EXPORT_JOB_RETENTION', str(24 * 60 * 60)))
+app.config['EXPORT_JOB_HEARTBEAT_TIMEOUT'] = int(os.getenv('EXPORT_JOB_HEARTBEAT_TIMEOUT', '300'))
+# Максимальный размер одной части при экспорте по частям, в байтах
+app.config['EXPORT_PART_MAX_SIZE'] = int(os.getenv('EXPORT_PART_MAX_SIZE', str(100 * 1024 * 1024)))
+
 db.init_app(app)
 
 migrate = Migrate(app, db)
 
 Bootstrap5(app)
 
+ResponseCompressor.init_app(app)
+
 # Регистрируем API blueprint
 app.register_blueprint(api_bp)
 
 @app.route('/')
 def index():
-    books = BookService.get_all_books()
-    filters = dict()
+    page = _load_index_page({})
+    filters = FacetService.get_facets()
 
-    subjects = list(set(book.subject for book in books if book.subject))
-    filters['subjects'] = subjects
+    return render_template('index.html', books=page['books'], next_cursor=page['next_cursor'],
+                           total=FacetService.count(), filters=filters)
 
-    classes = list(set(book.class_from for book in books if book.class_from))
-    filters['classes'] = classes
+@app.route('/books/rows')
+def book_rows():
+    """Строки таблицы главной страницы (HTML) для подгрузки при прокрутке и смене фильтров
 
-    program = list(set(book.program for book in books if book.program))
-    filters['program'] = program
+    Параметры: subject, class, program, series, q — фильтры, cursor —
+    значение заголовка X-Next-Cursor предыдущего ответа. В заголовке
+    X-Total-Count — число книг под фильтрами.
+    """
+    try:
+        selected = FacetService.parse_selected(request.args)
+        page = _load_index_page(selected, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    series = list(set(book.series for book in books if book.series))
-    filters['series'] = series
+    response = Response(render_template('book_rows.html', books=page['books']), mimetype='text/html')
+    response.headers['X-Next-Cursor'] = page['next_cursor'] or ''
+    response.headers['X-Total-Count'] = str(FacetService.count(selected))
+    return response
 
-    return render_template('index.html', books=books, filters=filters)
+def _load_index_page(selected, cursor=None):
+    """Страница таблицы главной страницы: только колонки, которые в ней показаны."""
+    query = FacetService.build_query(selected)
+    return BookService.get_books_page(app.config['INDEX_PAGE_SIZE'], cursor, query, fields=INDEX_ROW_FIELDS)
 
 @app.route('/scrape', methods=['POST'])
 def scrape():
@@ -112,39 +178,231 @@ def delete():
 
 @app.route('/export-books', methods=['GET'])
 def export_books():
-    """Экспорт всех книг в ZIP архив с CSV и изображениями"""
+    """Экспорт всех книг в ZIP архив с CSV и изображениями
+
+    Архив формируется и отдается потоково, по мере чтения книг из БД.
+    Параметр since (дата ISO 8601 или id предыдущего экспорта) включает
+    инкрементальный режим: выгружаются только измененные книги и список удаленных.
+    Фильтры subject, class, class_min, class_max, program, series, publisher
+    и q ограничивают выгрузку как на главной странице.
+    Параметр format выбирает формат: csv (ZIP с CSV и обложками, по умолчанию),
+    ndjson, parquet или arrow; images=embed включает обложки в выгрузку
+    вместо ссылки по хешу.
+    """
     try:
-        books = BookService.get_all_books()
-        if not books:
+        try:
+            options = ExportOptions.from_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        since = options.since
+        query = options.build_query()
+        if since is None and not BookService.has_books(query):
             return jsonify({'error': 'Нет книг для экспорта'}), 404
 
-        zip_buffer = ExportService.export_books_to_zip(books)
-
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'books_export_{timestamp}.zip'
+        mode = 'delta_' if since else ''
+        filename = f'books_export_{mode}{timestamp}.{options.extension}'
+
+        # Полный экспорт неизменившегося каталога отдаем из кеша
+        cache_key = None
+        if since is None and ExportCache.is_enabled():
+            version = BookService.get_dataset_version()
+            cache_key = ExportCache.make_key(version, filters=options.filters, format=options.format,
+                                             images=options.images)
+            cached = ExportCache.get(cache_key, options.extension)
+            if cached:
+                path, metadata = cached
+                response = send_file(path, mimetype=options.mimetype, as_attachment=True,
+                                     download_name=filename, conditional=True)
+                response.headers['X-Export-Id'] = str(metadata['export_id'])
+                response.headers['X-Export-Cache'] = 'hit'
+                return response
+
+        export = ExportService.start_export(since)
+        chunks = ExportService.stream_books(options.format, query, options.embed_images, export=export)
+        if cache_key:
+            chunks = ExportCache.store(cache_key, chunks, {'export_id': export.id},
+                                       is_valid=lambda: BookService.get_dataset_version() == version,
+                                       extension=options.extension)
+
+        # Отправляем выгрузку
+        return Response(
+            stream_with_context(chunks),
+            mimetype=options.mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-Export-Id': str(export.id),
+                'X-Export-Cache': 'miss' if cache_key else 'bypass',
+            }
+        )
 
-        # Отправляем ZIP архив
-        return send_file(
-            zip_buffer,
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/export-books/parts', methods=['GET'])
+def export_books_parts():
+    """Манифест экспорта, разбитого на части
+
+    Каждая часть — самостоятельный ZIP архив (свой CSV и обложки) размером
+    не больше max_size (по умолчанию EXPORT_PART_MAX_SIZE). Части привязаны
+    к версии данных: если каталог изменился, скачивание части вернет 409
+    и манифест нужно запросить заново. Фильтры — как у /export-books.
+    """
+    try:
+        try:
+            options, max_size = _parse_parts_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        version = BookService.get_dataset_version()
+        parts = ExportService.plan_parts(options.build_query(), max_size)
+        if not parts:
+            return jsonify({'error': 'Нет книг для экспорта'}), 404
+
+        args = request.args.to_dict()
+        args.pop('version', None)
+        for part in parts:
+            part['url'] = url_for('export_books_part', part_number=part['part'], version=version, **args)
+
+        return jsonify({
+            'version': version,
+            'max_size': max_size,
+            'parts_count': len(parts),
+            'books_count': sum(part['books_count'] for part in parts),
+            'parts': parts,
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/export-books/parts/<int:part_number>', methods=['GET'])
+def export_books_part(part_number):
+    """Скачивание одной части экспорта из манифеста /export-books/parts"""
+    try:
+        try:
+            options, max_size = _parse_parts_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        version = request.args.get('version')
+        if not version:
+            return jsonify({'error': 'Не указана версия данных (version)'}), 400
+
+        current_version = BookService.get_dataset_version()
+        if version != current_version:
+            return jsonify({'error': 'Данные изменились, запросите манифест заново',
+                            'version': current_version}), 409
+
+        query = options.build_query()
+        parts = ExportService.plan_parts(query, max_size)
+        if not 1 <= part_number <= len(parts):
+            return jsonify({'error': 'Part not found'}), 404
+
+        part = parts[part_number - 1]
+        filename = f'books_export_part{part_number:03d}_of_{len(parts):03d}.zip'
+
+        # Готовые части кешируются, что позволяет докачку (Range) при обрыве
+        cache_key = None
+        if ExportCache.is_enabled():
+            cache_key = ExportCache.make_key(version, filters=options.filters, max_size=max_size,
+                                             part=part_number)
+            cached = ExportCache.get(cache_key)
+            if cached:
+                path, _ = cached
+                response = send_file(path, mimetype='application/zip', as_attachment=True,
+                                     download_name=filename, conditional=True)
+                response.headers['X-Export-Cache'] = 'hit'
+                return response
+
+        chunks = ExportService.stream_books_zip(ExportService.build_part_query(query, part))
+        if cache_key:
+            chunks = ExportCache.store(cache_key, chunks, {'part': part},
+                                       is_valid=lambda: BookService.get_dataset_version() == version)
+
+        return Response(
+            stream_with_context(chunks),
             mimetype='application/zip',
-            as_attachment=True,
-            download_name=filename
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-Export-Cache': 'miss' if cache_key else 'bypass',
+            }
         )
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _parse_parts_args():
+    """Параметры экспорта по частям: фильтры и max_size.
+
+    Raises:
+        ValueError: некорректные параметры или неподдерживаемый режим.
+    """
+    options = ExportOptions.from_args(request.args)
+    if options.since is not None or options.format != 'csv':
+        raise ValueError('Разбиение на части доступно только для полного экспорта в csv')
+
+    max_size = request.args.get('max_size')
+    if max_size is None:
+        return options, ExportService.get_part_max_size()
+    if not max_size.isdigit() or int(max_size) <= 0:
+        raise ValueError(f'Некорректный max_size: {max_size}')
+    return options, int(max_size)
+
+@app.route('/import-books', methods=['POST'])
+def import_books():
+    """Импорт книг из ZIP архива экспорта или CSV
+
+    Файл передается в поле file (multipart/form-data) или телом запроса.
+    Книги обновляются по URL; в ответе — счетчики, скорость и ошибки по строкам.
+    """
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            source = upload.stream
+        else:
+            # Тело запроса сохраняем во временный файл: ZIP читается с конца
+            source = tempfile.SpooledTemporaryFile(max_size=ImageService.SPOOL_SIZE)
+            shutil.copyfileobj(request.stream, source, ImageService.CHUNK_SIZE)
+            source.seek(0)
+
+        with source:
+            try:
+                report = ImportService.import_file(source)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        return jsonify(report.to_dict())
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/export-book/<int:book_id>', methods=['GET'])
 def export_book(book_id):
-    """Экспорт одной книги в ZIP архив"""
+    """Экспорт одной книги в ZIP архив или в формате из параметра format"""
     try:
+        try:
+            options = ExportOptions.from_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         book = BookService.get_book_with_image(book_id)
         if not book:
             return jsonify({'error': 'Book not found'}), 404
 
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if options.format != 'csv':
+            query = BookBase.query.filter(BookBase.id == book_id)
+            return Response(
+                stream_with_context(ExportService.stream_books(options.format, query, options.embed_images)),
+                mimetype=options.mimetype,
+                headers={
+                    'Content-Disposition': f'attachment; filename=book_{book_id}_export_{timestamp}.{options.extension}'
+                }
+            )
+
         zip_buffer = ExportService.export_books_to_zip([book])
 
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'book_{book_id}_export_{timestamp}.zip'
 
         return send_file(
@@ -0,0 +1 @@
+"""Бенчмарки производительности. Запуск: python -m benchmarks.<имя>"""
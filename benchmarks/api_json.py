@@ -0,0 +1,67 @@
+"""Бенчмарк списка книг /api/books.
+
+Обходит весь каталог страницами через тестовый клиент Flask со
+стандартным json и с orjson, со всеми полями и с выборкой полей
+(fields=id,name,subject,class_from).
+
+    python -m benchmarks.api_json --count 10000 --limit 500 --repeat 3
+"""
+
+import argparse
+
+from flask.json.provider import DefaultJSONProvider
+
+from api import api_bp
+from benchmarks.common import create_app, seed_books, timer
+from services import OrjsonProvider
+
+SPARSE_FIELDS = 'id,name,subject,class_from'
+
+
+def walk(client, limit: int, fields: str = None) -> int:
+    """Обход каталога по страницам, возвращает число байт ответов."""
+    params = {'limit': limit}
+    if fields:
+        params['fields'] = fields
+    size = 0
+    cursor = None
+    while True:
+        response = client.get('/api/books', query_string={**params, 'cursor': cursor} if cursor else params)
+        size += len(response.data)
+        cursor = response.get_json()['next_cursor']
+        if not cursor:
+            return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.register_blueprint(api_bp)
+    with app.app_context():
+        seed_books(args.count)
+    print(f'Книг: {args.count}, размер страницы: {args.limit}')
+
+    providers = {'json': DefaultJSONProvider(app)}
+    if OrjsonProvider.is_available():
+        providers['orjson'] = OrjsonProvider(app)
+
+    client = app.test_client()
+    for name, provider in providers.items():
+        app.json = provider
+        for fields in (None, SPARSE_FIELDS):
+            # Прогрев
+            size = walk(client, args.limit, fields)
+            with timer() as elapsed:
+                for _ in range(args.repeat):
+                    walk(client, args.limit, fields)
+            print(f'  {name:<7} {fields or "все поля":<28} {elapsed() / args.repeat * 1000:9.1f} мс  '
+                  f'{size / 1024 / 1024:7.1f} МБ')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Общие утилиты бенчмарков: отдельное приложение с временной БД и генерация книг."""
+
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+
+from flask import Flask
+
+from models import BookBase, db
+
+SUBJECTS = ['Математика', 'Русский язык', 'Литература', 'Физика', 'Химия', 'Биология',
+            'История', 'География', 'Информатика', 'Английский язык', 'Обществознание']
+PROGRAMS = ['Начальное общее образование', 'Основное общее образование', 'Среднее общее образование']
+PUBLISHERS = ['Просвещение', 'Дрофа', 'Вентана-Граф', 'Бином']
+
+
+def create_app(db_path: str = None, **config) -> Flask:
+    """Приложение Flask с отдельной БД для бенчмарка."""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='books_bench_'), 'books.db')
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config)
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def make_book_row(index: int, image_size: int = 0, rng: random.Random = None) -> dict:
+    """Данные синтетической книги для вставки в таблицу books."""
+    rng = rng or random
+    subject = SUBJECTS[index % len(SUBJECTS)]
+    class_from = 1 + index % 11
+    row = {
+        'url': f'https://example.com/catalog/book/{index}',
+        'name': f'{subject}. {class_from} класс. Учебник. Часть {1 + index % 3}',
+        'authors': f'Автор {index % 97}, Соавтор {index % 89}',
+        'series': f'Линия УМК {subject} {index % 13}',
+        'class_from': class_from,
+        'class_to': class_from,
+        'subject': subject,
+        'program': PROGRAMS[index % len(PROGRAMS)],
+        'publisher': PUBLISHERS[index % len(PUBLISHERS)],
+        'description': f'Учебник по предмету «{subject}» для {class_from} класса. ' * 8,
+        'part': 1 + index % 3,
+        'type': 'Учебник',
+        'type_resourse': 'Электронная форма учебника',
+        'is_ovz': False,
+        'type_pay_resourse': 'Бесплатно',
+        'publication_language': 'Русский',
+        'image_name': f'cover_{index}',
+        'image_url': f'https://example.com/catalog/cover/{index}.jpeg' if image_size else None,
+        'image_type': 'jpeg' if image_size else None,
+        'image_data': b'\xff\xd8\xff\xe0' + rng.randbytes(image_size) if image_size else None,
+    }
+    return row
+
+
+def seed_books(count: int, image_size: int = 0, chunk_size: int = 1000, seed: int = 1) -> None:
+    """Заполнение таблицы books синтетическими книгами (в контексте приложения)."""
+    rng = random.Random(seed)
+    existing = db.session.query(BookBase).count()
+    for start in range(existing, existing + count, chunk_size):
+        stop = min(start + chunk_size, existing + count)
+        db.session.execute(BookBase.__table__.insert(),
+                           [make_book_row(index, image_size, rng) for index in range(start, stop)])
+    db.session.commit()
+
+
+@contextmanager
+def timer():
+    """Замер времени выполнения блока: with timer() as elapsed: ...; elapsed()"""
+    started = time.perf_counter()
+    finished = []
+    yield lambda: (finished[0] if finished else time.perf_counter()) - started
+    finished.append(time.perf_counter())
@@ -0,0 +1,67 @@
+"""Бенчмарк сжатия ответов: байты по сети для главной страницы и /api/books.
+
+Для каждого адреса сравнивает размер ответа без сжатия, с gzip и (если
+установлен пакет brotli) с brotli, а также время ответа.
+
+    python -m benchmarks.compression --count 10000
+"""
+
+import argparse
+import os
+
+from flask_bootstrap import Bootstrap5
+
+import app as application
+from api import api_bp
+from benchmarks.common import create_app, seed_books, timer
+from services import OrjsonProvider, ResponseCompressor
+
+URLS = ('/', '/api/books', '/api/books?limit=500', '/api/books?stream=1')
+ENCODINGS = ('identity', 'gzip', 'br')
+
+
+def build_app(count: int):
+    app = create_app()
+    app.template_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+    Bootstrap5(app)
+    app.register_blueprint(api_bp)
+    # Главная страница и адреса, на которые ссылаются шаблоны
+    app.add_url_rule('/', view_func=application.index)
+    app.add_url_rule('/scrape', view_func=application.scrape, methods=['POST'])
+    if OrjsonProvider.is_available():
+        app.json = OrjsonProvider(app)
+    ResponseCompressor.init_app(app)
+
+    with app.app_context():
+        seed_books(count)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = build_app(args.count)
+    client = app.test_client()
+    print(f'Книг: {args.count}')
+
+    for url in URLS:
+        print(f'  {url}')
+        identity_size = None
+        for encoding in ENCODINGS:
+            response = client.get(url, headers={'Accept-Encoding': encoding})
+            if response.headers.get('Content-Encoding', 'identity') != encoding:
+                continue
+            size = len(response.data)
+            identity_size = identity_size or size
+            with timer() as elapsed:
+                for _ in range(args.repeat):
+                    client.get(url, headers={'Accept-Encoding': encoding}).get_data()
+            print(f'    {encoding:<9} {size / 1024:10.1f} КБ  {size / identity_size * 100:5.1f}%  '
+                  f'{elapsed() / args.repeat * 1000:8.1f} мс')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Бенчмарк потокового экспорта.
+
+Сравнивает сжатие всех записей deflate (как было раньше) и хранение обложек
+без сжатия на каталогах в 1k и 10k книг, а также выгрузку в NDJSON, Parquet
+и Arrow (обложки ссылкой по хешу).
+
+    python -m benchmarks.export --sizes 1000 10000 --image-size 30000
+"""
+
+import argparse
+from zipfile import ZIP_DEFLATED
+
+from benchmarks.common import create_app, seed_books, timer
+from services import ExportService
+from services import export_service
+
+
+def run_export(deflate_images: bool = False) -> int:
+    """Полный экспорт; возвращает размер архива."""
+    stored = export_service.ZIP_STORED
+    if deflate_images:
+        # Прежнее поведение: обложки тоже сжимаются deflate
+        export_service.ZIP_STORED = ZIP_DEFLATED
+    try:
+        return sum(len(chunk) for chunk in ExportService.stream_books_zip())
+    finally:
+        export_service.ZIP_STORED = stored
+
+
+def run_format(export_format: str) -> int:
+    """Полный экспорт в формате export_format; возвращает размер выгрузки."""
+    return sum(len(chunk) for chunk in ExportService.stream_books(export_format))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--image-size', type=int, default=30000, help='Размер обложки в байтах')
+    args = parser.parse_args()
+
+    app = create_app(EXPORT_BATCH_SIZE=500)
+    modes = [
+        ('deflate всех записей', True),
+        ('обложки ZIP_STORED', False),
+    ]
+
+    with app.app_context():
+        seeded = 0
+        for size in sorted(args.sizes):
+            seed_books(size - seeded, args.image_size)
+            seeded = size
+
+            print(f'\nКниг: {size}, обложка: {args.image_size} байт')
+            for title, deflate_images in modes:
+                with timer() as elapsed:
+                    archive_size = run_export(deflate_images)
+                print(f'  {title:<40} {elapsed():7.2f} с  {archive_size / 1024 / 1024:8.1f} MiB')
+
+            for export_format in ('ndjson', 'parquet', 'arrow'):
+                if export_format in ExportService.COLUMNAR_FORMATS and export_service.pa is None:
+                    continue
+                with timer() as elapsed:
+                    export_size = run_format(export_format)
+                print(f'  {export_format:<40} {elapsed():7.2f} с  {export_size / 1024 / 1024:8.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
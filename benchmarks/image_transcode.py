@@ -0,0 +1,73 @@
+"""Оценка выигрыша от перекодирования обложек в WebP/AVIF.
+
+Считает суммарный размер обложек до и после перекодирования на выборке:
+файлы из каталога (--dir) или обложки из БД приложения (по умолчанию).
+
+    python -m benchmarks.image_transcode --format webp --quality 80 --limit 200
+    python -m benchmarks.image_transcode --dir ./covers --format avif
+"""
+
+import argparse
+import io
+import os
+import time
+
+from services import ImageService
+
+
+def iter_directory(path: str, limit: int):
+    """Обложки из каталога."""
+    names = sorted(os.listdir(path))[:limit]
+    for name in names:
+        with open(os.path.join(path, name), 'rb') as f:
+            yield name, f.read()
+
+
+def iter_database(limit: int):
+    """Обложки из БД приложения."""
+    from app import app
+    from models import BookBase, db
+
+    with app.app_context():
+        rows = db.session.query(BookBase.image_name, BookBase.image_data).filter(
+            BookBase.image_data.isnot(None)
+        ).limit(limit)
+        for name, data in rows:
+            yield name, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', help='Каталог с обложками')
+    parser.add_argument('--format', default='webp', choices=ImageService.TRANSCODE_FORMATS)
+    parser.add_argument('--quality', type=int, default=ImageService.DEFAULT_TRANSCODE_QUALITY)
+    parser.add_argument('--limit', type=int, default=200)
+    args = parser.parse_args()
+
+    samples = iter_directory(args.dir, args.limit) if args.dir else iter_database(args.limit)
+
+    total_before = total_after = count = 0
+    started = time.perf_counter()
+    for name, data in samples:
+        compact = ImageService.transcode(io.BytesIO(data), args.format, args.quality)
+        # Если копия не меньше оригинала, сервис хранит оригинал
+        after = len(compact) if compact and len(compact) < len(data) else len(data)
+        total_before += len(data)
+        total_after += after
+        count += 1
+        print(f'{name:<40} {len(data):>10} -> {after:>10}')
+    elapsed = time.perf_counter() - started
+
+    if not count:
+        print('Нет обложек для оценки')
+        return
+
+    print('-' * 64)
+    print(f'Обложек: {count}, формат: {args.format}, качество: {args.quality}')
+    print(f'До:    {total_before / 1024:.1f} KiB')
+    print(f'После: {total_after / 1024:.1f} KiB ({total_after / total_before:.1%} от исходного)')
+    print(f'Время перекодирования: {elapsed:.2f} с ({elapsed / count * 1000:.1f} мс на обложку)')
+
+
+if __name__ == '__main__':
+    main()
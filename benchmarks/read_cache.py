@@ -0,0 +1,63 @@
+"""Бенчмарк кеша чтения каталога.
+
+Сравнивает горячие чтения BookService и FacetService без кеша
+(READ_CACHE_MAX_ENTRIES=0) и с прогретым кешем в памяти процесса.
+Каждое повторение выполняется в новой сессии, как отдельный запрос.
+
+    python -m benchmarks.read_cache --count 10000 --repeat 20
+"""
+
+import argparse
+
+from benchmarks.common import create_app, seed_books, timer
+from models import db
+from services import BookService, FacetService, ReadCache
+
+
+def make_reads(count: int) -> dict:
+    return {
+        'get_book': lambda: sum(BookService.get_book(book_id).id for book_id in range(1, count + 1, count // 100)),
+        'book_exists': lambda: sum(BookService.book_exists(f'https://example.com/catalog/book/{index}')
+                                   for index in range(0, count, count // 100)),
+        'get_unique_values': lambda: len(BookService.get_unique_values('series')),
+        'facets': lambda: len(FacetService.get_facets({'subject': 'Физика'})['class']),
+    }
+
+
+def measure(app, read, repeat: int) -> float:
+    with app.app_context():
+        # Прогрев
+        read()
+        db.session.remove()
+        with timer() as elapsed:
+            for _ in range(repeat):
+                read()
+                db.session.remove()
+    return elapsed() / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app(READ_CACHE_MAX_ENTRIES=0)
+    with app.app_context():
+        seed_books(args.count)
+    print(f'Книг: {args.count}')
+
+    for name, read in make_reads(args.count).items():
+        app.config['READ_CACHE_MAX_ENTRIES'] = 0
+        uncached = measure(app, read, args.repeat)
+        app.config['READ_CACHE_MAX_ENTRIES'] = ReadCache.DEFAULT_MAX_ENTRIES
+        cached = measure(app, read, args.repeat)
+        print(f'  {name:<18} без кеша {uncached:8.2f} мс  с кешем {cached:8.2f} мс')
+
+    with app.app_context():
+        stats = ReadCache.get_stats()
+    print(f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, доля попаданий: {stats['hit_ratio']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Бенчмарк поиска книг.
+
+Сравнивает поиск подстроки ilike (полный просмотр таблицы) с индексом FTS5
+на каталоге в 100k книг: время первых 50 результатов и подсчета совпадений.
+
+    python -m benchmarks.search --count 100000 --repeat 20
+"""
+
+import argparse
+
+from benchmarks.common import create_app, seed_books, timer
+from models import BookBase
+from services import SearchService
+
+QUERIES = ['математика', 'учебника физики', 'Автор 42', 'Просвещение', 'учебник по предмету химия']
+
+
+def run_like(query: str) -> int:
+    books = BookBase.query.filter(SearchService.like_condition(query)).order_by(BookBase.id).limit(50).all()
+    count = BookBase.query.filter(SearchService.like_condition(query)).count()
+    return len(books) and count
+
+
+def run_fts(query: str) -> int:
+    results = SearchService.search(query, limit=50)['results']
+    count = BookBase.query.filter(SearchService.match_condition(query)).count()
+    return len(results) and count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        with timer() as elapsed:
+            seed_books(args.count)
+        print(f'Книг: {args.count}, заполнение с индексацией: {elapsed():.1f} с')
+
+        for query in QUERIES:
+            for title, run in (('ilike', run_like), ('fts5', run_fts)):
+                with timer() as elapsed:
+                    for _ in range(args.repeat):
+                        found = run(query)
+                print(f'  {query!r:<24} {title:<6} {elapsed() / args.repeat * 1000:8.1f} мс  найдено {found}')
+
+
+if __name__ == '__main__':
+    main()
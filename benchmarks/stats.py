@@ -0,0 +1,54 @@
+"""Бенчмарк статистики каталога.
+
+Сравнивает чтение материализованной статистики book_value_counts с
+подсчетом через GROUP BY по books на каталогах разного размера, а также
+стоимость поддержки статистики триггерами при вставке книг.
+
+    python -m benchmarks.stats --counts 10000 100000 --repeat 20
+"""
+
+import argparse
+
+from sqlalchemy import text
+
+from benchmarks.common import create_app, seed_books, timer
+from models import BOOK_STATS_DDL, db
+from services import StatsService
+
+STATS_TRIGGERS = [statement.split()[5] for statement in BOOK_STATS_DDL if statement.startswith('CREATE TRIGGER')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for count in args.counts:
+        app = create_app()
+        with app.app_context():
+            with timer() as with_triggers:
+                seed_books(count)
+
+            with timer() as materialized:
+                for _ in range(args.repeat):
+                    StatsService.get_stats()
+            with timer() as computed:
+                for _ in range(args.repeat):
+                    StatsService._compute(StatsService.DEFAULT_TOP)
+
+            for trigger in STATS_TRIGGERS:
+                db.session.execute(text(f'DROP TRIGGER {trigger}'))
+            db.session.execute(text('DELETE FROM books'))
+            db.session.commit()
+            with timer() as without_triggers:
+                seed_books(count)
+
+        print(f'Книг: {count}')
+        print(f'  статистика: book_value_counts {materialized() / args.repeat * 1000:8.2f} мс, '
+              f'GROUP BY {computed() / args.repeat * 1000:8.2f} мс')
+        print(f'  вставка: с триггерами {with_triggers():.2f} с, без триггеров {without_triggers():.2f} с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Бенчмарк пакетной записи книг.
+
+Сравнивает create_or_update_book (поиск по URL и commit на каждую книгу)
+с create_or_update_many (INSERT ... ON CONFLICT пачками в одной транзакции)
+на вставке новых книг и на повторной записи тех же книг.
+
+    python -m benchmarks.upsert --count 10000 --chunk-size 500
+"""
+
+import argparse
+
+from benchmarks.common import create_app, make_book_row, timer
+from models import BookBase, BookCharacteristick, db
+from services import BookService
+
+
+def make_raw_item(index: int) -> dict:
+    """Сырые данные книги в формате парсера."""
+    row = make_book_row(index)
+    return {
+        'url': row['url'],
+        BookCharacteristick.NAME: row['name'],
+        BookCharacteristick.AUTHORS: row['authors'],
+        BookCharacteristick.SERIES: row['series'],
+        BookCharacteristick.CLASSES: f"{row['class_from']} класс",
+        BookCharacteristick.SUBJECT: row['subject'],
+        BookCharacteristick.PROGRAM: row['program'],
+        BookCharacteristick.PUBLISHER: row['publisher'],
+        BookCharacteristick.DESCRIPTION: row['description'],
+        BookCharacteristick.PART: row['part'],
+        BookCharacteristick.TYPE: row['type'],
+    }
+
+
+def run_single(raw_items: list) -> None:
+    for raw_data in raw_items:
+        BookService.create_or_update_book(raw_data)
+
+
+def run_many(raw_items: list, chunk_size: int) -> None:
+    BookService.create_or_update_many(raw_items, chunk_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    raw_items = [make_raw_item(index) for index in range(args.count)]
+    modes = [
+        ('create_or_update_book', run_single),
+        (f'create_or_update_many (пачки по {args.chunk_size})', lambda items: run_many(items, args.chunk_size)),
+    ]
+
+    print(f'Книг: {args.count}')
+    for title, run in modes:
+        app = create_app()
+        with app.app_context():
+            for stage in ('вставка', 'обновление'):
+                with timer() as elapsed:
+                    run(raw_items)
+                print(f'  {title:<42} {stage:<11} {elapsed():7.2f} с  {args.count / elapsed():9.0f} книг/с')
+            assert db.session.query(BookBase).count() == args.count
+
+
+if __name__ == '__main__':
+    main()
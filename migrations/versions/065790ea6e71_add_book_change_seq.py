@@ -0,0 +1,102 @@
+"""add book change seq
+
+Revision ID: 065790ea6e71
+Revises: 94fc8397a03e
+Create Date: 2026-10-19 21:04:37.528164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '065790ea6e71'
+down_revision = '94fc8397a03e'
+branch_labels = None
+depends_on = None
+
+
+def next_change_seq(table):
+    return (
+        "UPDATE book_change_sequence SET value = value + 1 WHERE id = 1;\n            "
+        f"UPDATE {table} SET change_seq = (SELECT value FROM book_change_sequence WHERE id = 1) WHERE id = new.id;"
+    )
+
+
+def upgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_seq', sa.Integer(), nullable=True))
+        batch_op.create_index('books_change_seq_idx', ['change_seq'], unique=False)
+
+    with op.batch_alter_table('book_tombstones', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_seq', sa.Integer(), nullable=True))
+        batch_op.create_index('book_tombstones_change_seq_idx', ['change_seq'], unique=False)
+
+    # Номера изменений присваиваются триггерами только в SQLite
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # Существующие изменения и удаления нумеруются по времени (updated_at и deleted_at
+    # записаны разными часами, поэтому порядок между ними приблизительный)
+    op.execute("""
+        CREATE TEMPORARY TABLE book_change_seq_backfill AS
+        SELECT kind, id, row_number() OVER (ORDER BY at, kind, id) AS seq FROM (
+            SELECT 'book' AS kind, id, updated_at AS at FROM books
+            UNION ALL
+            SELECT 'tombstone' AS kind, id, deleted_at AS at FROM book_tombstones
+        )
+    """)
+    op.execute("""
+        UPDATE books SET change_seq = (
+            SELECT seq FROM book_change_seq_backfill WHERE kind = 'book' AND book_change_seq_backfill.id = books.id
+        )
+    """)
+    op.execute("""
+        UPDATE book_tombstones SET change_seq = (
+            SELECT seq FROM book_change_seq_backfill
+            WHERE kind = 'tombstone' AND book_change_seq_backfill.id = book_tombstones.id
+        )
+    """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS book_change_sequence (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        )
+    """)
+    op.execute("""
+        INSERT INTO book_change_sequence(id, value)
+        SELECT 1, coalesce(max(seq), 0) FROM book_change_seq_backfill
+    """)
+    op.execute("DROP TABLE book_change_seq_backfill")
+
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS books_change_seq_insert AFTER INSERT ON books BEGIN
+            {next_change_seq('books')}
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS books_change_seq_update AFTER UPDATE ON books
+        WHEN new.change_seq IS old.change_seq BEGIN
+            {next_change_seq('books')}
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS book_tombstones_change_seq_insert AFTER INSERT ON book_tombstones BEGIN
+            {next_change_seq('book_tombstones')}
+        END
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS book_tombstones_change_seq_insert")
+        op.execute("DROP TRIGGER IF EXISTS books_change_seq_update")
+        op.execute("DROP TRIGGER IF EXISTS books_change_seq_insert")
+        op.execute("DROP TABLE IF EXISTS book_change_sequence")
+
+    op.drop_index('book_tombstones_change_seq_idx', table_name='book_tombstones')
+    op.drop_index('books_change_seq_idx', table_name='books')
+    # Без пересоздания таблицы books (batch_alter_table), чтобы сохранить триггеры FTS и статистики
+    op.execute("ALTER TABLE book_tombstones DROP COLUMN change_seq")
+    op.execute("ALTER TABLE books DROP COLUMN change_seq")
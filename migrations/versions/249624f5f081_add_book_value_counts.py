@@ -0,0 +1,92 @@
+"""add book value counts
+
+Revision ID: 249624f5f081
+Revises: 912349992ebe
+Create Date: 2026-10-19 18:41:27.392114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '249624f5f081'
+down_revision = '912349992ebe'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ('subject', 'program', 'publisher', 'class_from')
+
+
+def change(column, row, delta):
+    statement = (
+        f"INSERT INTO book_value_counts(column_name, is_null, value, count) "
+        f"VALUES ('{column}', {row}.{column} IS NULL, coalesce({row}.{column}, ''), {delta}) "
+        f"ON CONFLICT(column_name, is_null, value) DO UPDATE SET count = count {'+' if delta > 0 else '-'} {abs(delta)};"
+    )
+    if delta < 0:
+        statement += (
+            f"\n            DELETE FROM book_value_counts WHERE column_name = '{column}' "
+            f"AND is_null = ({row}.{column} IS NULL) AND value = coalesce({row}.{column}, '') AND count <= 0;"
+        )
+    return statement
+
+
+def upgrade():
+    # Материализованная статистика поддерживается триггерами только в SQLite
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS book_value_counts (
+            column_name TEXT NOT NULL,
+            is_null INTEGER NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (column_name, is_null, value)
+        ) WITHOUT ROWID
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS book_value_counts_count_idx ON book_value_counts (column_name, count)")
+
+    inserts = '\n            '.join(change(column, 'new', 1) for column in COLUMNS)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS book_value_counts_insert AFTER INSERT ON books BEGIN
+            {inserts}
+        END
+    """)
+    deletes = '\n            '.join(change(column, 'old', -1) for column in COLUMNS)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS book_value_counts_delete AFTER DELETE ON books BEGIN
+            {deletes}
+        END
+    """)
+    for column in COLUMNS:
+        op.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS book_value_counts_update_{column} AFTER UPDATE OF {column} ON books
+            WHEN old.{column} IS NOT new.{column} BEGIN
+                {change(column, 'old', -1)}
+                {change(column, 'new', 1)}
+            END
+        """)
+
+    # Статистика по уже сохраненным книгам
+    for column in COLUMNS:
+        op.execute(f"""
+            INSERT INTO book_value_counts(column_name, is_null, value, count)
+            SELECT '{column}', {column} IS NULL, coalesce({column}, ''), count(*)
+            FROM books
+            GROUP BY {column} IS NULL, coalesce({column}, '')
+        """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for column in reversed(COLUMNS):
+        op.execute(f"DROP TRIGGER IF EXISTS book_value_counts_update_{column}")
+    op.execute("DROP TRIGGER IF EXISTS book_value_counts_delete")
+    op.execute("DROP TRIGGER IF EXISTS book_value_counts_insert")
+    op.execute("DROP INDEX IF EXISTS book_value_counts_count_idx")
+    op.execute("DROP TABLE IF EXISTS book_value_counts")
@@ -0,0 +1,44 @@
+"""backfill image hash
+
+Revision ID: 585169266327
+Revises: 065790ea6e71
+Create Date: 2026-10-19 21:38:12.904715
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '585169266327'
+down_revision = '065790ea6e71'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    # Хеш обложек, сохраненных до появления image_hash (5a2c2b945be1) или без него
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.text("""
+            SELECT id, image_data FROM books
+            WHERE id > :last_id AND image_hash IS NULL AND image_data IS NOT NULL
+            ORDER BY id LIMIT :limit
+        """), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        connection.execute(sa.text("UPDATE books SET image_hash = :image_hash WHERE id = :id"), [
+            {'id': row.id, 'image_hash': hashlib.sha256(row.image_data).hexdigest()} for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # Хеши совпадают с данными обложек, откатывать нечего
+    pass
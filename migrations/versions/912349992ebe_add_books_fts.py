@@ -0,0 +1,63 @@
+"""add books fts
+
+Revision ID: 912349992ebe
+Revises: 7c0a3693259d
+Create Date: 2026-10-19 16:02:11.845302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '912349992ebe'
+down_revision = '7c0a3693259d'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = 'name, authors, subject, publisher, description'
+NEW_VALUES = 'new.name, new.authors, new.subject, new.publisher, new.description'
+OLD_VALUES = 'old.name, old.authors, old.subject, old.publisher, old.description'
+
+
+def upgrade():
+    # Полнотекстовый индекс FTS5 есть только в SQLite
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            {COLUMNS}, content='books', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF {COLUMNS} ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES});
+            INSERT INTO books_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES});
+        END
+    """)
+
+    # Индексируем уже сохраненные книги
+    op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS books_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS books_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS books_fts_insert")
+    op.execute("DROP TABLE IF EXISTS books_fts")
@@ -1,13 +1,17 @@
 from dataclasses import dataclass, asdict
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Sequence
 from datetime import datetime
 from enum import Enum
+from types import SimpleNamespace
 import re
 import base64
+import hashlib
+import json
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Index
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy import DDL, Index, Row, event
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.orm import DeclarativeBase, Mapped, attribute_keyed_dict, mapped_column, relationship
 from transliterate import translit
 
 
@@ -16,6 +20,11 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
+def _create_characteristic(key: str, value: Optional[str]) -> 'BookCharacteristicValue':
+    """Создание записи характеристики для BookBase.characteristics."""
+    return BookCharacteristicValue(key=key, value=value)
+
+
 class BookBase(db.Model):
     """Данные учебника.
 
@@ -41,7 +50,13 @@ class BookBase(db.Model):
         image_data: Файл с обложкой в формате base64
         image_url: Ссылка на обложку учебника
         image_type: Расширение файла обложки
+        image_hash: SHA-256 файла с обложкой
+        image_compact_data: Компактная копия обложки (WebP/AVIF), если сохраняется оригинал
+        image_compact_type: Расширение компактной копии обложки
         created_at: Дата создания информации
+        updated_at: Дата последнего изменения информации
+        change_seq: Порядковый номер последнего изменения (лента изменений)
+        characteristics: Все характеристики со страницы учебника (название -> значение)
     """
     __tablename__ = "books"
 
@@ -66,11 +81,22 @@ class BookBase(db.Model):
     image_data: Mapped[Optional[bytes]] = mapped_column(db.LargeBinary)
     image_url: Mapped[Optional[str]] = mapped_column(db.Text)
     image_type: Mapped[Optional[str]] = mapped_column(db.Text)
+    image_hash: Mapped[Optional[str]] = mapped_column(db.Text)
+    image_compact_data: Mapped[Optional[bytes]] = mapped_column(db.LargeBinary, deferred=True)
+    image_compact_type: Mapped[Optional[str]] = mapped_column(db.Text)
     created_at: Mapped[Optional[datetime]] = mapped_column(db.DateTime, default=datetime.now)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    # Присваивается триггером при каждой записи (BOOK_CHANGE_SEQ_DDL)
+    change_seq: Mapped[Optional[int]] = mapped_column(db.Integer)
+
+    characteristic_items = relationship(
+        'BookCharacteristicValue', collection_class=attribute_keyed_dict('key'), cascade='all, delete-orphan'
+    )
+    characteristics = association_proxy('characteristic_items', 'value', creator=_create_characteristic)
 
     # Индексы
     __table_args__ = (
-        Index('books_url_idx', 'url'),
+        Index('books_url_idx', 'url', unique=True),
         Index('books_authors_idx', 'authors'),
         Index('books_series_idx', 'series'),
         Index('books_class_from_idx', 'class_from'),
@@ -78,40 +104,82 @@ class BookBase(db.Model):
         Index('books_part_idx', 'part'),
         Index('books_program_idx', 'program'),
         Index('books_publisher_idx', 'publisher'),
-        Index('books_series_idx', 'series'),
         Index('books_subject_idx', 'subject'),
+        Index('books_updated_at_idx', 'updated_at'),
+        Index('books_change_seq_idx', 'change_seq'),
     )
 
-    def to_dict(self, include_image: bool = False) -> Dict[str, Any]:
-        """Конвертирует объект книги в словарь"""
-        result = {
-            'id': self.id,
-            'url': self.url,
-            'name': self.name,
-            'authors': self.authors,
-            'series': self.series or '',
-            'class_from': self.class_from,
-            'class_to': self.class_to if self.class_from != self.class_to else '',
-            'subject': self.subject,
-            'program': self.program or '',
-            'publisher': self.publisher or '',
-            'description': self.description,
-            'part': self.part or '',
-            'type': self.type or '',
-            'type_resourse': self.type_resourse or '',
-            'is_ovz': self.is_ovz or False,
-            'type_pay_resourse': self.type_pay_resourse or '',
-            'publication_language': self.publication_language or '',
-            'image_name': self.image_name,
-            'image_data': self.image_data,
-            'image_url': self.image_url,
-            'image_type': self.image_type,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    # Поля to_dict: имя -> (колонки, из которых оно строится, функция значения).
+    # Функции принимают книгу или строку выборки с этими колонками.
+    DICT_FIELDS = {
+        'id': (('id',), lambda book: book.id),
+        'url': (('url',), lambda book: book.url),
+        'name': (('name',), lambda book: book.name),
+        'authors': (('authors',), lambda book: book.authors),
+        'series': (('series',), lambda book: book.series or ''),
+        'class_from': (('class_from',), lambda book: book.class_from),
+        'class_to': (('class_from', 'class_to'),
+                     lambda book: book.class_to if book.class_from != book.class_to else ''),
+        'subject': (('subject',), lambda book: book.subject),
+        'program': (('program',), lambda book: book.program or ''),
+        'publisher': (('publisher',), lambda book: book.publisher or ''),
+        'description': (('description',), lambda book: book.description),
+        'part': (('part',), lambda book: book.part or ''),
+        'type': (('type',), lambda book: book.type or ''),
+        'type_resourse': (('type_resourse',), lambda book: book.type_resourse or ''),
+        'is_ovz': (('is_ovz',), lambda book: book.is_ovz or False),
+        'type_pay_resourse': (('type_pay_resourse',), lambda book: book.type_pay_resourse or ''),
+        'publication_language': (('publication_language',), lambda book: book.publication_language or ''),
+        'image_name': (('image_name',), lambda book: book.image_name),
+        'image_url': (('image_url',), lambda book: book.image_url),
+        'image_type': (('image_type',), lambda book: book.image_type),
+        'image_hash': (('image_hash',), lambda book: book.image_hash),
+        'created_at': (('created_at',), lambda book: book.created_at.isoformat() if book.created_at else None),
+        'updated_at': (('updated_at',), lambda book: book.updated_at.isoformat() if book.updated_at else None),
+    }
+
+    @classmethod
+    def parse_fields(cls, value: Optional[str]) -> Optional[Sequence[str]]:
+        """Список полей to_dict из параметра fields ("id,name,authors"); None — все поля.
+
+        Raises:
+            ValueError: неизвестное поле.
+        """
+        if not value:
+            return None
+        fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in fields if name not in cls.DICT_FIELDS]
+        if unknown:
+            raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+        return fields
+
+    @classmethod
+    def dict_columns(cls, fields: Optional[Sequence[str]] = None) -> list:
+        """Колонки, нужные для полей to_dict (всегда с id)."""
+        names = {'id'}
+        for name in fields or cls.DICT_FIELDS:
+            names.update(cls.DICT_FIELDS[name][0])
+        return [getattr(cls, column.name) for column in cls.__table__.columns if column.name in names]
+
+    @classmethod
+    def serialize(cls, book, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Поля to_dict книги или строки выборки из dict_columns(fields)."""
+        if isinstance(book, Row):
+            # Чтение атрибутов Row заметно медленнее, чем полей простого объекта
+            book = SimpleNamespace(**book._mapping)
+        return {name: cls.DICT_FIELDS[name][1](book) for name in fields or cls.DICT_FIELDS}
+
+    def to_dict(self, include_image: bool = False, include_characteristics: bool = False,
+                fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Конвертирует объект книги в словарь (fields — только указанные поля)"""
+        result = BookBase.serialize(self, fields)
 
         if include_image and self.image_data:
             result['image_data_base64'] = base64.b64encode(self.image_data).decode('utf-8')
 
+        if include_characteristics:
+            result['characteristics'] = dict(self.characteristics)
+
         return result
 
     @classmethod
@@ -162,13 +230,11 @@ class BookBase(db.Model):
 
     def get_characteristic(self, key: str, default: Any = None) -> Any:
         """Получение конкретной характеристики"""
-        return self.characteristics.get(key, default) if self.characteristics else default
+        return self.characteristics.get(key, default)
 
     def set_characteristic(self, key: str, value: Any):
         """Установка характеристики"""
-        if self.characteristics is None:
-            self.characteristics = {}
-        self.characteristics[key] = value
+        self.characteristics[key] = None if value is None else str(value)
 
 
     def set_image(self, image_data: bytes, image_url: str = None, image_type: str = None):
@@ -176,8 +242,293 @@ class BookBase(db.Model):
         self.image_data = image_data
         self.image_url = image_url
         self.image_type = image_type
+        self.image_hash = hashlib.sha256(image_data).hexdigest() if image_data else None
+        self.image_compact_data = None
+        self.image_compact_type = None
+
+
+
+# Полнотекстовый индекс SQLite FTS5 по книгам (external content: тексты хранятся только в books).
+# Индекс синхронизируется триггерами; в миграции 912349992ebe он строится для существующих данных
+BOOKS_FTS_COLUMNS = ('name', 'authors', 'subject', 'publisher', 'description')
+
+_fts_columns = ', '.join(BOOKS_FTS_COLUMNS)
+_fts_new = ', '.join(f'new.{column}' for column in BOOKS_FTS_COLUMNS)
+_fts_old = ', '.join(f'old.{column}' for column in BOOKS_FTS_COLUMNS)
+
+BOOKS_FTS_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        {_fts_columns}, content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, {_fts_columns}) VALUES (new.id, {_fts_new});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, {_fts_columns}) VALUES ('delete', old.id, {_fts_old});
+    END""",
+    # Обновление обложки и прочих полей не трогает индекс
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF {_fts_columns} ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, {_fts_columns}) VALUES ('delete', old.id, {_fts_old});
+        INSERT INTO books_fts(rowid, {_fts_columns}) VALUES (new.id, {_fts_new});
+    END""",
+)
+
+for _statement in BOOKS_FTS_DDL:
+    event.listen(BookBase.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(BookBase.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS books_fts').execute_if(dialect='sqlite'))
+
+# Материализованная статистика по значениям колонок книг (SQLite): число книг на каждое
+# значение колонки, включая пустые (is_null = 1). Поддерживается триггерами при любой записи.
+BOOK_STATS_COLUMNS = ('subject', 'program', 'publisher', 'class_from')
+
+
+def _stats_change(column: str, row: str, delta: int) -> str:
+    """Изменение счетчика значения колонки строки row (new или old) на delta."""
+    statement = (
+        f"INSERT INTO book_value_counts(column_name, is_null, value, count) "
+        f"VALUES ('{column}', {row}.{column} IS NULL, coalesce({row}.{column}, ''), {delta}) "
+        f"ON CONFLICT(column_name, is_null, value) DO UPDATE SET count = count {'+' if delta > 0 else '-'} {abs(delta)};"
+    )
+    if delta < 0:
+        # Значения, которых больше нет ни у одной книги, удаляем
+        statement += (
+            f"\n        DELETE FROM book_value_counts WHERE column_name = '{column}' "
+            f"AND is_null = ({row}.{column} IS NULL) AND value = coalesce({row}.{column}, '') AND count <= 0;"
+        )
+    return statement
+
+
+BOOK_STATS_DDL = (
+    """CREATE TABLE IF NOT EXISTS book_value_counts (
+        column_name TEXT NOT NULL,
+        is_null INTEGER NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (column_name, is_null, value)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS book_value_counts_count_idx ON book_value_counts (column_name, count)",
+    "CREATE TRIGGER IF NOT EXISTS book_value_counts_insert AFTER INSERT ON books BEGIN\n        "
+    + '\n        '.join(_stats_change(column, 'new', 1) for column in BOOK_STATS_COLUMNS)
+    + '\n    END',
+    "CREATE TRIGGER IF NOT EXISTS book_value_counts_delete AFTER DELETE ON books BEGIN\n        "
+    + '\n        '.join(_stats_change(column, 'old', -1) for column in BOOK_STATS_COLUMNS)
+    + '\n    END',
+    *(
+        f"CREATE TRIGGER IF NOT EXISTS book_value_counts_update_{column} AFTER UPDATE OF {column} ON books "
+        f"WHEN old.{column} IS NOT new.{column} BEGIN\n        "
+        f"{_stats_change(column, 'old', -1)}\n        {_stats_change(column, 'new', 1)}\n    END"
+        for column in BOOK_STATS_COLUMNS
+    ),
+)
+
+for _statement in BOOK_STATS_DDL:
+    event.listen(BookBase.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(BookBase.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS book_value_counts').execute_if(dialect='sqlite'))
+
+
+class BookCharacteristicValue(db.Model):
+    """Характеристика учебника со страницы каталога.
+
+    Attributes:
+        book_id: Идентификатор учебника
+        key: Название характеристики
+        value: Значение характеристики
+    """
+    __tablename__ = "book_characteristics"
+
+    book_id: Mapped[int] = mapped_column(db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'), primary_key=True)
+    key: Mapped[str] = mapped_column(db.Text, primary_key=True)
+    value: Mapped[Optional[str]] = mapped_column(db.Text)
+
+    __table_args__ = (
+        # Поиск книг по значению и список значений характеристики читаются только из индекса
+        Index('book_characteristics_key_value_idx', 'key', 'value', 'book_id'),
+    )
 
 
+class BookTombstone(db.Model):
+    """Запись об удаленном учебнике.
+
+    Attributes:
+        id: Идентификатор записи
+        book_id: Идентификатор удаленного учебника
+        url: Ссылка на удаленный учебник
+        deleted_at: Дата удаления
+        change_seq: Порядковый номер изменения (лента изменений)
+    """
+    __tablename__ = "book_tombstones"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
+    book_id: Mapped[int] = mapped_column(db.Integer, nullable=False)
+    url: Mapped[Optional[str]] = mapped_column(db.Text)
+    deleted_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.now, nullable=False)
+    # Присваивается триггером при добавлении (BOOK_CHANGE_SEQ_DDL)
+    change_seq: Mapped[Optional[int]] = mapped_column(db.Integer)
+
+    __table_args__ = (
+        Index('book_tombstones_deleted_at_idx', 'deleted_at'),
+        Index('book_tombstones_change_seq_idx', 'change_seq'),
+    )
+
+
+# Порядковые номера изменений книг и удалений для ленты изменений (SQLite). Номер берется
+# из общего счетчика триггером внутри пишущей транзакции. В SQLite пишущая транзакция
+# одна, поэтому номера растут в порядке фиксации транзакций, в отличие от updated_at,
+# который задается часами процесса при flush. Для существующих данных номера
+# проставляются в миграции 065790ea6e71
+BOOK_CHANGE_SEQUENCE_DDL = (
+    """CREATE TABLE IF NOT EXISTS book_change_sequence (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        value INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO book_change_sequence(id, value) VALUES (1, 0)",
+)
+
+
+def _next_change_seq(table: str) -> str:
+    """Следующий номер изменения для строки new таблицы table."""
+    return (
+        "UPDATE book_change_sequence SET value = value + 1 WHERE id = 1;\n        "
+        f"UPDATE {table} SET change_seq = (SELECT value FROM book_change_sequence WHERE id = 1) WHERE id = new.id;"
+    )
+
+
+BOOK_CHANGE_SEQ_DDL = (
+    f"""CREATE TRIGGER IF NOT EXISTS books_change_seq_insert AFTER INSERT ON books BEGIN
+        {_next_change_seq('books')}
+    END""",
+    # Условие пропускает обновление change_seq самим триггером
+    f"""CREATE TRIGGER IF NOT EXISTS books_change_seq_update AFTER UPDATE ON books
+    WHEN new.change_seq IS old.change_seq BEGIN
+        {_next_change_seq('books')}
+    END""",
+)
+
+BOOK_TOMBSTONES_CHANGE_SEQ_DDL = (
+    f"""CREATE TRIGGER IF NOT EXISTS book_tombstones_change_seq_insert AFTER INSERT ON book_tombstones BEGIN
+        {_next_change_seq('book_tombstones')}
+    END""",
+)
+
+for _statement in BOOK_CHANGE_SEQUENCE_DDL + BOOK_CHANGE_SEQ_DDL:
+    event.listen(BookBase.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in BOOK_CHANGE_SEQUENCE_DDL + BOOK_TOMBSTONES_CHANGE_SEQ_DDL:
+    event.listen(BookTombstone.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(BookBase.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS book_change_sequence').execute_if(dialect='sqlite'))
+
+
+class ExportRecord(db.Model):
+    """Запись о выполненном экспорте.
+
+    Attributes:
+        id: Идентификатор экспорта
+        since: Начало периода изменений (None — полный экспорт)
+        watermark: Момент начала экспорта; следующий экспорт может продолжить с него
+        books_count: Количество выгруженных учебников
+        deleted_count: Количество выгруженных записей об удалении
+        created_at: Дата создания
+        completed_at: Дата успешного завершения
+    """
+    __tablename__ = "exports"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
+    since: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
+    watermark: Mapped[datetime] = mapped_column(db.DateTime, nullable=False)
+    books_count: Mapped[int] = mapped_column(db.Integer, default=0)
+    deleted_count: Mapped[int] = mapped_column(db.Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.now)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
+
+
+
+class ExportJob(db.Model):
+    """Фоновая задача экспорта.
+
+    Attributes:
+        id: Идентификатор задачи
+        status: Состояние (pending, running, completed, failed, expired)
+        params: Параметры экспорта в JSON (см. ExportOptions.to_dict)
+        export_id: Идентификатор записи экспорта
+        books_total: Количество книг к выгрузке
+        images_total: Количество обложек к выгрузке
+        books_written: Выгружено книг
+        images_written: Выгружено обложек
+        bytes_written: Записано байт
+        file_path: Путь к готовому файлу
+        error: Текст ошибки
+        created_at: Дата создания
+        started_at: Дата запуска
+        completed_at: Дата завершения
+        expires_at: Дата, после которой файл удаляется
+        owner: Процесс, выполняющий задачу (хост, pid и идентификатор запуска)
+        heartbeat_at: Время последнего сигнала жизни процесса-владельца
+    """
+    __tablename__ = "export_jobs"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
+    status: Mapped[str] = mapped_column(db.Text, nullable=False, default='pending')
+    params: Mapped[Optional[str]] = mapped_column(db.Text)
+    export_id: Mapped[Optional[int]] = mapped_column(db.Integer)
+    books_total: Mapped[int] = mapped_column(db.Integer, default=0)
+    images_total: Mapped[int] = mapped_column(db.Integer, default=0)
+    books_written: Mapped[int] = mapped_column(db.Integer, default=0)
+    images_written: Mapped[int] = mapped_column(db.Integer, default=0)
+    bytes_written: Mapped[int] = mapped_column(db.Integer, default=0)
+    file_path: Mapped[Optional[str]] = mapped_column(db.Text)
+    error: Mapped[Optional[str]] = mapped_column(db.Text)
+    created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.now)
+    started_at: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
+    expires_at: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
+    owner: Mapped[Optional[str]] = mapped_column(db.Text)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
+
+    __table_args__ = (
+        Index('export_jobs_status_expires_at_idx', 'status', 'expires_at'),
+    )
+
+    @property
+    def progress(self) -> float:
+        """Доля выполненной работы от 0 до 1."""
+        if self.status == 'completed':
+            return 1.0
+        total = (self.books_total or 0) + (self.images_total or 0)
+        if not total:
+            return 0.0
+        return min(((self.books_written or 0) + (self.images_written or 0)) / total, 1.0)
+
+    @property
+    def eta_seconds(self) -> Optional[int]:
+        """Оценка оставшегося времени по скорости выполнения."""
+        progress = self.progress
+        if self.status != 'running' or not self.started_at or not progress:
+            return None
+        elapsed = (datetime.now() - self.started_at).total_seconds()
+        return int(elapsed * (1 - progress) / progress)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'params': json.loads(self.params) if self.params else None,
+            'export_id': self.export_id,
+            'books_total': self.books_total,
+            'images_total': self.images_total,
+            'books_written': self.books_written,
+            'images_written': self.images_written,
+            'bytes_written': self.bytes_written,
+            'progress': round(self.progress, 4),
+            'eta_seconds': self.eta_seconds,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
+
 class BookCharacteristick(str, Enum):
     NAME = 'Название'
     SERIES = 'Линия УМК, серия'
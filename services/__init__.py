@@ -1,4 +1,16 @@
 from .book_service import BookService
-from .export_service import ExportService
+from .change_feed_service import ChangeFeedService
+from .compression import ResponseCompressor
+from .export_service import ExportService, ExportOptions
+from .export_cache import ExportCache
+from .export_job_service import ExportJobService
+from .facet_service import FacetService
+from .image_service import ImageService, ImageUploadError, ImageTooLargeError, ImageDimensionsError
+from .import_service import ImportService, ImportReport
+from .json_provider import OrjsonProvider
+from .pagination import Pagination, InvalidCursorError
+from .read_cache import ReadCache
+from .search_service import SearchService
+from .stats_service import StatsService
 
-__all__ = ['BookService', 'ExportService']
\ No newline at end of file
+__all__ = ['BookService', 'ChangeFeedService', 'ExportService', 'ExportOptions', 'ExportCache', 'ExportJobService', 'FacetService', 'ImageService', 'ImportService', 'ImportReport', 'OrjsonProvider', 'Pagination', 'ReadCache', 'ResponseCompressor', 'SearchService', 'StatsService', 'ImageUploadError', 'ImageTooLargeError', 'ImageDimensionsError', 'InvalidCursorError']
\ No newline at end of file
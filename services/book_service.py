@@ -1,20 +1,55 @@
 """Сервисы для работы с книгами."""
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Sequence
 import requests
 import re
 import base64
+import hashlib
 from datetime import datetime
+from enum import Enum
 
-from sqlalchemy import or_
+from flask import current_app
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import defer, load_only, make_transient_to_detached
 from transliterate import translit
 
-from models import BookBase, BookCharacteristick, db
+from models import BookBase, BookCharacteristicValue, BookCharacteristick, BookTombstone, db
+from .image_service import ImageService
+from .pagination import Pagination
+from .read_cache import ReadCache
+from .search_service import SearchService
 
 
 class BookService:
     """Сервис для работы с книгами."""
 
+    DEFAULT_UPSERT_CHUNK_SIZE = 500
+    # Размер пачки строк, читаемых из курсора БД при потоковой выдаче книг
+    STREAM_BATCH_SIZE = 1000
+    # Колонки, которые нельзя оставить пустыми при создании книги
+    UPSERT_REQUIRED_FIELDS = ('name', 'authors')
+    _UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+    # Ключи сырых данных, которые не являются характеристиками со страницы учебника
+    NON_CHARACTERISTIC_KEYS = (
+        'url', 'image_data_base64', 'image_type', 'image_url', 'created_at', 'type_resourse', 'is_ovz',
+        'type_pay_resourse', BookCharacteristick.NAME, BookCharacteristick.DESCRIPTION, BookCharacteristick.IMAGE_SRC,
+    )
+    # Характеристики, сохраняемые также в отдельных полях книги
+    CHARACTERISTIC_FIELDS = {
+        BookCharacteristick.NAME: ('name',),
+        BookCharacteristick.AUTHORS: ('authors',),
+        BookCharacteristick.SERIES: ('series',),
+        BookCharacteristick.CLASSES: ('class_from', 'class_to'),
+        BookCharacteristick.SUBJECT: ('subject',),
+        BookCharacteristick.PROGRAM: ('program',),
+        BookCharacteristick.PUBLISHER: ('publisher',),
+        BookCharacteristick.DESCRIPTION: ('description',),
+        BookCharacteristick.PART: ('part',),
+        BookCharacteristick.TYPE: ('type',),
+        BookCharacteristick.PUBLICATION_LANGUAGE: ('publication_language',),
+    }
+
     @staticmethod
     def extract_classes(class_str: str) -> tuple[Optional[int], Optional[int]]:
         """Извлечение классов из строки."""
@@ -41,6 +76,16 @@ class BookService:
 
         return f"{image_name}_{class_from}_{part}" if class_from and part else image_name
 
+    @staticmethod
+    def extract_characteristics(raw_data: Dict[str, Any]) -> Dict[str, str]:
+        """Характеристики со страницы учебника из сырых данных (все, а не только известные)."""
+        characteristics = {}
+        for key, value in raw_data.items():
+            if key in BookService.NON_CHARACTERISTIC_KEYS or value is None or isinstance(value, (dict, list)):
+                continue
+            characteristics[key.value if isinstance(key, Enum) else str(key)] = str(value)
+        return characteristics
+
     @staticmethod
     def process_raw_data(raw_data: Dict[str, Any]) -> Dict[str, Any]:
         """Обработка сырых данных и преобразование в структурированные."""
@@ -85,7 +130,8 @@ class BookService:
             'image_data': image_data,
             'image_url': raw_data.get('image_src'),
             'image_type': raw_data.get('image_type'),
-            'created_at': datetime.fromisoformat(raw_data['created_at']) if raw_data.get('created_at') else None
+            'created_at': datetime.fromisoformat(raw_data['created_at']) if raw_data.get('created_at') else None,
+            'characteristics': BookService.extract_characteristics(raw_data) or None
         }
 
         # Очищаем None значения
@@ -96,6 +142,8 @@ class BookService:
         """Создание или обновление книги из сырых данных."""
         # Обрабатываем сырые данные
         processed_data = BookService.process_raw_data(raw_data)
+        # Обложка записывается через set_image, чтобы сохранить ее хеш
+        image_data = processed_data.pop('image_data', None)
         
         # Проверяем, существует ли книга с таким URL
         existing_book = BookBase.query.filter_by(url=processed_data.get('url')).first()
@@ -103,43 +151,245 @@ class BookService:
         if existing_book:
             # Обновляем существующую книгу
             BookService._update_book_from_dict(existing_book, processed_data)
+            if image_data is not None:
+                existing_book.set_image(image_data, existing_book.image_url, existing_book.image_type)
             db.session.commit()
+            ReadCache.invalidate()
             return existing_book
         else:
             # Создаем новую книгу
             book = BookBase(**processed_data)
+            if image_data is not None:
+                book.set_image(image_data, book.image_url, book.image_type)
             db.session.add(book)
             db.session.commit()
+            ReadCache.invalidate()
             return book
     
+    @staticmethod
+    def get_upsert_chunk_size() -> int:
+        """Количество книг в одном INSERT ... ON CONFLICT при пакетной записи."""
+        return int(current_app.config.get('BOOK_UPSERT_CHUNK_SIZE', BookService.DEFAULT_UPSERT_CHUNK_SIZE))
+
+    @staticmethod
+    def create_or_update_many(raw_items: Iterable[Dict[str, Any]], chunk_size: int = None) -> List[Dict[str, Any]]:
+        """Пакетное создание или обновление книг из сырых данных (см. create_or_update_book)."""
+        return BookService.upsert_books((BookService.process_raw_data(raw_data) for raw_data in raw_items),
+                                        chunk_size)
+
+    @staticmethod
+    def upsert_books(rows: Iterable[Dict[str, Any]], chunk_size: int = None) -> List[Dict[str, Any]]:
+        """Пакетная запись книг с ключом по URL.
+
+        Книги пишутся пачками по chunk_size одним INSERT ... ON CONFLICT (url)
+        DO UPDATE в общей транзакции. Как и в create_or_update_book, пустые
+        (None) значения не затирают сохраненные. Перед записью пачки одним
+        запросом определяется, какие URL уже есть в БД.
+
+        Returns:
+            Результат по каждой строке в исходном порядке: index, url, id
+            и status — inserted, updated, duplicate (URL повторяется ниже
+            в той же пачке, строка объединена с последней) или error (с error).
+        """
+        chunk_size = chunk_size or BookService.get_upsert_chunk_size()
+        outcomes = []
+        chunk = []
+
+        try:
+            for index, row in enumerate(rows):
+                chunk.append((index, row))
+                if len(chunk) >= chunk_size:
+                    outcomes.extend(BookService._upsert_chunk(chunk))
+                    chunk = []
+            if chunk:
+                outcomes.extend(BookService._upsert_chunk(chunk))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        ReadCache.invalidate()
+        return outcomes
+
+    @staticmethod
+    def _upsert_chunk(chunk: List[tuple]) -> List[Dict[str, Any]]:
+        """Запись одной пачки книг; транзакцию не завершает."""
+        now = datetime.now()
+        outcomes = {}
+        merged = {}
+        duplicates = {}
+
+        # Повторы URL внутри пачки объединяем: ON CONFLICT не может изменить строку дважды
+        for index, row in chunk:
+            url = row.get('url')
+            outcomes[index] = {'index': index, 'url': url, 'id': None, 'status': None}
+            if not url:
+                outcomes[index].update(status='error', error='URL is required')
+                continue
+            if url in merged:
+                previous_index, previous_row = merged[url]
+                outcomes[previous_index]['status'] = 'duplicate'
+                duplicates.setdefault(url, []).append(previous_index)
+                row = {**previous_row, **{key: value for key, value in row.items() if value is not None}}
+                if previous_row.get('characteristics') and row.get('characteristics'):
+                    row['characteristics'] = {**previous_row['characteristics'], **row['characteristics']}
+            merged[url] = (index, row)
+
+        # Обязательные поля существующих книг нужны, т.к. NOT NULL проверяется до ON CONFLICT
+        required_columns = [getattr(BookBase, name) for name in BookService.UPSERT_REQUIRED_FIELDS]
+        existing = {
+            url: dict(zip(BookService.UPSERT_REQUIRED_FIELDS, required))
+            for url, *required in db.session.query(BookBase.url, *required_columns).filter(
+                BookBase.url.in_(list(merged))
+            )
+        }
+
+        values = []
+        for url, (index, row) in merged.items():
+            missing = [name for name in BookService.UPSERT_REQUIRED_FIELDS if row.get(name) is None]
+            if missing and url not in existing:
+                outcomes[index].update(status='error', error=f'Missing required fields: {", ".join(missing)}')
+                continue
+            if missing:
+                row = {**row, **{name: existing[url][name] for name in missing}}
+            values.append(BookService._upsert_values(row, now))
+            outcomes[index]['status'] = 'updated' if url in existing else 'inserted'
+
+        if values:
+            ids = BookService._execute_upsert(values)
+            characteristics = {}
+            for url, (index, row) in merged.items():
+                if outcomes[index]['status'] in ('inserted', 'updated'):
+                    book_id = ids.get(url)
+                    for outcome_index in [index] + duplicates.get(url, []):
+                        outcomes[outcome_index]['id'] = book_id
+                    if book_id is not None and row.get('characteristics'):
+                        characteristics[book_id] = row['characteristics']
+            BookService._replace_characteristics(characteristics)
+
+        return [outcomes[index] for index, _ in chunk]
+
+    @staticmethod
+    def _replace_characteristics(characteristics: Dict[int, Dict[str, str]]) -> None:
+        """Замена характеристик книг пачкой (книга -> все ее характеристики)."""
+        if not characteristics:
+            return
+
+        table = BookCharacteristicValue.__table__
+        db.session.execute(table.delete().where(table.c.book_id.in_(list(characteristics))))
+        db.session.execute(table.insert(), [
+            {'book_id': book_id, 'key': key, 'value': value}
+            for book_id, pairs in characteristics.items() for key, value in pairs.items()
+        ])
+
+    @staticmethod
+    def _upsert_values(row: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        """Полный набор колонок строки для многострочного INSERT."""
+        values = {column.name: row.get(column.name) for column in BookBase.__table__.columns
+                  if column.name != 'id'}
+        if values['image_data'] is not None:
+            values['image_hash'] = hashlib.sha256(values['image_data']).hexdigest()
+        values['created_at'] = values['created_at'] or now
+        values['updated_at'] = now
+        return values
+
+    @staticmethod
+    def _execute_upsert(values: List[Dict[str, Any]]) -> Dict[str, int]:
+        """INSERT ... ON CONFLICT (url) DO UPDATE для пачки строк.
+
+        Returns:
+            id книг по URL.
+        """
+        table = BookBase.__table__
+        insert = BookService._UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+        if insert is None:
+            return BookService._upsert_fallback(values)
+
+        statement = insert(table)
+        excluded = statement.excluded
+        set_ = {
+            column.name: func.coalesce(excluded[column.name], column)
+            for column in table.columns if column.name not in ('id', 'url', 'created_at')
+        }
+        set_['updated_at'] = excluded.updated_at
+        # Новая обложка делает компактную копию неактуальной
+        for name in ('image_compact_data', 'image_compact_type'):
+            set_[name] = case((excluded.image_data.isnot(None), None), else_=table.c[name])
+
+        # executemany: SQLAlchemy собирает из строк многострочный INSERT (insertmanyvalues),
+        # а сам запрос компилируется один раз и берется из кеша
+        statement = statement.on_conflict_do_update(index_elements=[table.c.url], set_=set_)
+        rows = db.session.execute(statement.returning(table.c.url, table.c.id), values)
+        return {url: book_id for url, book_id in rows}
+
+    @staticmethod
+    def _upsert_fallback(values: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Запись пачки через ORM для СУБД без ON CONFLICT."""
+        urls = [row['url'] for row in values]
+        books = {book.url: book for book in BookBase.query.filter(BookBase.url.in_(urls))}
+        for row in values:
+            book = books.get(row['url'])
+            if book is None:
+                book = BookBase(**row)
+                db.session.add(book)
+                books[row['url']] = book
+            else:
+                image_replaced = row['image_data'] is not None
+                BookService._update_book_from_dict(book, {key: value for key, value in row.items()
+                                                          if key != 'created_at'})
+                if image_replaced:
+                    book.image_compact_data = None
+                    book.image_compact_type = None
+            db.session.flush()
+        return {url: book.id for url, book in books.items()}
+
     @staticmethod
     def _update_book_from_dict(book: BookBase, update_data: Dict[str, Any]) -> None:
         """Обновление книги из словаря данных."""
         for key, value in update_data.items():
-            if hasattr(book, key) and value is not None:
+            if key == 'characteristics':
+                BookService._set_characteristics(book, value, replace=True)
+            elif hasattr(book, key) and value is not None:
                 setattr(book, key, value)
+
+    @staticmethod
+    def _set_characteristics(book: BookBase, characteristics: Optional[Dict[str, str]], replace: bool = False) -> None:
+        """Запись характеристик книги (replace — заменить все сохраненные).
+
+        Характеристики хранятся в отдельной таблице, поэтому при их
+        изменении дата изменения книги обновляется явно.
+        """
+        if not characteristics:
+            return
+
+        current = dict(book.characteristics)
+        updated = dict(characteristics) if replace else {**current, **characteristics}
+        if updated != current:
+            book.characteristics = updated
+            book.updated_at = datetime.now()
     
     @staticmethod
     def download_and_save_image(image_url: str, book_id: int) -> bool:
         """Скачивание и сохранение изображения для книги."""
         try:
-            response = requests.get(image_url, timeout=10)
+            response = requests.get(image_url, timeout=10, stream=True)
             response.raise_for_status()
 
-            image_data = response.content
-            image_type = response.headers.get('content-type', '').split('/')[-1]
-
-            book = BookBase.query.get(book_id)
-            if book:
-                book.set_image(image_data, image_url, image_type)
-                db.session.commit()
-                return True
-            return False
+            with response:
+                chunks = response.iter_content(ImageService.CHUNK_SIZE)
+                return ImageService.save_image_stream(book_id, chunks, image_url)
 
         except Exception as e:
             print(f"Error downloading image {image_url}: {e}")
             return False
     
+    @staticmethod
+    def has_image(book_id: int) -> bool:
+        """Есть ли у книги обложка (без загрузки данных изображения)."""
+        return db.session.query(BookBase.query.filter(
+            BookBase.id == book_id, BookBase.image_data.isnot(None)
+        ).exists()).scalar()
+
     @staticmethod
     def get_book_with_image(book_id: int) -> Optional[BookBase]:
         """Получение книги с данными изображения."""
@@ -151,6 +401,18 @@ class BookService:
         book = BookBase.query.get(book_id)
         return book.image_data if book else None
     
+    @staticmethod
+    def get_images_data(book_ids: List[int]) -> Dict[int, bytes]:
+        """Получение данных изображений нескольких книг одним запросом."""
+        if not book_ids:
+            return {}
+
+        rows = db.session.query(BookBase.id, BookBase.image_data).filter(
+            BookBase.id.in_(book_ids),
+            BookBase.image_data.isnot(None)
+        )
+        return {book_id: image_data for book_id, image_data in rows}
+    
     @staticmethod
     def update_book_image(book_id: int, image_data: bytes, image_url: str = None, image_type: str = None) -> bool:
         """Обновление изображения книги."""
@@ -158,14 +420,93 @@ class BookService:
         if book:
             book.set_image(image_data, image_url, image_type)
             db.session.commit()
+            ReadCache.invalidate()
             return True
         return False
     
     @staticmethod
     def get_book(book_id: int) -> Optional[BookBase]:
-        """Получение книги по ID."""
-        return BookBase.query.get(book_id)
+        """Получение книги по ID (через кеш чтения, изображение загружается при обращении)."""
+        values = ReadCache.get_or_load('get_book', book_id, lambda: BookService._load_book_values(book_id))
+        return BookService._attach(values) if values is not None else None
+
+    @staticmethod
+    def _load_book_values(book_id: int) -> Optional[Dict[str, Any]]:
+        """Значения колонок книги для кеша чтения (без данных изображений, даты — в ISO 8601)."""
+        book = db.session.get(BookBase, book_id, options=[defer(BookBase.image_data)])
+        if book is None:
+            return None
+        values = {}
+        for column in BookBase.__table__.columns:
+            if isinstance(column.type, db.LargeBinary):
+                continue
+            value = getattr(book, column.name)
+            values[column.name] = value.isoformat() if isinstance(value, datetime) else value
+        return values
     
+    @staticmethod
+    def update_book_characteristics(book_id: int, characteristics: Dict[str, Any]) -> bool:
+        """Обновление характеристик книги (например, после повторного парсинга или правки).
+
+        Переданные характеристики добавляются к сохраненным или заменяют
+        их. Поля книги, соответствующие известным характеристикам
+        (BookCharacteristick), обновляются, если характеристика передана.
+
+        Returns:
+            False, если книга не найдена.
+        """
+        book = BookBase.query.get(book_id)
+        if not book:
+            return False
+
+        processed_data = BookService.process_raw_data(characteristics)
+        fields = [field for key, names in BookService.CHARACTERISTIC_FIELDS.items() if key in characteristics
+                  for field in names]
+        BookService._update_book_from_dict(book, {field: processed_data.get(field) for field in fields})
+
+        BookService._set_characteristics(book, BookService.extract_characteristics(characteristics))
+
+        db.session.commit()
+        ReadCache.invalidate()
+        return True
+
+    @staticmethod
+    def get_books_by_characteristic(key: str, value: str, fields: Sequence[str] = None) -> List[BookBase]:
+        """Книги с заданным значением характеристики (без данных изображений).
+
+        fields — загрузить только колонки указанных полей BookBase.to_dict.
+        """
+        options = load_only(*BookBase.dict_columns(fields)) if fields else defer(BookBase.image_data)
+        return BookService.build_characteristic_query(key, value).options(options).order_by(BookBase.id).all()
+
+    @staticmethod
+    def build_characteristic_query(key: str, value: str):
+        """Запрос книг с заданным значением характеристики."""
+        book_ids = db.session.query(BookCharacteristicValue.book_id).filter(
+            BookCharacteristicValue.key == key,
+            BookCharacteristicValue.value == value
+        )
+        return BookBase.query.filter(BookBase.id.in_(book_ids.scalar_subquery()))
+
+    @staticmethod
+    def get_unique_characteristic_values(key: str, with_counts: bool = False) -> List[Any]:
+        """Уникальные значения характеристики по возрастанию (через кеш чтения).
+
+        with_counts — пары (значение, число книг).
+        """
+        values = ReadCache.get_or_load('get_unique_characteristic_values', key, lambda: [
+            tuple(row) for row in db.session.query(
+                BookCharacteristicValue.value, func.count(BookCharacteristicValue.book_id)
+            ).filter(
+                BookCharacteristicValue.key == key,
+                BookCharacteristicValue.value.isnot(None)
+            ).group_by(BookCharacteristicValue.value).order_by(BookCharacteristicValue.value)
+        ])
+
+        if with_counts:
+            return [(value, count) for value, count in values]
+        return [value for value, _ in values]
+
     @staticmethod
     def get_book_by_url(url: str) -> Optional[BookBase]:
         """Получение книги по URL."""
@@ -173,16 +514,104 @@ class BookService:
     
     @staticmethod
     def get_all_books() -> List[BookBase]:
-        """Получение всех книг."""
-        return BookBase.query.all()
+        """Получение всех книг (изображения загружаются при обращении).
+
+        Список не кешируется: восстановление тысяч объектов из кеша
+        медленнее, чем запрос к БД.
+        """
+        return BookBase.query.options(defer(BookBase.image_data)).order_by(BookBase.id).all()
+
+    @staticmethod
+    def _attach(values: Dict[str, Any]) -> BookBase:
+        """Книга из значений колонок в кеше, добавленная в текущую сессию без запроса к БД.
+
+        Не сохраненные в кеше колонки (изображения) и характеристики
+        загружаются при обращении.
+        """
+        book = db.session.identity_map.get(db.session.identity_key(BookBase, values['id']))
+        if book is not None:
+            return book
+
+        values = dict(values)
+        for column in BookBase.__table__.columns:
+            if isinstance(column.type, db.DateTime) and values.get(column.name):
+                values[column.name] = datetime.fromisoformat(values[column.name])
+        book = BookBase(**values)
+        make_transient_to_detached(book)
+        return db.session.merge(book, load=False)
     
+    @staticmethod
+    def has_books(query=None) -> bool:
+        """Проверка наличия хотя бы одной книги (в том числе в выборке query)."""
+        query = query if query is not None else BookBase.query
+        return query.with_entities(BookBase.id).first() is not None
+
+    @staticmethod
+    def count_books(query=None, with_images: bool = False) -> int:
+        """Количество книг в выборке query (with_images — только с обложкой).
+
+        Число всех книг (без query) читается через кеш чтения.
+        """
+        if query is None:
+            return ReadCache.get_or_load('count_books', with_images,
+                                         lambda: BookService._count_books(BookBase.query, with_images))
+        return BookService._count_books(query, with_images)
+
+    @staticmethod
+    def _count_books(query, with_images: bool) -> int:
+        if with_images:
+            query = query.filter(BookBase.image_data.isnot(None))
+        return query.with_entities(func.count(BookBase.id)).scalar()
+
+    @staticmethod
+    def get_dataset_version() -> str:
+        """Версия данных каталога.
+
+        Меняется при любом добавлении, изменении или удалении книги:
+        число книг, последняя дата изменения и последняя запись об удалении.
+        """
+        count, last_updated = db.session.query(func.count(BookBase.id), func.max(BookBase.updated_at)).one()
+        last_deleted = db.session.query(func.max(BookTombstone.id)).scalar()
+        return f"{count}-{last_updated.isoformat() if last_updated else 0}-{last_deleted or 0}"
+
+    @staticmethod
+    def iter_books_batches(query=None, batch_size: int = 500) -> Iterator[List[BookBase]]:
+        """Чтение книг пачками по возрастанию id (keyset), без данных изображений."""
+        query = query if query is not None else BookBase.query
+        query = query.options(defer(BookBase.image_data))
+
+        last_id = 0
+        while True:
+            books = query.filter(BookBase.id > last_id).order_by(BookBase.id).limit(batch_size).all()
+            if not books:
+                break
+
+            yield books
+
+            if len(books) < batch_size:
+                break
+            last_id = books[-1].id
+
+    @staticmethod
+    def stream_books(query=None, fields: Sequence[str] = None, batch_size: int = None) -> Iterable:
+        """Потоковое чтение книг по возрастанию id.
+
+        Возвращает строки выборки с колонками полей fields (для
+        BookBase.serialize). Строки читаются из курсора БД пачками по
+        batch_size (yield_per), поэтому память не зависит от числа книг.
+        Запрос выполняется при начале перебора.
+        """
+        query = query if query is not None else BookBase.query
+        return query.with_entities(*BookBase.dict_columns(fields)).order_by(BookBase.id).yield_per(
+            batch_size or BookService.STREAM_BATCH_SIZE
+        )
+
     @staticmethod
     def delete_book(book_id: int) -> bool:
         """Удаление книги по ID."""
         book = BookBase.query.get(book_id)
         if book:
-            db.session.delete(book)
-            db.session.commit()
+            BookService._delete(book)
             return True
         return False
     
@@ -191,10 +620,17 @@ class BookService:
         """Удаление книги по URL."""
         book = BookBase.query.filter_by(url=url).first()
         if book:
-            db.session.delete(book)
-            db.session.commit()
+            BookService._delete(book)
             return True
         return False
+
+    @staticmethod
+    def _delete(book: BookBase) -> None:
+        """Удаление книги с записью об удалении для инкрементального экспорта."""
+        db.session.add(BookTombstone(book_id=book.id, url=book.url))
+        db.session.delete(book)
+        db.session.commit()
+        ReadCache.invalidate()
     
     @staticmethod
     def search_books(query: str) -> List[BookBase]:
@@ -202,25 +638,70 @@ class BookService:
         if not query:
             return []
         
-        search_pattern = f"%{query}%"
-        return BookBase.query.filter(
-            or_(
-                BookBase.name.ilike(search_pattern),
-                BookBase.authors.ilike(search_pattern),
-                BookBase.subject.ilike(search_pattern),
-                BookBase.publisher.ilike(search_pattern),
-                BookBase.description.ilike(search_pattern)
-            )
-        ).all()
-    
+        return BookBase.query.filter(BookService._search_condition(query)).all()
+
+    @staticmethod
+    def _search_condition(query: str):
+        """Условие полнотекстового поиска по текстовым полям книги."""
+        return SearchService.condition(query)
+
     @staticmethod
     def book_exists(url: str) -> bool:
-        """Проверка существования книги по URL."""
-        return BookBase.query.filter_by(url=url).first() is not None
+        """Проверка существования книги по URL (через кеш чтения)."""
+        return ReadCache.get_or_load('book_exists', url, lambda: db.session.query(
+            BookBase.query.filter_by(url=url).exists()
+        ).scalar())
     
+    @staticmethod
+    def get_books_page(limit: int = None, cursor: str = None, query=None, with_total: bool = False,
+                       fields: Sequence[str] = None) -> Dict[str, Any]:
+        """Страница книг по возрастанию id (keyset), без данных изображений.
+
+        Следующая страница выбирается условием id > id последней книги по
+        первичному ключу, поэтому время выборки не зависит от глубины, а
+        вставки между запросами не сдвигают страницы. id растет вместе с
+        created_at, но, в отличие от него, уникален и не бывает пустым.
+
+        Если заданы fields (поля BookBase.to_dict), из БД читаются только
+        нужные для них колонки, а books содержит строки выборки для
+        BookBase.serialize вместо объектов.
+
+        Returns:
+            Словарь с books, next_cursor (None на последней странице) и,
+            если with_total, общим числом книг total.
+
+        Raises:
+            InvalidCursorError: курсор поврежден.
+        """
+        limit = min(limit or Pagination.DEFAULT_LIMIT, Pagination.MAX_LIMIT)
+        position = Pagination.decode_cursor(cursor, 'id')
+        query = query if query is not None else BookBase.query
+
+        if fields is not None:
+            page_query = query.with_entities(*BookBase.dict_columns(fields))
+        else:
+            page_query = query.options(defer(BookBase.image_data))
+        if position is not None:
+            page_query = page_query.filter(BookBase.id > position['id'])
+        # Лишняя запись показывает, есть ли следующая страница, без COUNT(*)
+        books = page_query.order_by(BookBase.id).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            next_cursor = Pagination.encode_cursor({'id': books[-1].id})
+
+        page = {'books': books, 'next_cursor': next_cursor}
+        if with_total:
+            page['total'] = BookService.count_books(query)
+        return page
+
     @staticmethod
     def get_books_paginated(page: int = 1, per_page: int = 20) -> Dict[str, Any]:
-        """Получение книг с пагинацией."""
+        """Получение книг с пагинацией по номеру страницы (OFFSET).
+
+        Для больших каталогов используйте get_books_page.
+        """
         pagination = BookBase.query.paginate(
             page=page, 
             per_page=per_page, 
@@ -238,23 +719,56 @@ class BookService:
     @staticmethod
     def get_books_by_filters(filters: Dict[str, Any]) -> List[BookBase]:
         """Получение книг с фильтрацией."""
-        query = BookBase.query
-        
+        return BookService.build_filters_query(filters).all()
+
+    @staticmethod
+    def build_filters_query(filters: Dict[str, Any], query=None):
+        """Запрос книг с фильтрацией.
+
+        Поля модели сравниваются на равенство, class_min и class_max отбирают
+        книги, диапазон классов которых пересекается с заданным, q — поиск
+        подстроки по тексту.
+        """
+        query = query if query is not None else BookBase.query
+
         for field, value in filters.items():
-            if value is not None and hasattr(BookBase, field):
+            if value is None:
+                continue
+            if field == 'class_min':
+                query = query.filter(func.coalesce(BookBase.class_to, BookBase.class_from) >= value)
+            elif field == 'class_max':
+                query = query.filter(BookBase.class_from <= value)
+            elif field == 'q':
+                query = query.filter(BookService._search_condition(value))
+            elif hasattr(BookBase, field):
                 query = query.filter(getattr(BookBase, field) == value)
-        
-        return query.all()
+
+        return query
     
     @staticmethod
-    def get_unique_values(field: str) -> List[Any]:
-        """Получение уникальных значений поля."""
-        if hasattr(BookBase, field):
-            values = db.session.query(
-                getattr(BookBase, field)
-            ).filter(
-                getattr(BookBase, field).isnot(None)
-            ).distinct().all()
-            
-            return [value[0] for value in values if value[0] is not None]
-        return []
\ No newline at end of file
+    def get_unique_values(field: str, query=None, with_counts: bool = False) -> List[Any]:
+        """Получение уникальных значений поля (в том числе в выборке query).
+
+        Значения считаются в БД через GROUP BY и возвращаются по
+        возрастанию; with_counts — пары (значение, число книг). Значения
+        по всем книгам (без query) читаются через кеш чтения.
+        """
+        if not hasattr(BookBase, field):
+            return []
+
+        if query is None:
+            values = ReadCache.get_or_load('get_unique_values', field,
+                                           lambda: BookService._count_values(field, BookBase.query))
+        else:
+            values = BookService._count_values(field, query)
+
+        if with_counts:
+            return [(value, count) for value, count in values]
+        return [value for value, _ in values]
+
+    @staticmethod
+    def _count_values(field: str, query) -> List[tuple]:
+        column = getattr(BookBase, field)
+        return [tuple(row) for row in query.with_entities(column, func.count(BookBase.id)).filter(
+            column.isnot(None)
+        ).group_by(column).order_by(column)]
@@ -0,0 +1,85 @@
+"""Лента изменений каталога для инкрементальной синхронизации."""
+
+from typing import Any, Dict, List
+
+from models import BookBase, BookTombstone, db
+from .pagination import InvalidCursorError, Pagination
+
+
+class ChangeFeedService:
+    """Лента изменений книг: измененные и удаленные книги по порядку.
+
+    Каждая запись книги и каждое удаление (book_tombstones) получают
+    порядковый номер change_seq из общего счетчика внутри пишущей
+    транзакции. Номера растут в порядке фиксации транзакций, поэтому
+    изменение, зафиксированное после выдачи курсора, всегда попадает в
+    ленту — даже если его updated_at меньше. Изменения и удаления читаются
+    по индексам change_seq и объединяются по номеру. Курсор хранит номер
+    последнего отданного изменения, а стоимость запроса пропорциональна
+    числу изменений, а не размеру каталога.
+
+    Книга, изменявшаяся несколько раз между запросами, попадает в ленту
+    один раз — с последним номером изменения.
+    """
+
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 5000
+
+    @staticmethod
+    def get_changes(cursor: str = None, limit: int = None) -> Dict[str, Any]:
+        """Изменения после позиции cursor (None — с начала каталога).
+
+        Returns:
+            Словарь с changes — списком изменений (id, url, op — upsert или
+            delete, at — время изменения), next_cursor — позицией после
+            последнего изменения (передается в следующий запрос, даже если
+            изменений больше нет) и has_more — есть ли еще изменения.
+
+        Raises:
+            InvalidCursorError: курсор поврежден.
+        """
+        limit = min(limit or ChangeFeedService.DEFAULT_LIMIT, ChangeFeedService.MAX_LIMIT)
+        position = Pagination.decode_cursor(cursor, 'seq') or {'seq': 0}
+        if not isinstance(position['seq'], int):
+            raise InvalidCursorError('Некорректный cursor')
+
+        updated = ChangeFeedService._read_updated(position['seq'], limit + 1)
+        deleted = ChangeFeedService._read_deleted(position['seq'], limit + 1)
+
+        # Слияние двух упорядоченных выборок по номеру изменения
+        changes = sorted(updated + deleted, key=lambda change: change['seq'])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        if changes:
+            position = {'seq': changes[-1]['seq']}
+
+        return {
+            'changes': [ChangeFeedService._to_dict(change) for change in changes],
+            'next_cursor': Pagination.encode_cursor(position),
+            'has_more': has_more,
+        }
+
+    @staticmethod
+    def _read_updated(seq: int, limit: int) -> List[Dict[str, Any]]:
+        rows = db.session.query(BookBase.id, BookBase.url, BookBase.updated_at, BookBase.change_seq).filter(
+            BookBase.change_seq > seq
+        ).order_by(BookBase.change_seq).limit(limit)
+        return [{'seq': row.change_seq, 'id': row.id, 'url': row.url, 'op': 'upsert', 'at': row.updated_at}
+                for row in rows]
+
+    @staticmethod
+    def _read_deleted(seq: int, limit: int) -> List[Dict[str, Any]]:
+        rows = db.session.query(
+            BookTombstone.book_id, BookTombstone.url, BookTombstone.deleted_at, BookTombstone.change_seq
+        ).filter(BookTombstone.change_seq > seq).order_by(BookTombstone.change_seq).limit(limit)
+        return [{'seq': row.change_seq, 'id': row.book_id, 'url': row.url, 'op': 'delete', 'at': row.deleted_at}
+                for row in rows]
+
+    @staticmethod
+    def _to_dict(change: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': change['id'],
+            'url': change['url'],
+            'op': change['op'],
+            'at': change['at'].isoformat() if change['at'] else None,
+        }
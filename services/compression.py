@@ -0,0 +1,123 @@
+"""Сжатие HTTP ответов."""
+
+from typing import Iterable, Iterator, List, Optional
+import zlib
+
+from flask import Flask, Response, current_app, request
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен — только gzip
+    brotli = None
+
+
+class ResponseCompressor:
+    """Сжатие ответов gzip или brotli по заголовку Accept-Encoding.
+
+    Сжимаются только текстовые ответы (HTML, JSON, NDJSON, CSV, JS, CSS)
+    с кодом 200 и размером от COMPRESS_MIN_SIZE байт. Изображения и
+    архивы уже сжаты и передаются как есть, так же как файлы из
+    send_file (direct_passthrough) — для них работают запросы диапазонов.
+
+    Потоковые ответы сжимаются по фрагментам со сбросом буфера после
+    каждого, поэтому клиент получает данные по мере формирования.
+    """
+
+    DEFAULT_ENCODINGS = 'br,gzip'
+    DEFAULT_MIN_SIZE = 500
+    DEFAULT_GZIP_LEVEL = 6
+    DEFAULT_BROTLI_QUALITY = 4
+    MIMETYPES = frozenset((
+        'text/html', 'text/plain', 'text/csv', 'text/css', 'text/javascript', 'application/javascript',
+        'application/json', 'application/x-ndjson',
+    ))
+
+    @staticmethod
+    def init_app(app: Flask) -> None:
+        """Подключение сжатия ко всем ответам приложения."""
+        app.after_request(ResponseCompressor.compress)
+
+    @staticmethod
+    def get_encodings() -> List[str]:
+        """Доступные алгоритмы по убыванию предпочтения (COMPRESS_ENCODINGS)."""
+        value = current_app.config.get('COMPRESS_ENCODINGS', ResponseCompressor.DEFAULT_ENCODINGS)
+        encodings = [encoding.strip() for encoding in value.split(',') if encoding.strip()]
+        return [encoding for encoding in encodings if encoding == 'gzip' or (encoding == 'br' and brotli)]
+
+    @staticmethod
+    def choose_encoding(accept_encodings) -> Optional[str]:
+        """Алгоритм сжатия для клиента: лучший по качеству в Accept-Encoding, при равенстве — по порядку в настройке."""
+        best = None
+        best_quality = 0
+        for encoding in ResponseCompressor.get_encodings():
+            quality = accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    @staticmethod
+    def compress(response: Response) -> Response:
+        """Сжатие ответа, если клиент это поддерживает (обработчик after_request)."""
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers or response.mimetype not in ResponseCompressor.MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = ResponseCompressor.choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        compressor = ResponseCompressor._create_compressor(encoding)
+        if response.is_streamed:
+            chunks = response.response
+            response.response = ClosingIterator(ResponseCompressor._compress_stream(chunks, compressor),
+                                                getattr(chunks, 'close', None))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            min_size = int(current_app.config.get('COMPRESS_MIN_SIZE', ResponseCompressor.DEFAULT_MIN_SIZE))
+            if len(data) < min_size:
+                return response
+            response.set_data(compressor.compress(data) + compressor.flush())
+
+        response.headers['Content-Encoding'] = encoding
+        # Сжатое представление отличается побайтово от исходного
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    @staticmethod
+    def _compress_stream(chunks: Iterable, compressor) -> Iterator[bytes]:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    def _create_compressor(encoding: str):
+        if encoding == 'br':
+            quality = int(current_app.config.get('COMPRESS_BROTLI_QUALITY', ResponseCompressor.DEFAULT_BROTLI_QUALITY))
+            return _BrotliCompressor(quality)
+        level = int(current_app.config.get('COMPRESS_GZIP_LEVEL', ResponseCompressor.DEFAULT_GZIP_LEVEL))
+        # wbits=31 — формат gzip (заголовок и контрольная сумма)
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+class _BrotliCompressor:
+    """Сжатие brotli с интерфейсом zlib.compressobj (compress/flush)."""
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self, mode: int = zlib.Z_FINISH) -> bytes:
+        if mode == zlib.Z_FINISH:
+            return self._compressor.finish()
+        return self._compressor.flush()
@@ -0,0 +1,123 @@
+"""Кеш готовых выгрузок экспорта."""
+
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+import hashlib
+import json
+import os
+import tempfile
+
+from flask import current_app
+
+
+class ExportCache:
+    """Кеш готовых архивов экспорта на диске с вытеснением LRU.
+
+    Архив сохраняется под ключом, зависящим от версии данных каталога и
+    параметров экспорта. Пока данные не менялись, повторный экспорт
+    отдается готовым файлом. Время последнего обращения к файлу
+    обновляется при каждом попадании и используется для вытеснения.
+
+    Файл выгрузки хранится с расширением своего формата (<ключ>.zip,
+    <ключ>.ndjson и т. д.), метаданные — в <ключ>.json.
+    """
+
+    DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+    METADATA_SUFFIX = '.json'
+    TEMP_SUFFIX = '.part'
+
+    @staticmethod
+    def get_directory() -> str:
+        """Каталог кеша (по умолчанию instance/export_cache)."""
+        directory = current_app.config.get('EXPORT_CACHE_DIR') or os.path.join(
+            current_app.instance_path, 'export_cache'
+        )
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @staticmethod
+    def get_max_size() -> int:
+        """Максимальный суммарный размер архивов в кеше (0 — кеш отключен)."""
+        return int(current_app.config.get('EXPORT_CACHE_MAX_SIZE', ExportCache.DEFAULT_MAX_SIZE))
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return ExportCache.get_max_size() > 0
+
+    @staticmethod
+    def make_key(version: str, **params) -> str:
+        """Ключ кеша по версии данных и параметрам экспорта."""
+        payload = json.dumps({'version': version, 'params': params}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get(key: str, extension: str = 'zip') -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Путь к готовому файлу выгрузки и его метаданные, если файл есть в кеше."""
+        archive_path, metadata_path = ExportCache._paths(key, extension)
+        try:
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            # Отмечаем обращение для LRU
+            os.utime(archive_path)
+        except (OSError, ValueError):
+            return None
+        return archive_path, metadata
+
+    @staticmethod
+    def store(key: str, chunks: Iterable[bytes], metadata: Dict[str, Any],
+              is_valid=None, extension: str = 'zip') -> Iterator[bytes]:
+        """Передача выгрузки клиенту с одновременной записью в кеш.
+
+        Файл попадает в кеш, только если выдан полностью и is_valid()
+        (например, проверка, что версия данных не изменилась) вернул True.
+        """
+        archive_path, metadata_path = ExportCache._paths(key, extension)
+        directory = os.path.dirname(archive_path)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=ExportCache.TEMP_SUFFIX)
+
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in chunks:
+                    temp_file.write(chunk)
+                    yield chunk
+
+            if is_valid is None or is_valid():
+                with open(metadata_path, 'w', encoding='utf-8') as f:
+                    json.dump(metadata, f, ensure_ascii=False)
+                os.replace(temp_path, archive_path)
+                ExportCache.evict()
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @staticmethod
+    def evict(max_size: int = None) -> None:
+        """Удаление давно не использованных выгрузок сверх лимита размера."""
+        max_size = ExportCache.get_max_size() if max_size is None else max_size
+        directory = ExportCache.get_directory()
+
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith((ExportCache.METADATA_SUFFIX, ExportCache.TEMP_SUFFIX)):
+                continue
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            key, _, extension = name.partition('.')
+            entries.append((stat.st_mtime, stat.st_size, key, extension))
+
+        total_size = sum(size for _, size, _, _ in entries)
+        for _, size, key, extension in sorted(entries):
+            if total_size <= max_size:
+                break
+            for path in ExportCache._paths(key, extension):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total_size -= size
+
+    @staticmethod
+    def _paths(key: str, extension: str) -> Tuple[str, str]:
+        base_path = os.path.join(ExportCache.get_directory(), key)
+        return f'{base_path}.{extension}', base_path + ExportCache.METADATA_SUFFIX
@@ -0,0 +1,241 @@
+"""Фоновые задачи экспорта."""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from flask import Flask, current_app
+from sqlalchemy import or_
+
+from models import ExportJob, db
+from .book_service import BookService
+from .export_service import ExportOptions, ExportService
+
+
+class ExportJobService:
+    """Экспорт каталога вне HTTP запроса.
+
+    Задача сохраняется в таблице export_jobs и выполняется в пуле потоков
+    с собственным контекстом приложения. Файл выгрузки пишется в каталог
+    EXPORT_JOB_DIR, прогресс (книги, обложки, байты) периодически
+    сохраняется в задаче. Готовые файлы удаляются после EXPORT_JOB_RETENTION
+    секунд; устаревшие задачи проверяются при создании и чтении задач.
+
+    Пул потоков живет в процессе приложения, который записывается в задачу
+    как владелец (owner). Пока задачи процесса выполняются, прогресс
+    обновляет heartbeat_at всех его незавершенных задач. Задачи другого
+    процесса без сигнала жизни дольше EXPORT_JOB_HEARTBEAT_TIMEOUT секунд
+    (процесс перезапущен или остановлен) при проверке помечаются failed,
+    а их файлы удаляются. Готовой задача отмечается условным UPDATE только
+    из состояния running, поэтому прерванная задача не становится completed.
+    """
+
+    DEFAULT_WORKERS = 2
+    DEFAULT_RETENTION = 24 * 60 * 60
+    DEFAULT_HEARTBEAT_TIMEOUT = 300
+    # Как часто сохранять прогресс в БД, секунд
+    PROGRESS_INTERVAL = 1.0
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+    _owner: Optional[str] = None
+    _owner_pid: Optional[int] = None
+
+    @staticmethod
+    def get_directory() -> str:
+        """Каталог файлов выгрузки (по умолчанию instance/export_jobs)."""
+        directory = current_app.config.get('EXPORT_JOB_DIR') or os.path.join(
+            current_app.instance_path, 'export_jobs'
+        )
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @staticmethod
+    def get_retention() -> timedelta:
+        """Время хранения готового файла."""
+        return timedelta(seconds=int(current_app.config.get('EXPORT_JOB_RETENTION',
+                                                            ExportJobService.DEFAULT_RETENTION)))
+
+    @staticmethod
+    def get_heartbeat_timeout() -> timedelta:
+        """Время без сигнала жизни, после которого задача другого процесса считается прерванной."""
+        return timedelta(seconds=int(current_app.config.get('EXPORT_JOB_HEARTBEAT_TIMEOUT',
+                                                            ExportJobService.DEFAULT_HEARTBEAT_TIMEOUT)))
+
+    @staticmethod
+    def get_owner() -> str:
+        """Идентификатор текущего процесса как владельца задач.
+
+        Пересоздается после fork, чтобы рабочие процессы не делили владельца.
+        """
+        with ExportJobService._executor_lock:
+            if ExportJobService._owner_pid != os.getpid():
+                ExportJobService._owner_pid = os.getpid()
+                ExportJobService._owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+            return ExportJobService._owner
+
+    @staticmethod
+    def get_executor() -> ThreadPoolExecutor:
+        """Общий пул потоков задач экспорта."""
+        with ExportJobService._executor_lock:
+            if ExportJobService._executor is None:
+                workers = int(current_app.config.get('EXPORT_JOB_WORKERS', ExportJobService.DEFAULT_WORKERS))
+                ExportJobService._executor = ThreadPoolExecutor(max_workers=workers,
+                                                                thread_name_prefix='export-job')
+            return ExportJobService._executor
+
+    @staticmethod
+    def create_job(options: ExportOptions) -> ExportJob:
+        """Создание задачи экспорта (без запуска)."""
+        ExportJobService.expire_jobs()
+
+        job = ExportJob(status='pending', params=json.dumps(options.to_dict(), ensure_ascii=False),
+                        owner=ExportJobService.get_owner(), heartbeat_at=datetime.now())
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def submit(job: ExportJob) -> Future:
+        """Запуск задачи в пуле потоков."""
+        app = current_app._get_current_object()
+        return ExportJobService.get_executor().submit(ExportJobService.run_job, app, job.id)
+
+    @staticmethod
+    def get_job(job_id: int) -> Optional[ExportJob]:
+        ExportJobService.expire_jobs()
+        return db.session.get(ExportJob, job_id)
+
+    @staticmethod
+    def run_job(app: Flask, job_id: int) -> None:
+        """Выполнение задачи экспорта в отдельном контексте приложения."""
+        with app.app_context():
+            try:
+                job = db.session.get(ExportJob, job_id)
+                if job is None or job.status != 'pending':
+                    return
+                ExportJobService._run(job)
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def expire_jobs() -> int:
+        """Удаление файлов задач, у которых истек срок хранения.
+
+        Задачи других процессов без сигнала жизни помечаются failed.
+
+        Returns:
+            Количество устаревших и прерванных задач.
+        """
+        now = datetime.now()
+        jobs = ExportJob.query.filter(
+            ExportJob.status == 'completed',
+            ExportJob.expires_at < now
+        ).all()
+        stale_jobs = ExportJob.query.filter(
+            ExportJob.status.in_(('pending', 'running')),
+            or_(ExportJob.owner.is_(None), ExportJob.owner != ExportJobService.get_owner()),
+            or_(ExportJob.heartbeat_at.is_(None),
+                ExportJob.heartbeat_at < now - ExportJobService.get_heartbeat_timeout())
+        ).all()
+
+        for job in jobs:
+            ExportJobService._remove_file(job.file_path)
+            job.status = 'expired'
+            job.file_path = None
+
+        for job in stale_jobs:
+            ExportJobService._remove_file(job.file_path)
+            job.status = 'failed'
+            job.error = 'Задача прервана: процесс приложения не отвечает'
+            job.file_path = None
+            job.completed_at = now
+
+        if jobs or stale_jobs:
+            db.session.commit()
+        return len(jobs) + len(stale_jobs)
+
+    @staticmethod
+    def _heartbeat() -> None:
+        """Сигнал жизни для всех незавершенных задач текущего процесса (в текущей транзакции)."""
+        ExportJob.query.filter(
+            ExportJob.owner == ExportJobService.get_owner(),
+            ExportJob.status.in_(('pending', 'running'))
+        ).update({'heartbeat_at': datetime.now()}, synchronize_session=False)
+
+    @staticmethod
+    def _run(job: ExportJob) -> None:
+        options = ExportOptions.from_dict(json.loads(job.params))
+        query = options.build_query()
+        file_path = os.path.join(ExportJobService.get_directory(), f'export_{job.id}.{options.extension}')
+
+        last_saved = time.monotonic()
+
+        def on_progress(books_written: int, images_written: int) -> None:
+            nonlocal last_saved
+            job.books_written = books_written
+            job.images_written = images_written
+            if time.monotonic() - last_saved >= ExportJobService.PROGRESS_INTERVAL:
+                ExportJobService._heartbeat()
+                db.session.commit()
+                last_saved = time.monotonic()
+
+        try:
+            job.status = 'running'
+            job.started_at = datetime.now()
+            job.file_path = file_path
+            job.owner = ExportJobService.get_owner()
+            job.heartbeat_at = job.started_at
+
+            export = ExportService.start_export(options.since)
+            job.export_id = export.id
+            export_query = ExportService.build_export_query(query, export)
+            job.books_total = BookService.count_books(export_query)
+            if options.format == 'csv' or options.embed_images:
+                job.images_total = BookService.count_books(export_query, with_images=True)
+            db.session.commit()
+
+            bytes_written = 0
+            with open(file_path, 'wb') as f:
+                for chunk in ExportService.stream_books(options.format, query, options.embed_images,
+                                                        export=export, progress=on_progress):
+                    f.write(chunk)
+                    bytes_written += len(chunk)
+                    job.bytes_written = bytes_written
+
+            db.session.flush()
+            completed_at = datetime.now()
+            # Задачу могли пометить failed в другом процессе: ее файл уже удален
+            completed = ExportJob.query.filter(
+                ExportJob.id == job.id,
+                ExportJob.status == 'running'
+            ).update({
+                'status': 'completed',
+                'completed_at': completed_at,
+                'expires_at': completed_at + ExportJobService.get_retention(),
+            }, synchronize_session=False)
+            db.session.commit()
+            if not completed:
+                ExportJobService._remove_file(file_path)
+        except Exception as e:
+            db.session.rollback()
+            ExportJobService._remove_file(file_path)
+            job.status = 'failed'
+            job.error = str(e)
+            job.file_path = None
+            job.completed_at = datetime.now()
+            db.session.commit()
+
+    @staticmethod
+    def _remove_file(path: Optional[str]) -> None:
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,11 +1,231 @@
+import base64
 import csv
 import io
-from  zipfile import ZipFile, ZIP_DEFLATED
-from typing import List
-from models import BookBase, BookCharacteristick
-from services import BookService
+import json
+from  zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Iterator, Optional
+from flask import current_app
+from sqlalchemy import case, func
+from models import BookBase, BookCharacteristick, BookTombstone, ExportRecord, db
+from .book_service import BookService
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow не установлен — форматы parquet и arrow недоступны
+    pa = None
+    pq = None
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Приемник для потоковой записи ZIP.
+
+    Накапливает записанные ZipFile байты до очередной выдачи клиенту.
+    Буфер не поддерживает seek, поэтому ZipFile пишет размеры и CRC
+    записей в data descriptor после данных.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def pop(self) -> bytes:
+        """Забрать накопленные байты."""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+@dataclass
+class ExportOptions:
+    """Параметры экспорта из запроса.
+
+    Attributes:
+        since: Начало периода изменений для инкрементального экспорта
+        filters: Фильтры книг в формате BookService.build_filters_query
+        format: Формат выгрузки (csv, ndjson, parquet, arrow)
+        images: Обложки ссылкой по хешу (ref) или внутри выгрузки (embed)
+    """
+    since: Optional[datetime] = None
+    filters: Dict[str, Any] = field(default_factory=dict)
+    format: str = 'csv'
+    images: str = 'ref'
+
+    TEXT_FILTERS = ('subject', 'program', 'series', 'publisher', 'q')
+    CLASS_FILTERS = ('class_min', 'class_max')
+    IMAGE_MODES = ('ref', 'embed')
+
+    @classmethod
+    def from_args(cls, args) -> 'ExportOptions':
+        """Разбор параметров запроса: фильтры как на главной странице и since.
+
+        Raises:
+            ValueError: некорректный класс, since, формат или режим обложек.
+        """
+        export_format = (args.get('format') or 'csv').lower()
+        if export_format not in ExportService.FORMATS:
+            raise ValueError(f'Неизвестный формат экспорта: {export_format}')
+        if export_format in ExportService.COLUMNAR_FORMATS and pa is None:
+            raise ValueError(f'Формат {export_format} недоступен: не установлен pyarrow')
+
+        images = (args.get('images') or 'ref').lower()
+        if images not in cls.IMAGE_MODES:
+            raise ValueError(f'Неизвестный режим обложек: {images}')
+
+        filters = {}
+        for name in cls.TEXT_FILTERS:
+            value = (args.get(name) or '').strip()
+            if value:
+                filters[name] = value
+
+        # class — начальный класс книги, как в фильтре главной страницы;
+        # class_min/class_max — книги, диапазон классов которых пересекается с заданным
+        if args.get('class'):
+            filters['class_from'] = cls._parse_class(args.get('class'))
+        for name in cls.CLASS_FILTERS:
+            if args.get(name):
+                filters[name] = cls._parse_class(args.get(name))
+
+        since = ExportService.resolve_since(args.get('since'))
+        if since is not None and export_format in ExportService.COLUMNAR_FORMATS:
+            # В колоночных форматах негде передать список удаленных книг
+            raise ValueError(f'Инкрементальный экспорт недоступен для формата {export_format}')
+
+        return cls(since=since, filters=filters, format=export_format, images=images)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Параметры для сохранения (например, в фоновой задаче)."""
+        return {
+            'since': self.since.isoformat() if self.since else None,
+            'filters': self.filters,
+            'format': self.format,
+            'images': self.images,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ExportOptions':
+        since = data.get('since')
+        return cls(
+            since=datetime.fromisoformat(since) if since else None,
+            filters=data.get('filters') or {},
+            format=data.get('format', 'csv'),
+            images=data.get('images', 'ref'),
+        )
+
+    @staticmethod
+    def _parse_class(value: str) -> int:
+        try:
+            return int(value)
+        except ValueError as e:
+            raise ValueError(f'Некорректный класс: {value}') from e
+
+    def build_query(self):
+        """Запрос книг для экспорта (None — все книги)."""
+        return BookService.build_filters_query(self.filters) if self.filters else None
+
+    @property
+    def embed_images(self) -> bool:
+        return self.images == 'embed'
+
+    @property
+    def mimetype(self) -> str:
+        return ExportService.FORMATS[self.format][0]
+
+    @property
+    def extension(self) -> str:
+        return ExportService.FORMATS[self.format][1]
+
+
+# Обратный вызов прогресса экспорта: (выгружено книг, выгружено обложек)
+ProgressCallback = Callable[[int, int], None]
+
 
 class ExportService:
+    CSV_FILENAME = 'books_import.csv'
+    CSV_HEADERS = ['Image', 'Name', 'Authors', 'Series', 'ClassFrom', 'ClassTo', 'Subject',
+                   'Program', 'Publisher', 'Description', 'Type', 'File1', 'File2', 'TypeResource',
+                   'IsOVZ', 'TypePayResurse', 'UrlResurse', 'PublicationLanguage']
+    MANIFEST_FILENAME = 'export_manifest.json'
+    DEFAULT_BATCH_SIZE = 200
+    # Формат: (MIME тип, расширение файла)
+    FORMATS = {
+        'csv': ('application/zip', 'zip'),
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+        'parquet': ('application/vnd.apache.parquet', 'parquet'),
+        'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    }
+    COLUMNAR_FORMATS = ('parquet', 'arrow')
+    # Поля книги в NDJSON, Parquet и Arrow; обложка передается хешем и URL
+    RECORD_FIELDS = ('id', 'url', 'name', 'authors', 'series', 'class_from', 'class_to', 'subject',
+                     'program', 'publisher', 'description', 'part', 'type', 'type_resourse', 'is_ovz',
+                     'type_pay_resourse', 'publication_language', 'image_name', 'image_type',
+                     'image_url', 'image_hash', 'created_at', 'updated_at')
+    PARQUET_ROW_GROUP_SIZE = 10000
+    DEFAULT_PART_MAX_SIZE = 100 * 1024 * 1024
+    # Оценка служебных данных ZIP: заголовки записи CSV, строка заголовков, конец архива
+    PART_ARCHIVE_OVERHEAD = 1024
+    # Заголовки записи обложки (локальный, data descriptor, центральный каталог) без имени
+    PART_ENTRY_OVERHEAD = 128
+    # Текстовые колонки, попадающие в строку CSV
+    PART_TEXT_COLUMNS = ('name', 'authors', 'series', 'subject', 'program', 'publisher', 'description',
+                         'type', 'type_resourse', 'type_pay_resourse', 'url', 'publication_language',
+                         'image_name', 'image_type')
+    PART_CSV_ROW_OVERHEAD = 64
+
+    @staticmethod
+    def get_batch_size() -> int:
+        """Размер пачки книг, читаемой из БД при экспорте."""
+        return int(current_app.config.get('EXPORT_BATCH_SIZE', ExportService.DEFAULT_BATCH_SIZE))
+
+    @staticmethod
+    def get_part_max_size() -> int:
+        """Максимальный размер части архива при разбиении экспорта."""
+        return int(current_app.config.get('EXPORT_PART_MAX_SIZE', ExportService.DEFAULT_PART_MAX_SIZE))
+
+    @staticmethod
+    def resolve_since(value: Optional[str]) -> Optional[datetime]:
+        """Начало периода изменений по id предыдущего экспорта или дате ISO 8601.
+
+        Raises:
+            ValueError: экспорт не найден или не завершен, либо дата некорректна.
+        """
+        if not value:
+            return None
+
+        if value.isdigit():
+            export = db.session.get(ExportRecord, int(value))
+            if export is None or export.completed_at is None:
+                raise ValueError(f'Экспорт {value} не найден или не завершен')
+            return export.watermark
+
+        since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if since.tzinfo is not None:
+            # Даты в БД хранятся в локальном времени без часового пояса
+            since = since.astimezone().replace(tzinfo=None)
+        return since
+
+    @staticmethod
+    def start_export(since: Optional[datetime] = None) -> ExportRecord:
+        """Регистрация экспорта. Watermark фиксируется до чтения данных."""
+        export = ExportRecord(since=since, watermark=datetime.now())
+        db.session.add(export)
+        db.session.commit()
+        return export
+
     @staticmethod
     def export_books_to_zip(books: List[BookBase]) -> io.BytesIO:
         """Экспорт всех книг в ZIP архив"""
@@ -15,7 +235,7 @@ class ExportService:
             # Добавляем CSV файл
             csv_data = ExportService._create_csv_data(books)
             # ToDo: название файла csv вынести в настройки
-            zip_file.writestr('books_import.csv', csv_data)
+            zip_file.writestr(ExportService.CSV_FILENAME, csv_data)
 
             # Добавляем изображения
             ExportService._add_images_to_zip(zip_file, books)
@@ -23,6 +243,369 @@ class ExportService:
         zip_buffer.seek(0)
         return zip_buffer
 
+    @staticmethod
+    def stream_books(export_format: str = 'csv', query=None, embed_images: bool = False,
+                     batch_size: int = None, export: ExportRecord = None,
+                     progress: ProgressCallback = None) -> Iterator[bytes]:
+        """Потоковый экспорт книг в выбранном формате (см. FORMATS).
+
+        progress вызывается после каждой пачки с числом выгруженных книг и обложек.
+        """
+        if export_format == 'csv':
+            return ExportService.stream_books_zip(query, batch_size=batch_size, export=export, progress=progress)
+        if export_format == 'ndjson':
+            return ExportService.stream_books_ndjson(query, embed_images, batch_size, export, progress)
+        return ExportService.stream_books_columnar(export_format, query, embed_images, batch_size, export,
+                                                   progress)
+
+    @staticmethod
+    def stream_books_zip(query=None, batch_size: int = None,
+                         export: ExportRecord = None, progress: ProgressCallback = None) -> Iterator[bytes]:
+        """Потоковый экспорт книг в ZIP архив.
+
+        Книги читаются из БД пачками, архив отдается кусками по мере
+        формирования: сначала CSV, затем изображения. Расход памяти
+        определяется размером пачки, а не размером каталога.
+
+        CSV сжимается deflate, обложки уже сжаты и сохраняются без сжатия.
+
+        Если передан export, в архив добавляется манифест с id экспорта и
+        watermark, а при export.since выгружаются только книги, измененные
+        с этого момента, и список удаленных книг.
+        """
+        batch_size = batch_size or ExportService.get_batch_size()
+        query = ExportService.build_export_query(query, export)
+        yield from ExportService._stream_books_zip(query, batch_size, export, progress)
+
+    @staticmethod
+    def plan_parts(query=None, max_size: int = None, batch_size: int = 5000) -> List[Dict[str, int]]:
+        """Разбиение экспорта на части по диапазонам id.
+
+        Размер части оценивается без чтения обложек: длина обложки берется
+        через length() в БД, размер строки CSV — по длине текстовых полей
+        (по 2 байта на символ, без учета сжатия, то есть с запасом). Книги
+        набираются в часть по возрастанию id, пока оценка не превысит max_size.
+        Книга, которая одна больше max_size, попадает в отдельную часть.
+
+        При неизменной версии данных план детерминирован, поэтому части
+        можно формировать и скачивать независимо друг от друга.
+
+        Returns:
+            Список частей: номер (с 1), первый и последний id, число книг
+            и оценка размера в байтах.
+        """
+        max_size = max_size or ExportService.get_part_max_size()
+        query = query if query is not None else BookBase.query
+
+        text_size = sum(func.coalesce(func.length(getattr(BookBase, name)), 0)
+                        for name in ExportService.PART_TEXT_COLUMNS)
+        row_size = text_size * 2 + ExportService.PART_CSV_ROW_OVERHEAD
+        image_size = case(
+            (BookBase.image_data.isnot(None),
+             func.length(BookBase.image_data) + ExportService.PART_ENTRY_OVERHEAD),
+            else_=0
+        )
+
+        parts = []
+        current = None
+        last_id = 0
+        while True:
+            rows = query.with_entities(BookBase.id, row_size + image_size).filter(
+                BookBase.id > last_id
+            ).order_by(BookBase.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            for book_id, size in rows:
+                if current is not None and current['estimated_size'] + size > max_size:
+                    parts.append(current)
+                    current = None
+                if current is None:
+                    current = {
+                        'part': len(parts) + 1,
+                        'first_id': book_id,
+                        'last_id': book_id,
+                        'books_count': 0,
+                        'estimated_size': ExportService.PART_ARCHIVE_OVERHEAD,
+                    }
+                current['last_id'] = book_id
+                current['books_count'] += 1
+                current['estimated_size'] += size
+
+            if len(rows) < batch_size:
+                break
+            last_id = rows[-1][0]
+
+        if current is not None:
+            parts.append(current)
+        return parts
+
+    @staticmethod
+    def build_part_query(query, part: Dict[str, int]):
+        """Запрос книг одной части из plan_parts."""
+        query = query if query is not None else BookBase.query
+        return query.filter(BookBase.id.between(part['first_id'], part['last_id']))
+
+    @staticmethod
+    def _stream_books_zip(query, batch_size: int, export: Optional[ExportRecord], progress: Optional[ProgressCallback]) -> Iterator[bytes]:
+        buffer = _ZipStreamBuffer()
+        books_count = 0
+        images_count = 0
+        deleted_count = 0
+
+        with ZipFile(buffer, 'w', ZIP_DEFLATED) as zip_file:
+            with zip_file.open(ExportService.CSV_FILENAME, 'w') as csv_entry:
+                csv_text = io.TextIOWrapper(csv_entry, encoding='utf-8-sig', newline='', write_through=True)
+                csv_writer = csv.writer(csv_text)
+                csv_writer.writerow(ExportService.CSV_HEADERS)
+
+                for books in BookService.iter_books_batches(query, batch_size):
+                    for book in books:
+                        csv_writer.writerow(ExportService._book_to_csv_row(book))
+                    books_count += len(books)
+                    if progress:
+                        progress(books_count, images_count)
+
+                    chunk = buffer.pop()
+                    if chunk:
+                        yield chunk
+
+                # Запись в архиве закрывает with, а не TextIOWrapper
+                csv_text.detach()
+
+            for books in BookService.iter_books_batches(query, batch_size):
+                images_count += ExportService._add_images_to_zip(zip_file, books)
+                if progress:
+                    progress(books_count, images_count)
+
+                chunk = buffer.pop()
+                if chunk:
+                    yield chunk
+
+            if export is not None:
+                deleted_count = yield from ExportService._stream_manifest(zip_file, buffer, export, books_count)
+
+        # Центральный каталог архива
+        yield buffer.pop()
+
+        ExportService._complete_export(export, books_count, deleted_count)
+
+    @staticmethod
+    def stream_books_ndjson(query=None, embed_images: bool = False, batch_size: int = None,
+                            export: ExportRecord = None, progress: ProgressCallback = None) -> Iterator[bytes]:
+        """Потоковый экспорт книг в NDJSON: одна книга в строке.
+
+        Обложка передается полями image_hash и image_url, при embed_images —
+        дополнительно в поле image_data в base64. В инкрементальном режиме
+        после книг идут строки удаленных книг с полем deleted: true.
+        """
+        batch_size = batch_size or ExportService.get_batch_size()
+        query = ExportService.build_export_query(query, export)
+        books_count = 0
+        images_count = 0
+        deleted_count = 0
+
+        for books, images in ExportService._iter_books_with_images(query, batch_size, embed_images):
+            lines = []
+            for book in books:
+                record = {name: getattr(book, name) for name in ExportService.RECORD_FIELDS}
+                if embed_images:
+                    image_data = images.get(book.id)
+                    record['image_data'] = base64.b64encode(image_data).decode('ascii') if image_data else None
+                lines.append(json.dumps(record, ensure_ascii=False, default=ExportService._json_default))
+            books_count += len(books)
+            images_count += len(images)
+            if progress:
+                progress(books_count, images_count)
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+        if export is not None and export.since is not None:
+            tombstones = BookTombstone.query.filter(
+                BookTombstone.deleted_at >= export.since
+            ).order_by(BookTombstone.id).yield_per(1000)
+
+            lines = []
+            for tombstone in tombstones:
+                lines.append(json.dumps({
+                    'id': tombstone.book_id,
+                    'url': tombstone.url,
+                    'deleted': True,
+                    'deleted_at': tombstone.deleted_at.isoformat(),
+                }, ensure_ascii=False))
+                deleted_count += 1
+
+                if len(lines) >= 1000:
+                    yield ('\n'.join(lines) + '\n').encode('utf-8')
+                    lines = []
+            if lines:
+                yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+        ExportService._complete_export(export, books_count, deleted_count)
+
+    @staticmethod
+    def stream_books_columnar(export_format: str = 'parquet', query=None, embed_images: bool = False,
+                              batch_size: int = None, export: ExportRecord = None,
+                              progress: ProgressCallback = None) -> Iterator[bytes]:
+        """Потоковый экспорт книг в Parquet или Arrow IPC stream.
+
+        Каждая пачка книг превращается в RecordBatch. В Arrow пачки пишутся
+        сразу, в Parquet копятся до PARQUET_ROW_GROUP_SIZE строк, чтобы не
+        плодить мелкие row group. При embed_images обложки попадают
+        в бинарную колонку image_data.
+        """
+        if pa is None:
+            raise RuntimeError('pyarrow не установлен')
+
+        batch_size = batch_size or ExportService.get_batch_size()
+        query = ExportService.build_export_query(query, export)
+        schema = ExportService._arrow_schema(embed_images)
+        if export is not None:
+            schema = schema.with_metadata({
+                'export_id': str(export.id),
+                'watermark': export.watermark.isoformat(),
+            })
+
+        sink = _ZipStreamBuffer()
+        books_count = 0
+        images_count = 0
+        pending = []
+        pending_rows = 0
+
+        if export_format == 'parquet':
+            writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+
+        with writer:
+            for books, images in ExportService._iter_books_with_images(query, batch_size, embed_images):
+                batch = ExportService._books_to_record_batch(books, images, schema)
+                books_count += len(books)
+                images_count += len(images)
+                if progress:
+                    progress(books_count, images_count)
+
+                if export_format == 'parquet':
+                    pending.append(batch)
+                    pending_rows += batch.num_rows
+                    if pending_rows >= ExportService.PARQUET_ROW_GROUP_SIZE:
+                        writer.write_table(pa.Table.from_batches(pending, schema))
+                        pending = []
+                        pending_rows = 0
+                else:
+                    writer.write_batch(batch)
+
+                chunk = sink.pop()
+                if chunk:
+                    yield chunk
+
+            if pending:
+                writer.write_table(pa.Table.from_batches(pending, schema))
+
+        # Футер Parquet или маркер конца потока Arrow
+        yield sink.pop()
+
+        ExportService._complete_export(export, books_count, 0)
+
+    @staticmethod
+    def build_export_query(query, export: Optional[ExportRecord]):
+        """Запрос книг с учетом периода инкрементального экспорта."""
+        if export is not None and export.since is not None:
+            query = query if query is not None else BookBase.query
+            query = query.filter(BookBase.updated_at >= export.since)
+        return query
+
+    @staticmethod
+    def _complete_export(export: Optional[ExportRecord], books_count: int, deleted_count: int) -> None:
+        if export is not None:
+            export.books_count = books_count
+            export.deleted_count = deleted_count
+            export.completed_at = datetime.now()
+            db.session.commit()
+
+    @staticmethod
+    def _iter_books_with_images(query, batch_size: int, embed_images: bool):
+        """Пачки книг и, при embed_images, данные их обложек."""
+        for books in BookService.iter_books_batches(query, batch_size):
+            images = BookService.get_images_data([book.id for book in books]) if embed_images else {}
+            yield books, images
+
+    @staticmethod
+    def _arrow_schema(embed_images: bool):
+        """Схема Arrow по типам колонок модели."""
+        fields = []
+        for name in ExportService.RECORD_FIELDS:
+            column_type = BookBase.__table__.c[name].type
+            if isinstance(column_type, db.Boolean):
+                arrow_type = pa.bool_()
+            elif isinstance(column_type, db.Integer):
+                arrow_type = pa.int64()
+            elif isinstance(column_type, db.DateTime):
+                arrow_type = pa.timestamp('us')
+            else:
+                arrow_type = pa.string()
+            fields.append(pa.field(name, arrow_type))
+
+        if embed_images:
+            fields.append(pa.field('image_data', pa.binary()))
+        return pa.schema(fields)
+
+    @staticmethod
+    def _books_to_record_batch(books: List[BookBase], images: Dict[int, bytes], schema):
+        columns = {name: [getattr(book, name) for book in books] for name in ExportService.RECORD_FIELDS}
+        if 'image_data' in schema.names:
+            columns['image_data'] = [images.get(book.id) for book in books]
+        return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+    @staticmethod
+    def _stream_manifest(zip_file: ZipFile, buffer: _ZipStreamBuffer, export: ExportRecord,
+                         books_count: int) -> Iterator[bytes]:
+        """Запись манифеста экспорта со списком удаленных книг.
+
+        Returns:
+            Количество записей об удалении в манифесте.
+        """
+        header = {
+            'export_id': export.id,
+            'mode': 'delta' if export.since else 'full',
+            'since': export.since.isoformat() if export.since else None,
+            'watermark': export.watermark.isoformat(),
+            'books_count': books_count,
+        }
+        deleted_count = 0
+
+        with zip_file.open(ExportService.MANIFEST_FILENAME, 'w') as manifest_entry:
+            manifest_text = io.TextIOWrapper(manifest_entry, encoding='utf-8', write_through=True)
+            manifest_text.write('{"export": ' + json.dumps(header, ensure_ascii=False) + ', "deleted": [')
+
+            if export.since is not None:
+                tombstones = BookTombstone.query.filter(
+                    BookTombstone.deleted_at >= export.since
+                ).order_by(BookTombstone.id).yield_per(1000)
+
+                for tombstone in tombstones:
+                    manifest_text.write((', ' if deleted_count else '') + json.dumps({
+                        'book_id': tombstone.book_id,
+                        'url': tombstone.url,
+                        'deleted_at': tombstone.deleted_at.isoformat(),
+                    }, ensure_ascii=False))
+                    deleted_count += 1
+
+                    if deleted_count % 1000 == 0:
+                        chunk = buffer.pop()
+                        if chunk:
+                            yield chunk
+
+            manifest_text.write(']}')
+            manifest_text.detach()
+
+        return deleted_count
+
     @staticmethod
     def _create_csv_data(books: List[BookBase]) -> bytes:
         """Создание CSV данных для всех книг"""
@@ -34,48 +617,63 @@ class ExportService:
             io.TextIOWrapper(csv_buffer, encoding='utf-8-sig', newline='', write_through=True)
         )
 
-        headers = ['Image', 'Name', 'Authors', 'Series', 'ClassFrom', 'ClassTo', 'Subject',
-                   'Program', 'Publisher', 'Description', 'Type', 'File1', 'File2', 'TypeResource',
-                   'IsOVZ', 'TypePayResurse', 'UrlResurse', 'PublicationLanguage']
-
-        csv_writer.writerow(headers)
+        csv_writer.writerow(ExportService.CSV_HEADERS)
 
         for book in books:
-
-            row = [
-                book.image_name+'.'+book.image_type,
-                book.name,
-                book.authors,
-                book.series,
-                book.class_from,
-                book.class_to if book.class_from != book.class_to else '',
-                book.subject,
-                book.program,
-                book.publisher,
-                book.description,
-                book.type,
-                '',
-                '',
-                book.type_resourse,
-                book.is_ovz or False,
-                book.type_pay_resourse,
-                book.url,
-                book.publication_language,
-            ]
-
-
-            csv_writer.writerow(row)
+            csv_writer.writerow(ExportService._book_to_csv_row(book))
 
         csv_buffer.seek(0)
         return csv_buffer.getvalue()
 
+    @staticmethod
+    def _book_to_csv_row(book: BookBase) -> list:
+        """Строка CSV для книги"""
+        return [
+            ExportService._image_filename(book),
+            book.name,
+            book.authors,
+            book.series,
+            book.class_from,
+            book.class_to if book.class_from != book.class_to else '',
+            book.subject,
+            book.program,
+            book.publisher,
+            book.description,
+            book.type,
+            '',
+            '',
+            book.type_resourse,
+            book.is_ovz or False,
+            book.type_pay_resourse,
+            book.url,
+            book.publication_language,
+        ]
+
+    @staticmethod
+    def _image_filename(book: BookBase) -> str:
+        """Имя файла обложки в архиве.
+
+        image_name совпадает у книг с одинаковыми предметом, классом и
+        частью, поэтому имя начинается с id книги.
+        """
+        if not book.image_name or not book.image_type:
+            return ''
+        return f'{book.id}_{book.image_name}.{book.image_type}'
 
     @staticmethod
-    def _add_images_to_zip(zip_file: ZipFile, books: List[BookBase]):
-        """Добавление изображений в ZIP архив"""
+    def _add_images_to_zip(zip_file: ZipFile, books: List[BookBase]) -> int:
+        """Добавление изображений в ZIP архив; возвращает число добавленных"""
+        # Изображения всей пачки загружаются одним запросом
+        images = BookService.get_images_data([book.id for book in books
+                                              if book.id and ExportService._image_filename(book)])
+        count = 0
+
         for book in books:
-            if book.image_url and book.id:
-                image_data = BookService.get_book_image_data(book.id)
-                if image_data:
-                    image_filename = book.image_name+'.'+book.image_type
-                    zip_file.writestr(image_filename, image_data)
+            image_data = images.get(book.id)
+            image_filename = ExportService._image_filename(book)
+            if image_data and image_filename:
+                # Обложки уже сжаты (JPEG/PNG/WebP), повторное сжатие только тратит CPU
+                zip_file.writestr(image_filename, image_data, compress_type=ZIP_STORED)
+                count += 1
+
+        return count
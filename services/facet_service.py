@@ -0,0 +1,81 @@
+"""Фасеты для фильтров списка книг."""
+
+from typing import Any, Dict, List
+
+from .book_service import BookService
+from .read_cache import ReadCache
+
+
+class FacetService:
+    """Значения фильтров главной страницы с числом книг.
+
+    Значения каждого фасета считаются в БД через GROUP BY по
+    индексированной колонке. Если выбраны фильтры, число книг в фасете
+    учитывает все выбранные фильтры, кроме фильтра самого фасета: так
+    видно, сколько книг останется при выборе другого значения.
+    """
+
+    # Имя фасета (параметр запроса) -> поле BookBase
+    FACETS = {
+        'subject': 'subject',
+        'class': 'class_from',
+        'program': 'program',
+        'series': 'series',
+    }
+    INTEGER_FACETS = ('class',)
+
+    @staticmethod
+    def parse_selected(args) -> Dict[str, Any]:
+        """Выбранные значения фасетов и строка поиска q из параметров запроса.
+
+        Raises:
+            ValueError: некорректное значение числового фасета.
+        """
+        selected = {}
+        for name in (*FacetService.FACETS, 'q'):
+            value = (args.get(name) or '').strip()
+            if not value:
+                continue
+            if name in FacetService.INTEGER_FACETS:
+                try:
+                    value = int(value)
+                except ValueError as e:
+                    raise ValueError(f'Некорректное значение {name}: {value}') from e
+            selected[name] = value
+        return selected
+
+    @staticmethod
+    def get_facets(selected: Dict[str, Any] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Значения всех фасетов с числом книг (value, count), через кеш чтения."""
+        selected = selected or {}
+        return ReadCache.get_or_load('facets', tuple(sorted(selected.items())),
+                                     lambda: FacetService._load_facets(selected))
+
+    @staticmethod
+    def _load_facets(selected: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        facets = {}
+        for name, field in FacetService.FACETS.items():
+            others = {key: value for key, value in selected.items() if key != name}
+            query = BookService.build_filters_query(FacetService._to_filters(others))
+            facets[name] = [
+                {'value': value, 'count': count}
+                for value, count in BookService.get_unique_values(field, query, with_counts=True)
+            ]
+        return facets
+
+    @staticmethod
+    def count(selected: Dict[str, Any] = None) -> int:
+        """Число книг, подходящих под все выбранные фильтры (через кеш чтения)."""
+        selected = selected or {}
+        return ReadCache.get_or_load('facets_count', tuple(sorted(selected.items())),
+                                     lambda: BookService.count_books(FacetService.build_query(selected)))
+
+    @staticmethod
+    def build_query(selected: Dict[str, Any] = None):
+        """Запрос книг, подходящих под выбранные фильтры."""
+        return BookService.build_filters_query(FacetService._to_filters(selected or {}))
+
+    @staticmethod
+    def _to_filters(selected: Dict[str, Any]) -> Dict[str, Any]:
+        """Фильтры в формате BookService.build_filters_query."""
+        return {FacetService.FACETS.get(name, name): value for name, value in selected.items()}
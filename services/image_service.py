@@ -0,0 +1,279 @@
+"""Сервис для потоковой загрузки изображений книг."""
+
+from typing import Iterable, Iterator, Optional, BinaryIO, Tuple
+import base64
+import binascii
+import hashlib
+import io
+import shutil
+import tempfile
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from models import BookBase, db
+from .read_cache import ReadCache
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow не установлен — перекодирование отключено
+    Image = None
+
+
+class ImageUploadError(ValueError):
+    """Ошибка загрузки изображения."""
+
+
+class ImageTooLargeError(ImageUploadError):
+    """Размер изображения превышает допустимый."""
+
+
+class ImageDimensionsError(ImageUploadError):
+    """Размеры изображения в пикселях превышают лимит Pillow (MAX_IMAGE_PIXELS)."""
+
+
+class ImageService:
+    """Сервис для потоковой записи изображений в хранилище.
+
+    Изображение читается блоками: каждый блок хешируется, проверяется лимит
+    размера и сигнатура формата, после чего блок пишется во временный буфер
+    (в памяти до SPOOL_SIZE, дальше на диск). В БД данные переносятся также
+    блоками через incremental blob I/O SQLite.
+
+    Если задан IMAGE_TRANSCODE_FORMAT, обложка дополнительно перекодируется
+    в WebP/AVIF. При IMAGE_KEEP_ORIGINAL компактная копия хранится рядом
+    с оригиналом, иначе заменяет его.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    DEFAULT_MAX_SIZE = 10 * 1024 * 1024
+    SPOOL_SIZE = 1024 * 1024
+    HEADER_SIZE = 12
+    DEFAULT_TRANSCODE_QUALITY = 80
+    TRANSCODE_FORMATS = ('webp', 'avif')
+    # Форматы, которые имеет смысл перекодировать (GIF может быть анимирован)
+    TRANSCODE_SOURCE_FORMATS = ('jpeg', 'png')
+
+    @staticmethod
+    def get_max_size() -> int:
+        """Максимальный размер изображения из настроек приложения."""
+        return int(current_app.config.get('IMAGE_MAX_SIZE', ImageService.DEFAULT_MAX_SIZE))
+
+    @staticmethod
+    def get_transcode_settings() -> Tuple[Optional[str], int, bool]:
+        """Настройки перекодирования: формат, качество и сохранение оригинала."""
+        config = current_app.config
+        image_format = (config.get('IMAGE_TRANSCODE_FORMAT') or '').lower() or None
+        quality = int(config.get('IMAGE_TRANSCODE_QUALITY', ImageService.DEFAULT_TRANSCODE_QUALITY))
+        keep_original = bool(config.get('IMAGE_KEEP_ORIGINAL', True))
+        return image_format, quality, keep_original
+
+    @staticmethod
+    def detect_image_type(header: bytes) -> Optional[str]:
+        """Определение формата изображения по сигнатуре (magic bytes)."""
+        if header.startswith(b'\xff\xd8\xff'):
+            return 'jpeg'
+        if header.startswith(b'\x89PNG\r\n\x1a\n'):
+            return 'png'
+        if header[:6] in (b'GIF87a', b'GIF89a'):
+            return 'gif'
+        if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+            return 'webp'
+        if header[4:8] == b'ftyp' and header[8:12] in (b'avif', b'avis'):
+            return 'avif'
+        return None
+
+    @staticmethod
+    def iter_stream(stream: BinaryIO, chunk_size: int = None) -> Iterator[bytes]:
+        """Чтение файлового потока блоками."""
+        chunk_size = chunk_size or ImageService.CHUNK_SIZE
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    @staticmethod
+    def iter_base64(data: str, chunk_size: int = None) -> Iterator[bytes]:
+        """Декодирование base64 строки блоками."""
+        chunk_size = chunk_size or ImageService.CHUNK_SIZE
+
+        # Поддерживаем data URL вида "data:image/png;base64,..."
+        if data.startswith('data:'):
+            data = data.partition(',')[2]
+        if any(char in data for char in '\r\n\t '):
+            data = ''.join(data.split())
+
+        # Длина куска должна быть кратна 4 символам base64
+        step = max(chunk_size // 3, 1) * 4
+        for start in range(0, len(data), step):
+            try:
+                yield base64.b64decode(data[start:start + step], validate=True)
+            except (binascii.Error, ValueError) as e:
+                raise ImageUploadError(f'Invalid base64 image data: {e}') from e
+
+    @staticmethod
+    def estimate_base64_size(data: str) -> int:
+        """Оценка размера декодированных base64 данных без декодирования."""
+        return len(data) * 3 // 4
+
+    @staticmethod
+    def save_image_stream(book_id: int, chunks: Iterable[bytes], image_url: str = None,
+                          max_size: int = None) -> bool:
+        """Потоковое сохранение изображения книги.
+
+        Returns:
+            False, если книга не найдена.
+
+        Raises:
+            ImageTooLargeError: размер превышает max_size.
+            ImageDimensionsError: размеры в пикселях превышают лимит Pillow.
+            ImageUploadError: пустые данные или неподдерживаемый формат.
+        """
+        if db.session.query(BookBase.id).filter_by(id=book_id).first() is None:
+            return False
+
+        max_size = max_size or ImageService.get_max_size()
+
+        with tempfile.SpooledTemporaryFile(max_size=ImageService.SPOOL_SIZE) as spool:
+            size, image_type, image_hash = ImageService._spool_chunks(chunks, spool, max_size)
+
+            compact_data, compact_type, keep_original = ImageService._transcode_spool(spool, image_type, size)
+            spool.seek(0)
+
+            if compact_data and not keep_original:
+                # Храним только компактную копию
+                ImageService._write_image(book_id, io.BytesIO(compact_data), len(compact_data), {
+                    'image_url': image_url,
+                    'image_type': compact_type,
+                    'image_hash': hashlib.sha256(compact_data).hexdigest(),
+                    'image_compact_data': None,
+                    'image_compact_type': None,
+                })
+            else:
+                ImageService._write_image(book_id, spool, size, {
+                    'image_url': image_url,
+                    'image_type': image_type,
+                    'image_hash': image_hash,
+                    'image_compact_data': compact_data,
+                    'image_compact_type': compact_type,
+                })
+
+        return True
+
+    @staticmethod
+    def transcode(source: BinaryIO, image_format: str, quality: int) -> Optional[bytes]:
+        """Перекодирование изображения в компактный формат.
+
+        Returns:
+            Байты изображения в формате image_format или None, если Pillow
+            недоступен либо изображение не удалось перекодировать.
+
+        Raises:
+            ImageDimensionsError: размеры в пикселях превышают лимит Pillow
+                (защита от «декомпрессионных бомб»).
+        """
+        if Image is None or image_format not in ImageService.TRANSCODE_FORMATS:
+            return None
+
+        try:
+            with Image.open(source) as image:
+                if image.mode not in ('RGB', 'RGBA'):
+                    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+                    image = image.convert('RGBA' if has_alpha else 'RGB')
+                output = io.BytesIO()
+                image.save(output, format=image_format.upper(), quality=quality)
+                return output.getvalue()
+        except Image.DecompressionBombError as e:
+            raise ImageDimensionsError(f'Image dimensions exceed the allowed limit: {e}') from e
+        except (OSError, ValueError) as e:
+            print(f"Error transcoding image to {image_format}: {e}")
+            return None
+
+    @staticmethod
+    def select_rendition(book: BookBase, accept_mimetypes) -> Tuple[Optional[bytes], Optional[str]]:
+        """Выбор версии обложки для клиента по заголовку Accept."""
+        if ImageService.accepts_compact(book, accept_mimetypes):
+            return book.image_compact_data, book.image_compact_type
+        return book.image_data, book.image_type
+
+    @staticmethod
+    def accepts_compact(book: BookBase, accept_mimetypes) -> bool:
+        """Отдается ли клиенту компактная копия обложки (без загрузки данных изображения)."""
+        if not book.image_compact_type:
+            return False
+        compact_mimetype = f'image/{book.image_compact_type}'
+        # Учитываем только явное указание формата, а не */*
+        return any(mimetype == compact_mimetype and quality > 0 for mimetype, quality in accept_mimetypes)
+
+    @staticmethod
+    def _spool_chunks(chunks: Iterable[bytes], spool: BinaryIO, max_size: int) -> Tuple[int, str, str]:
+        """Запись блоков в буфер с подсчетом размера, хеша и проверкой формата."""
+        digest = hashlib.sha256()
+        size = 0
+        header = b''
+        image_type = None
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+
+            size += len(chunk)
+            if size > max_size:
+                raise ImageTooLargeError(f'Image exceeds maximum size of {max_size} bytes')
+
+            if image_type is None and len(header) < ImageService.HEADER_SIZE:
+                header += chunk[:ImageService.HEADER_SIZE - len(header)]
+                if len(header) >= ImageService.HEADER_SIZE:
+                    image_type = ImageService._require_image_type(header)
+
+            digest.update(chunk)
+            spool.write(chunk)
+
+        if size == 0:
+            raise ImageUploadError('Empty image data')
+        if image_type is None:
+            image_type = ImageService._require_image_type(header)
+
+        return size, image_type, digest.hexdigest()
+
+    @staticmethod
+    def _transcode_spool(spool: BinaryIO, image_type: str, size: int) -> Tuple[Optional[bytes], Optional[str], bool]:
+        """Перекодирование загруженного изображения согласно настройкам."""
+        image_format, quality, keep_original = ImageService.get_transcode_settings()
+        if not image_format or image_type not in ImageService.TRANSCODE_SOURCE_FORMATS:
+            return None, None, keep_original
+
+        spool.seek(0)
+        compact_data = ImageService.transcode(spool, image_format, quality)
+        # Компактная копия нужна, только если она действительно меньше оригинала
+        if not compact_data or len(compact_data) >= size:
+            return None, None, keep_original
+        return compact_data, image_format, keep_original
+
+    @staticmethod
+    def _require_image_type(header: bytes) -> str:
+        image_type = ImageService.detect_image_type(header)
+        if image_type is None:
+            raise ImageUploadError('Unsupported image type')
+        return image_type
+
+    @staticmethod
+    def _write_image(book_id: int, spool: BinaryIO, size: int, values: dict) -> None:
+        """Перенос данных из буфера в БД."""
+        connection = db.session.connection()
+        raw_connection = connection.connection.driver_connection
+        statement = update(BookBase).where(BookBase.id == book_id).execution_options(
+            synchronize_session=False
+        )
+
+        if connection.dialect.name == 'sqlite' and hasattr(raw_connection, 'blobopen'):
+            # Резервируем место под blob и пишем в него блоками, не загружая файл в память
+            db.session.execute(statement.values(image_data=func.zeroblob(size), **values))
+            with raw_connection.blobopen(BookBase.__tablename__, 'image_data', book_id) as blob:
+                shutil.copyfileobj(spool, blob, ImageService.CHUNK_SIZE)
+        else:
+            db.session.execute(statement.values(image_data=spool.read(), **values))
+
+        db.session.commit()
+        ReadCache.invalidate()
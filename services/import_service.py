@@ -0,0 +1,258 @@
+"""Импорт книг из архивов экспорта."""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Tuple
+from zipfile import BadZipFile, ZipFile
+import csv
+import io
+import re
+import time
+
+from .book_service import BookService
+from .export_service import ExportService
+from .image_service import ImageService
+
+
+@dataclass
+class ImportReport:
+    """Результат импорта.
+
+    Attributes:
+        rows_total: Количество прочитанных строк CSV
+        inserted: Добавлено книг
+        updated: Обновлено книг
+        images: Загружено обложек
+        errors_count: Количество строк с ошибками
+        errors: Ошибки по строкам (не больше MAX_REPORTED_ERRORS)
+        duration: Время импорта в секундах
+    """
+    rows_total: int = 0
+    inserted: int = 0
+    updated: int = 0
+    images: int = 0
+    errors_count: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    duration: float = 0.0
+
+    MAX_REPORTED_ERRORS = 1000
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_total / self.duration if self.duration else 0.0
+
+    def add_error(self, row: int, url: Optional[str], error: str) -> None:
+        self.errors_count += 1
+        if len(self.errors) < self.MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'url': url, 'error': error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rows_total': self.rows_total,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'images': self.images,
+            'errors_count': self.errors_count,
+            'errors': self.errors,
+            'duration': round(self.duration, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class ImportService:
+    """Импорт книг из ZIP архива экспорта (books_import.csv и обложки) или из CSV.
+
+    Архив не загружается в память: ZipFile читает центральный каталог
+    и распаковывает записи по мере чтения, CSV разбирается построчно.
+    Строки группируются в пачки и записываются BookService.upsert_books,
+    так что повторный импорт того же архива обновляет книги по URL,
+    а не создает дубли.
+    """
+
+    # Заголовок CSV экспорта -> колонка BookBase
+    CSV_COLUMNS = {
+        'Name': 'name',
+        'Authors': 'authors',
+        'Series': 'series',
+        'ClassFrom': 'class_from',
+        'ClassTo': 'class_to',
+        'Subject': 'subject',
+        'Program': 'program',
+        'Publisher': 'publisher',
+        'Description': 'description',
+        'Type': 'type',
+        'TypeResource': 'type_resourse',
+        'IsOVZ': 'is_ovz',
+        'TypePayResurse': 'type_pay_resourse',
+        'UrlResurse': 'url',
+        'PublicationLanguage': 'publication_language',
+    }
+    IMAGE_COLUMN = 'Image'
+    # Имя обложки в архиве: <id книги>_<image_name>.<расширение> (id нет в старых архивах)
+    IMAGE_FILENAME_PATTERN = re.compile(r'^(?:\d+_)?(?P<name>.+?)(?:\.[^.]*)?$')
+    INTEGER_COLUMNS = ('class_from', 'class_to')
+
+    @staticmethod
+    def get_batch_size() -> int:
+        """Количество строк CSV в одной пачке записи."""
+        return BookService.get_upsert_chunk_size()
+
+    @staticmethod
+    def import_file(source: BinaryIO, batch_size: int = None) -> ImportReport:
+        """Импорт из файла: ZIP архива экспорта или отдельного CSV.
+
+        source должен поддерживать seek (ZIP читается с конца).
+
+        Raises:
+            ValueError: в архиве нет CSV или в CSV нет обязательных колонок.
+        """
+        header = source.read(4)
+        source.seek(0)
+
+        if header.startswith(b'PK'):
+            try:
+                with ZipFile(source) as zip_file:
+                    if ExportService.CSV_FILENAME not in zip_file.namelist():
+                        raise ValueError(f'В архиве нет {ExportService.CSV_FILENAME}')
+                    with zip_file.open(ExportService.CSV_FILENAME) as csv_entry:
+                        return ImportService.import_csv(csv_entry, zip_file, batch_size)
+            except BadZipFile as e:
+                raise ValueError(f'Некорректный ZIP архив: {e}') from e
+
+        return ImportService.import_csv(source, None, batch_size)
+
+    @staticmethod
+    def import_csv(stream: BinaryIO, zip_file: Optional[ZipFile] = None,
+                   batch_size: int = None) -> ImportReport:
+        """Импорт строк CSV; обложки берутся из zip_file, если он передан."""
+        batch_size = batch_size or ImportService.get_batch_size()
+        report = ImportReport()
+        started = time.perf_counter()
+        duplicate_images = ImportService._duplicate_names(zip_file) if zip_file is not None else set()
+
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        try:
+            reader = csv.reader(text)
+            columns = ImportService._map_header(next(reader, None))
+
+            batch = []
+            for row_number, values in enumerate(reader, start=2):
+                if not any(values):
+                    continue
+                report.rows_total += 1
+
+                try:
+                    batch.append((row_number, ImportService._parse_row(columns, values, zip_file,
+                                                                       duplicate_images)))
+                except ValueError as e:
+                    report.add_error(row_number, None, str(e))
+
+                if len(batch) >= batch_size:
+                    ImportService._write_batch(batch, report)
+                    batch = []
+
+            if batch:
+                ImportService._write_batch(batch, report)
+        finally:
+            # Поток принадлежит вызывающему коду
+            text.detach()
+
+        report.duration = time.perf_counter() - started
+        return report
+
+    @staticmethod
+    def _map_header(header: Optional[List[str]]) -> Dict[int, str]:
+        """Номера колонок CSV -> колонки BookBase (и Image для обложки)."""
+        if not header:
+            raise ValueError('Пустой CSV')
+
+        columns = {}
+        for position, name in enumerate(header):
+            name = name.strip()
+            if name == ImportService.IMAGE_COLUMN:
+                columns[position] = ImportService.IMAGE_COLUMN
+            elif name in ImportService.CSV_COLUMNS:
+                columns[position] = ImportService.CSV_COLUMNS[name]
+
+        if 'url' not in columns.values():
+            raise ValueError('В CSV нет колонки UrlResurse')
+        return columns
+
+    @staticmethod
+    def _parse_row(columns: Dict[int, str], values: List[str], zip_file: Optional[ZipFile],
+                   duplicate_images: Set[str] = frozenset()) -> Dict[str, Any]:
+        """Данные книги из строки CSV (в формате ExportService._book_to_csv_row).
+
+        duplicate_images — имена, которые повторяются в архиве: какая из
+        обложек относится к книге, определить нельзя.
+
+        Raises:
+            ValueError: некорректное значение или обложка.
+        """
+        row = {}
+        image_filename = None
+        for position, column in columns.items():
+            value = values[position].strip() if position < len(values) else ''
+            if column == ImportService.IMAGE_COLUMN:
+                image_filename = value
+            elif value:
+                row[column] = value
+
+        for column in ImportService.INTEGER_COLUMNS:
+            if column in row:
+                try:
+                    row[column] = int(row[column])
+                except ValueError as e:
+                    raise ValueError(f'Некорректное значение {column}: {row[column]}') from e
+        # Пустой ClassTo в экспорте означает один класс
+        if 'class_from' in row and 'class_to' not in row:
+            row['class_to'] = row['class_from']
+        if 'is_ovz' in row:
+            row['is_ovz'] = row['is_ovz'].lower() in ('true', '1', 'да')
+
+        if image_filename:
+            row['image_name'] = ImportService.IMAGE_FILENAME_PATTERN.match(image_filename).group('name')
+            if zip_file is not None:
+                if image_filename in duplicate_images:
+                    raise ValueError(f'В архиве несколько обложек {image_filename}')
+                row.update(ImportService._read_image(zip_file, image_filename))
+
+        return row
+
+    @staticmethod
+    def _duplicate_names(zip_file: ZipFile) -> Set[str]:
+        """Имена записей, которые встречаются в архиве несколько раз."""
+        return {name for name, count in Counter(zip_file.namelist()).items() if count > 1}
+
+    @staticmethod
+    def _read_image(zip_file: ZipFile, filename: str) -> Dict[str, Any]:
+        """Обложка из архива с проверкой размера и формата."""
+        try:
+            info = zip_file.getinfo(filename)
+        except KeyError as e:
+            raise ValueError(f'В архиве нет обложки {filename}') from e
+
+        max_size = ImageService.get_max_size()
+        if info.file_size > max_size:
+            raise ValueError(f'Обложка {filename} больше {max_size} байт')
+
+        image_data = zip_file.read(info)
+        image_type = ImageService.detect_image_type(image_data[:ImageService.HEADER_SIZE])
+        if image_type is None:
+            raise ValueError(f'Неподдерживаемый формат обложки {filename}')
+        return {'image_data': image_data, 'image_type': image_type}
+
+    @staticmethod
+    def _write_batch(batch: List[Tuple[int, Dict[str, Any]]], report: ImportReport) -> None:
+        outcomes = BookService.upsert_books([row for _, row in batch], chunk_size=len(batch))
+        for (row_number, row), outcome in zip(batch, outcomes):
+            if outcome['status'] == 'error':
+                report.add_error(row_number, row.get('url'), outcome['error'])
+                continue
+
+            if outcome['status'] == 'inserted':
+                report.inserted += 1
+            elif outcome['status'] == 'updated':
+                report.updated += 1
+            if row.get('image_data') is not None:
+                report.images += 1
@@ -0,0 +1,52 @@
+"""Быстрая сериализация JSON ответов API."""
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен — остается стандартный json
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON провайдер Flask на orjson.
+
+    Результат совпадает со стандартным провайдером: даты, dataclass и
+    прочие типы, которые orjson не сериализует сам, передаются в
+    DefaultJSONProvider.default. Форматированный вывод (indent в режиме
+    отладки) и нестандартные параметры dumps/loads обрабатываются
+    стандартным json.
+    """
+
+    @staticmethod
+    def is_available() -> bool:
+        """Установлен ли orjson."""
+        return orjson is not None
+
+    def _options(self) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Сериализация в байты UTF-8 без промежуточной строки."""
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
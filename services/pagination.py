@@ -0,0 +1,64 @@
+"""Курсорная (keyset) пагинация."""
+
+from typing import Any, Dict, Optional
+import base64
+import binascii
+import json
+
+
+class InvalidCursorError(ValueError):
+    """Некорректный курсор или лимит страницы."""
+
+
+class Pagination:
+    """Кодирование курсоров страниц и проверка лимита.
+
+    Курсор — непрозрачный для клиента токен (base64url от JSON) с ключом
+    сортировки последней записи страницы. Следующая страница выбирается
+    условием "после этого ключа" по индексу, без OFFSET и без COUNT(*).
+    """
+
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+
+    @staticmethod
+    def encode_cursor(values: Dict[str, Any]) -> str:
+        data = json.dumps(values, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(token: Optional[str], *keys: str) -> Optional[Dict[str, Any]]:
+        """Разбор курсора; keys — обязательные ключи.
+
+        Raises:
+            InvalidCursorError: курсор поврежден или выдан другим списком.
+        """
+        if not token:
+            return None
+
+        try:
+            data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            values = json.loads(data)
+        except (binascii.Error, ValueError) as e:
+            raise InvalidCursorError('Некорректный cursor') from e
+
+        if not isinstance(values, dict) or any(key not in values for key in keys):
+            raise InvalidCursorError('Некорректный cursor')
+        return values
+
+    @staticmethod
+    def parse_limit(value: Optional[str]) -> int:
+        """Лимит страницы из параметра запроса.
+
+        Raises:
+            InvalidCursorError: лимит не число или меньше 1.
+        """
+        if value in (None, ''):
+            return Pagination.DEFAULT_LIMIT
+        try:
+            limit = int(value)
+        except ValueError as e:
+            raise InvalidCursorError(f'Некорректный limit: {value}') from e
+        if limit < 1:
+            raise InvalidCursorError(f'Некорректный limit: {value}')
+        return min(limit, Pagination.MAX_LIMIT)
@@ -0,0 +1,215 @@
+"""Кеш чтения данных каталога."""
+
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, Optional
+import hashlib
+import json
+import threading
+import time
+
+from flask import current_app
+
+try:
+    import redis
+except ImportError:  # redis не установлен — только кеш в памяти процесса
+    redis = None
+
+
+class ReadCache:
+    """Кеш результатов чтения с инвалидацией при записи.
+
+    Ключ записи включает номер поколения данных. Любая запись в каталог
+    вызывает invalidate(), которое увеличивает номер поколения, поэтому
+    все ранее сохраненные значения перестают находиться и вытесняются
+    по LRU или TTL.
+
+    Значения хранятся в памяти процесса (LRU с TTL). Если задан
+    READ_CACHE_REDIS_URL, номер поколения и значения дополнительно хранятся
+    в Redis: запись в одном процессе инвалидирует кеш во всех. Без Redis
+    другие процессы видят изменения не позже чем через READ_CACHE_TTL.
+
+    Значения хранятся сериализованными в JSON, поэтому изменение
+    полученного объекта не портит кеш, а данные из общего Redis не могут
+    выполнить код при чтении. Кешировать можно только значения JSON
+    (словари, списки, строки, числа): кортежи возвращаются списками,
+    объекты ORM нужно переводить в словари.
+    """
+
+    DEFAULT_MAX_ENTRIES = 1024
+    DEFAULT_TTL = 300
+    KEY_PREFIX = 'books:read_cache'
+
+    _lock = threading.Lock()
+    _entries: 'OrderedDict[str, tuple]' = OrderedDict()
+    _generation = 0
+    _stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+    _redis_clients: Dict[str, Any] = {}
+
+    @staticmethod
+    def get_max_entries() -> int:
+        """Максимальное число записей в памяти процесса (0 — кеш отключен)."""
+        return int(current_app.config.get('READ_CACHE_MAX_ENTRIES', ReadCache.DEFAULT_MAX_ENTRIES))
+
+    @staticmethod
+    def get_ttl() -> int:
+        """Время жизни записи в секундах."""
+        return int(current_app.config.get('READ_CACHE_TTL', ReadCache.DEFAULT_TTL))
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return ReadCache.get_max_entries() > 0
+
+    @staticmethod
+    def get_or_load(namespace: str, args: Hashable, loader: Callable[[], Any]) -> Any:
+        """Значение из кеша или результат loader(), сохраненный в кеш.
+
+        Args:
+            namespace: Имя кешируемого чтения (для ключа и метрик)
+            args: Параметры чтения, однозначно определяющие результат
+            loader: Функция чтения из БД
+        """
+        if not ReadCache.is_enabled():
+            return loader()
+
+        client = ReadCache._get_redis()
+        key = ReadCache._make_key(namespace, args, ReadCache._current_generation(client))
+
+        data = ReadCache._get_local(key)
+        if data is None and client is not None:
+            data = ReadCache._get_shared(client, key)
+            if data is not None:
+                ReadCache._set_local(key, data)
+
+        if data is not None:
+            try:
+                value = json.loads(data)
+            except ValueError as e:
+                print(f"Error decoding read cache value: {e}")
+            else:
+                ReadCache._record(namespace, hit=True)
+                return value
+
+        ReadCache._record(namespace, hit=False)
+        value = loader()
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        ReadCache._set_local(key, data)
+        if client is not None:
+            ReadCache._set_shared(client, key, data)
+        return value
+
+    @staticmethod
+    def invalidate() -> None:
+        """Сброс кеша после записи в каталог (новое поколение данных)."""
+        with ReadCache._lock:
+            ReadCache._generation += 1
+            ReadCache._entries.clear()
+
+        client = ReadCache._get_redis()
+        if client is not None:
+            try:
+                client.incr(f'{ReadCache.KEY_PREFIX}:generation')
+            except redis.RedisError as e:
+                print(f"Error invalidating shared read cache: {e}")
+
+    @staticmethod
+    def clear() -> None:
+        """Полная очистка кеша в памяти процесса и метрик."""
+        with ReadCache._lock:
+            ReadCache._entries.clear()
+            ReadCache._stats.clear()
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        """Метрики кеша: попадания и промахи всего и по видам чтения."""
+        with ReadCache._lock:
+            namespaces = {name: dict(values, hit_ratio=ReadCache._ratio(values))
+                          for name, values in ReadCache._stats.items()}
+            size = len(ReadCache._entries)
+            generation = ReadCache._generation
+
+        hits = sum(values['hits'] for values in namespaces.values())
+        misses = sum(values['misses'] for values in namespaces.values())
+        return {
+            'enabled': ReadCache.is_enabled(),
+            'backend': 'redis' if ReadCache._get_redis() is not None else 'memory',
+            'entries': size,
+            'generation': generation,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': ReadCache._ratio({'hits': hits, 'misses': misses}),
+            'namespaces': namespaces,
+        }
+
+    @staticmethod
+    def _ratio(values: Dict[str, int]) -> Optional[float]:
+        total = values['hits'] + values['misses']
+        return round(values['hits'] / total, 4) if total else None
+
+    @staticmethod
+    def _record(namespace: str, hit: bool) -> None:
+        with ReadCache._lock:
+            ReadCache._stats[namespace]['hits' if hit else 'misses'] += 1
+
+    @staticmethod
+    def _make_key(namespace: str, args: Hashable, generation: int) -> str:
+        digest = hashlib.sha256(repr(args).encode('utf-8')).hexdigest()
+        return f'{ReadCache.KEY_PREFIX}:{generation}:{namespace}:{digest}'
+
+    @staticmethod
+    def _current_generation(client) -> int:
+        if client is not None:
+            try:
+                return int(client.get(f'{ReadCache.KEY_PREFIX}:generation') or 0)
+            except redis.RedisError as e:
+                print(f"Error reading shared read cache generation: {e}")
+        return ReadCache._generation
+
+    @staticmethod
+    def _get_local(key: str) -> Optional[bytes]:
+        with ReadCache._lock:
+            entry = ReadCache._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at < time.monotonic():
+                del ReadCache._entries[key]
+                return None
+            ReadCache._entries.move_to_end(key)
+            return data
+
+    @staticmethod
+    def _set_local(key: str, data: bytes) -> None:
+        max_entries = ReadCache.get_max_entries()
+        expires_at = time.monotonic() + ReadCache.get_ttl()
+        with ReadCache._lock:
+            ReadCache._entries[key] = (expires_at, data)
+            ReadCache._entries.move_to_end(key)
+            while len(ReadCache._entries) > max_entries:
+                ReadCache._entries.popitem(last=False)
+
+    @staticmethod
+    def _get_shared(client, key: str) -> Optional[bytes]:
+        try:
+            return client.get(key)
+        except redis.RedisError as e:
+            print(f"Error reading shared read cache: {e}")
+            return None
+
+    @staticmethod
+    def _set_shared(client, key: str, data: bytes) -> None:
+        try:
+            client.set(key, data, ex=ReadCache.get_ttl())
+        except redis.RedisError as e:
+            print(f"Error writing shared read cache: {e}")
+
+    @staticmethod
+    def _get_redis():
+        """Клиент Redis для READ_CACHE_REDIS_URL (None, если не настроен)."""
+        url = current_app.config.get('READ_CACHE_REDIS_URL')
+        if not url or redis is None:
+            return None
+        with ReadCache._lock:
+            client = ReadCache._redis_clients.get(url)
+            if client is None:
+                client = ReadCache._redis_clients[url] = redis.Redis.from_url(url)
+            return client
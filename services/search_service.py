@@ -0,0 +1,266 @@
+"""Полнотекстовый поиск книг."""
+
+from typing import Any, Dict, Iterator, Optional, Sequence
+import html
+import re
+
+from sqlalchemy import Float, Integer, String, bindparam, or_, text
+from sqlalchemy.orm import defer, load_only
+
+from models import BookBase, db
+from .pagination import Pagination
+
+
+class SearchService:
+    """Поиск книг по индексу SQLite FTS5 (таблица books_fts).
+
+    Запрос разбивается на слова, у каждого слова отрезается типичное
+    русское окончание, и слово ищется как префикс ("учебники" ->
+    учебник*), что покрывает основные словоформы без морфологического
+    словаря. Все слова должны встретиться в книге. Результаты
+    сортируются по bm25 с весами колонок (название важнее описания).
+
+    Если FTS5 недоступен (не SQLite или индекс не создан), используется
+    поиск подстроки через ilike.
+    """
+
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+    # Размер пачки строк, читаемых из курсора БД при потоковой выдаче
+    STREAM_BATCH_SIZE = 1000
+    # Веса колонок BOOKS_FTS_COLUMNS для bm25
+    COLUMN_WEIGHTS = (10.0, 5.0, 3.0, 1.0, 1.0)
+    SNIPPET_TOKENS = 12
+    MIN_STEM_LENGTH = 4
+    # Окончания от длинных к коротким
+    RUSSIAN_ENDINGS = sorted((
+        'иями', 'ями', 'ами', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией', 'ий', 'ый', 'ой',
+        'ей', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ую', 'юю', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ов',
+        'ев', 'ию', 'ия', 'ии', 'ье', 'ья', 'ьи', 'ью', 'ы', 'и', 'а', 'я', 'о', 'е', 'у', 'ю', 'ь', 'й',
+    ), key=len, reverse=True)
+
+    # Маркеры подсветки: символы из области частного использования, которых нет в тексте
+    _MARK_START = '\ue000'
+    _MARK_END = '\ue001'
+    _WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+    @staticmethod
+    def is_available() -> bool:
+        """Есть ли индекс FTS5 в текущей БД."""
+        if db.session.get_bind().dialect.name != 'sqlite':
+            return False
+        return db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+        )).first() is not None
+
+    @staticmethod
+    def stem(word: str) -> str:
+        """Грубый стемминг: отрезание русского окончания."""
+        word = word.lower().replace('ё', 'е')
+        for ending in SearchService.RUSSIAN_ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= SearchService.MIN_STEM_LENGTH:
+                return word[:-len(ending)]
+        return word
+
+    @staticmethod
+    def build_match_query(query: str) -> Optional[str]:
+        """Запрос FTS5 MATCH из пользовательской строки.
+
+        Слова берутся в кавычки, поэтому операторы FTS5 в запросе
+        пользователя не интерпретируются.
+        """
+        words = SearchService._WORD_RE.findall(query or '')
+        if not words:
+            return None
+        return ' '.join(f'"{SearchService.stem(word)}"*' for word in words)
+
+    @staticmethod
+    def condition(query: str):
+        """Условие поиска для фильтрации запросов книг (FTS5 или ilike)."""
+        if SearchService.is_available():
+            return SearchService.match_condition(query)
+        return SearchService.like_condition(query)
+
+    @staticmethod
+    def like_condition(query: str):
+        """Условие поиска подстроки по текстовым полям книги."""
+        search_pattern = f"%{query}%"
+        return or_(
+            BookBase.name.ilike(search_pattern),
+            BookBase.authors.ilike(search_pattern),
+            BookBase.subject.ilike(search_pattern),
+            BookBase.publisher.ilike(search_pattern),
+            BookBase.description.ilike(search_pattern)
+        )
+
+    @staticmethod
+    def match_condition(query: str):
+        """Условие на BookBase.id для фильтрации запросов по FTS5."""
+        match_query = SearchService.build_match_query(query)
+        if match_query is None:
+            return BookBase.id.is_(None)
+        return BookBase.id.in_(
+            text('SELECT rowid FROM books_fts WHERE books_fts MATCH :match_query').bindparams(
+                match_query=match_query
+            )
+        )
+
+    @staticmethod
+    def search(query: str, limit: int = None, cursor: str = None, fields: Sequence[str] = None) -> Dict[str, Any]:
+        """Поиск книг по релевантности.
+
+        Страницы выбираются по ключу (rank, rowid) последнего результата
+        предыдущей страницы, фрагменты текста строятся только для книг
+        текущей страницы. fields — загрузить только колонки указанных
+        полей BookBase.to_dict.
+
+        Returns:
+            Словарь с results — списком словарей с книгой (book), рангом
+            bm25 (rank, меньше — релевантнее) и фрагментом текста с
+            подсветкой <mark> (snippet) — и next_cursor (None на последней
+            странице).
+
+        Raises:
+            InvalidCursorError: курсор поврежден.
+        """
+        limit = min(limit or SearchService.DEFAULT_LIMIT, SearchService.MAX_LIMIT)
+
+        if not SearchService.is_available():
+            return SearchService._search_like(query, limit, cursor, fields)
+
+        position = Pagination.decode_cursor(cursor, 'rank', 'id')
+        match_query = SearchService.build_match_query(query)
+        if match_query is None:
+            return {'results': [], 'next_cursor': None}
+
+        weights = ', '.join(str(weight) for weight in SearchService.COLUMN_WEIGHTS)
+        after = ''
+        params = {'match_query': match_query, 'limit': limit + 1}
+        if position is not None:
+            after = 'WHERE rank > :rank OR (rank = :rank AND rowid > :last_id)'
+            params.update(rank=position['rank'], last_id=position['id'])
+
+        rows = db.session.execute(text(f"""
+            SELECT rowid, rank FROM (
+                SELECT rowid, bm25(books_fts, {weights}) AS rank
+                FROM books_fts
+                WHERE books_fts MATCH :match_query
+            )
+            {after}
+            ORDER BY rank, rowid
+            LIMIT :limit
+        """), params).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = Pagination.encode_cursor({'rank': rows[-1].rank, 'id': rows[-1].rowid})
+        if not rows:
+            return {'results': [], 'next_cursor': None}
+
+        row_ids = [row.rowid for row in rows]
+        snippets = dict(db.session.execute(text("""
+            SELECT rowid, snippet(books_fts, -1, :mark_start, :mark_end, '…', :tokens)
+            FROM books_fts
+            WHERE books_fts MATCH :match_query AND rowid IN :row_ids
+        """).bindparams(bindparam('row_ids', expanding=True)), {
+            'match_query': match_query,
+            'mark_start': SearchService._MARK_START,
+            'mark_end': SearchService._MARK_END,
+            'tokens': SearchService.SNIPPET_TOKENS,
+            'row_ids': row_ids,
+        }).all())
+
+        books = BookBase.query.options(SearchService._load_options(fields)).filter(BookBase.id.in_(row_ids))
+        books_by_id = {book.id: book for book in books}
+
+        results = [
+            {'book': books_by_id[row.rowid], 'rank': row.rank,
+             'snippet': SearchService._highlight(snippets.get(row.rowid))}
+            for row in rows if row.rowid in books_by_id
+        ]
+        return {'results': results, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def stream(query: str, fields: Sequence[str] = None, batch_size: int = None) -> Iterator[Dict[str, Any]]:
+        """Все результаты поиска в порядке релевантности одним запросом.
+
+        Элементы — словари book (строка выборки с колонками полей fields
+        для BookBase.serialize), rank и snippet, как в search. Строки
+        читаются из курсора БД пачками по batch_size (yield_per), поэтому
+        память не зависит от числа найденных книг.
+        """
+        batch_size = batch_size or SearchService.STREAM_BATCH_SIZE
+        columns = BookBase.dict_columns(fields)
+        if not SearchService.is_available():
+            books = db.session.query(*columns).filter(SearchService.like_condition(query)).order_by(
+                BookBase.id
+            ).yield_per(batch_size)
+            return ({'book': book, 'rank': None, 'snippet': None} for book in books)
+
+        match_query = SearchService.build_match_query(query)
+        if match_query is None:
+            return iter(())
+
+        weights = ', '.join(str(weight) for weight in SearchService.COLUMN_WEIGHTS)
+        matches = text(f"""
+            SELECT rowid, bm25(books_fts, {weights}) AS rank,
+                   snippet(books_fts, -1, :mark_start, :mark_end, '…', :tokens) AS snippet
+            FROM books_fts
+            WHERE books_fts MATCH :match_query
+        """).bindparams(
+            match_query=match_query,
+            mark_start=SearchService._MARK_START,
+            mark_end=SearchService._MARK_END,
+            tokens=SearchService.SNIPPET_TOKENS,
+        ).columns(rowid=Integer, rank=Float, snippet=String).subquery('matches')
+
+        rows = db.session.query(*columns, matches.c.rank, matches.c.snippet).join(
+            matches, matches.c.rowid == BookBase.id
+        ).order_by(matches.c.rank, BookBase.id).yield_per(batch_size)
+        return (
+            {'book': row, 'rank': row.rank, 'snippet': SearchService._highlight(row.snippet)}
+            for row in rows
+        )
+
+    @staticmethod
+    def _search_like(query: str, limit: int, cursor: Optional[str], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+        """Поиск подстроки без индекса, страницы по возрастанию id."""
+        position = Pagination.decode_cursor(cursor, 'id')
+        books_query = BookBase.query.options(SearchService._load_options(fields)).filter(
+            SearchService.like_condition(query)
+        )
+        if position is not None:
+            books_query = books_query.filter(BookBase.id > position['id'])
+        books = books_query.order_by(BookBase.id).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            next_cursor = Pagination.encode_cursor({'id': books[-1].id})
+        return {
+            'results': [{'book': book, 'rank': None, 'snippet': None} for book in books],
+            'next_cursor': next_cursor,
+        }
+
+    @staticmethod
+    def _load_options(fields: Optional[Sequence[str]]):
+        """Загрузка только нужных колонок книги (без изображения)."""
+        if fields:
+            return load_only(*BookBase.dict_columns(fields))
+        return defer(BookBase.image_data)
+
+    @staticmethod
+    def rebuild() -> None:
+        """Полная перестройка индекса по таблице books."""
+        db.session.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+        db.session.commit()
+
+    @staticmethod
+    def _highlight(snippet: Optional[str]) -> Optional[str]:
+        """Экранирование HTML во фрагменте и замена маркеров на <mark>."""
+        if snippet is None:
+            return None
+        return html.escape(snippet).replace(SearchService._MARK_START, '<mark>').replace(
+            SearchService._MARK_END, '</mark>'
+        )
@@ -0,0 +1,139 @@
+"""Статистика каталога книг."""
+
+from typing import Any, Dict, List
+
+from sqlalchemy import func, text
+
+from models import BOOK_STATS_COLUMNS, BookBase, db
+from .read_cache import ReadCache
+
+
+class StatsService:
+    """Статистика по колонкам книг: число книг, пустых и различных значений, популярные значения.
+
+    В SQLite статистика материализована в таблице book_value_counts
+    (число книг на каждое значение колонки), которую триггеры обновляют
+    при каждой записи в books. Поэтому время ответа зависит только от
+    числа различных значений, а не от числа книг.
+
+    Если таблицы нет (другая СУБД), статистика считается через GROUP BY
+    по books и кешируется в ReadCache до следующей записи.
+    """
+
+    DEFAULT_TOP = 10
+    MAX_TOP = 100
+    # Имя колонки в ответе -> поле BookBase
+    COLUMNS = {
+        'subject': 'subject',
+        'program': 'program',
+        'publisher': 'publisher',
+        'class': 'class_from',
+    }
+    INTEGER_COLUMNS = ('class_from',)
+
+    @staticmethod
+    def is_available() -> bool:
+        """Есть ли материализованная статистика в текущей БД."""
+        if db.session.get_bind().dialect.name != 'sqlite':
+            return False
+        return db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_value_counts'"
+        )).first() is not None
+
+    @staticmethod
+    def get_stats(top: int = None) -> Dict[str, Any]:
+        """Статистика каталога.
+
+        Returns:
+            Словарь с total_books и columns: для каждой колонки count (книг
+            со значением), nulls (книг без значения), distinct (различных
+            значений) и top — самые частые значения (value, count).
+        """
+        top = min(top or StatsService.DEFAULT_TOP, StatsService.MAX_TOP)
+        if StatsService.is_available():
+            return StatsService._read_materialized(top)
+        return ReadCache.get_or_load('stats', top, lambda: StatsService._compute(top))
+
+    @staticmethod
+    def rebuild() -> None:
+        """Пересчет материализованной статистики по таблице books."""
+        db.session.execute(text('DELETE FROM book_value_counts'))
+        for column in BOOK_STATS_COLUMNS:
+            db.session.execute(text(f"""
+                INSERT INTO book_value_counts(column_name, is_null, value, count)
+                SELECT '{column}', {column} IS NULL, coalesce({column}, ''), count(*)
+                FROM books
+                GROUP BY {column} IS NULL, coalesce({column}, '')
+            """))
+        db.session.commit()
+
+    @staticmethod
+    def _read_materialized(top: int) -> Dict[str, Any]:
+        """Статистика из таблицы book_value_counts."""
+        totals = db.session.execute(text("""
+            SELECT column_name,
+                   sum(count) AS total,
+                   coalesce(sum(CASE WHEN is_null THEN count END), 0) AS nulls,
+                   sum(NOT is_null) AS distinct_count
+            FROM book_value_counts
+            GROUP BY column_name
+        """)).all()
+        top_rows = db.session.execute(text("""
+            SELECT column_name, value, count FROM (
+                SELECT column_name, value, count,
+                       row_number() OVER (PARTITION BY column_name ORDER BY count DESC, value) AS position
+                FROM book_value_counts
+                WHERE NOT is_null
+            )
+            WHERE position <= :top
+            ORDER BY column_name, position
+        """), {'top': top}).all()
+
+        top_values = {}
+        for row in top_rows:
+            top_values.setdefault(row.column_name, []).append(
+                {'value': StatsService._convert(row.column_name, row.value), 'count': row.count}
+            )
+
+        by_column = {row.column_name: row for row in totals}
+        total_books = next((row.total for row in totals), 0)
+        columns = {}
+        for name, field in StatsService.COLUMNS.items():
+            row = by_column.get(field)
+            columns[name] = {
+                'count': (row.total - row.nulls) if row else 0,
+                'nulls': row.nulls if row else 0,
+                'distinct': row.distinct_count if row else 0,
+                'top': top_values.get(field, []),
+            }
+        return {'total_books': total_books, 'columns': columns}
+
+    @staticmethod
+    def _compute(top: int) -> Dict[str, Any]:
+        """Статистика по таблице books через GROUP BY."""
+        total_books = db.session.query(func.count(BookBase.id)).scalar()
+        columns = {}
+        for name, field in StatsService.COLUMNS.items():
+            column = getattr(BookBase, field)
+            values = db.session.query(column, func.count(BookBase.id)).filter(
+                column.isnot(None)
+            ).group_by(column).order_by(func.count(BookBase.id).desc(), column).all()
+            count = sum(value_count for _, value_count in values)
+            columns[name] = {
+                'count': count,
+                'nulls': total_books - count,
+                'distinct': len(values),
+                'top': StatsService._top(values, top),
+            }
+        return {'total_books': total_books, 'columns': columns}
+
+    @staticmethod
+    def _top(values: List[tuple], top: int) -> List[Dict[str, Any]]:
+        return [{'value': value, 'count': count} for value, count in values[:top]]
+
+    @staticmethod
+    def _convert(field: str, value: str) -> Any:
+        """Значение из book_value_counts (хранится текстом) в тип колонки."""
+        if field in StatsService.INTEGER_COLUMNS:
+            return int(value)
+        return value
@@ -1,7 +1,8 @@
-// Обработчик открытия модального окна
-$('.view-btn').click(function() {
+// Обработчик открытия модального окна (делегирован: строки таблицы подгружаются)
+$(document).on('click', '.view-btn', function() {
     const bookId = $(this).data('id');
     loadBookData(bookId);
+});
 
 // Загрузка данных книги в модальное окно
 function loadBookData(bookId) {
@@ -14,11 +15,15 @@ function loadBookData(bookId) {
             $('#modalBookUrlDisplay').val(book.url);
             $('#modalBookImageUrl').val(book.image_url || '');
 
-            // Устанавливаем изображение
-            if (book.image_url) {
-                $('#modalBookImage').attr('src', book.image_url).show();
+            // Устанавливаем изображение: сохраненная обложка загружается с
+            // кешируемого адреса image_src, иначе используется исходный URL
+            const imageSrc = book.image_src || book.image_url;
+            if (imageSrc) {
+                $('#modalBookImage').attr('src', imageSrc).show();
+                $('#imageStatus').text(book.image_src ? 'Обложка сохранена' : 'Обложка не сохранена');
             } else {
-                $('#modalBookImage').hide();
+                $('#modalBookImage').attr('src', '').hide();
+                $('#imageStatus').text('Нет обложки');
             }
 
             // Очищаем контейнер характеристик
@@ -54,10 +59,6 @@ $('#saveBookChanges').click(function() {
     const bookId = $('#modalBookId').val();
     const formData = new FormData(document.getElementById('bookForm'));
     const characteristics = {};
-    if (confirm('Экспортировать эту книгу в ZIP архив?')) {
-        window.location.href = '/export-book/' + bookId;
-    }
-});
 
     // Собираем характеристики из формы
     formData.forEach((value, key) => {
@@ -1,9 +1,11 @@
 import pytest
 import os
 import sys
+import tempfile
 from unittest.mock import Mock, patch
-from models import db as database
+from models import BookBase, db as database
 from app import app as flask_app
+from services import ReadCache
 
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -17,7 +19,9 @@ def app():
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
         'SQLALCHEMY_TRACK_MODIFICATIONS': False,
         'WTF_CSRF_ENABLED': False,
-        'SECRET_KEY': 'test-secret-key'
+        'SECRET_KEY': 'test-secret-key',
+        'EXPORT_CACHE_DIR': tempfile.mkdtemp(prefix='export_cache_'),
+        'EXPORT_JOB_DIR': tempfile.mkdtemp(prefix='export_jobs_'),
     })
 
     with flask_app.app_context():
@@ -36,12 +40,19 @@ def db_session(app):
         database.session.remove()
         database.drop_all()
         database.create_all()
+        ReadCache.clear()
 
         yield database
 
         database.session.rollback()
 
 
+@pytest.fixture
+def client(app):
+    """Тестовый клиент Flask"""
+    return app.test_client()
+
+
 @pytest.fixture
 def sample_book_data():
     """Фикстура с тестовыми данными книги"""
@@ -63,6 +74,60 @@ def sample_book_data():
     }
 
 
+@pytest.fixture
+def sample_book(db_session):
+    """Фикстура с сохраненной в БД книгой"""
+    book = BookBase(
+        url='https://example.com/book/1',
+        name='Test Book',
+        authors='Author One, Author Two',
+        subject='Математика',
+        class_from=5,
+        class_to=5,
+        part=1,
+        image_name='Matematika_5_1',
+    )
+    database.session.add(book)
+    database.session.commit()
+    ReadCache.invalidate()
+    return book
+
+
+@pytest.fixture
+def book_factory(db_session):
+    """Фабрика для создания нескольких книг с обложками"""
+    def create_books(count, with_image=True, **fields):
+        books = []
+        # Продолжаем нумерацию, чтобы url не совпадали при повторных вызовах
+        start = BookBase.query.count()
+        for index in range(start, start + count):
+            values = dict(
+                url=f'https://example.com/book/{index}',
+                name=f'Book {index}',
+                authors='Test Author',
+                subject='Математика',
+                class_from=5,
+                class_to=5,
+                part=index,
+                image_name=f'Matematika_5_{index}',
+            )
+            values.update(fields)
+            book = BookBase(**values)
+            if with_image:
+                book.set_image(b'\xff\xd8\xff\xe0' + bytes([index % 256]) * 256,
+                               f'https://example.com/image/{index}.jpg', 'jpeg')
+            database.session.add(book)
+            database.session.flush()
+            books.append(book)
+
+        database.session.commit()
+        # Книги записаны в обход BookService
+        ReadCache.invalidate()
+        return books
+
+    return create_books
+
+
 @pytest.fixture
 def mock_selenium():
     """Мок для Selenium"""
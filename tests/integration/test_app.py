@@ -1,6 +1,11 @@
 import pytest
+import gzip
+import io
 import json
+import re
+import time
 from unittest.mock import patch
+from services import BookService, ReadCache
 
 
 class TestAppEndpoints:
@@ -37,4 +42,380 @@ class TestAppEndpoints:
         assert response.status_code in [200, 404]  # 200 если есть книги, 404 если нет
 
         response = client.get('/export-csv')
-        assert response.status_code in [200, 404]
\ No newline at end of file
+        assert response.status_code in [200, 404]
+    def test_upload_book_image_stream(self, client, sample_book):
+        """Тест потоковой загрузки обложки телом запроса"""
+        image_data = b'\xff\xd8\xff\xe0' + b'x' * 1024
+
+        response = client.post(f'/api/books/{sample_book.id}/image', data=image_data,
+                               content_type='image/jpeg')
+        assert response.status_code == 200
+
+        response = client.post(f'/api/books/{sample_book.id}/image', data=b'not an image',
+                               content_type='application/octet-stream')
+        assert response.status_code == 415
+
+    def test_upload_decompression_bomb(self, app, client, sample_book, monkeypatch):
+        """Тест отклонения обложки, размеры которой превышают лимит Pillow"""
+        Image = pytest.importorskip('PIL.Image')
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64)).save(buffer, format='PNG')
+        monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 100)
+
+        app.config['IMAGE_TRANSCODE_FORMAT'] = 'webp'
+        try:
+            response = client.post(f'/api/books/{sample_book.id}/image', data=buffer.getvalue(),
+                                   content_type='image/png')
+        finally:
+            app.config['IMAGE_TRANSCODE_FORMAT'] = ''
+        assert response.status_code == 400
+        assert 'dimensions' in response.get_json()['error']
+
+    def test_book_detail_image(self, client, book_factory):
+        """Тест ссылки на обложку в данных книги и кеширования обложки"""
+        book = book_factory(1)[0]
+        book_id, image_hash = book.id, book.image_hash
+
+        data = client.get(f'/api/books/{book_id}').get_json()
+        assert 'image_data_base64' not in data
+        assert data['image_src'] == f'/api/books/{book_id}/image?v={image_hash}'
+        assert 'image_data_base64' in client.get(f'/api/books/{book_id}?include_image=1').get_json()
+
+        response = client.get(data['image_src'])
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        assert response.cache_control.immutable
+        etag = response.headers['ETag']
+
+        response = client.get(f'/api/books/{book_id}/image', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.cache_control.no_cache
+        assert not response.data
+
+    def test_book_image_without_hash(self, client, db_session, book_factory):
+        """Тест обложки без сохраненного хеша: ссылка без версии и ETag по данным"""
+        book = book_factory(1)[0]
+        book_id = book.id
+        book.image_hash = None
+        db_session.session.commit()
+        ReadCache.invalidate()
+
+        data = client.get(f'/api/books/{book_id}').get_json()
+        assert data['image_src'] == f'/api/books/{book_id}/image'
+
+        response = client.get(data['image_src'])
+        assert response.status_code == 200
+        assert response.cache_control.no_cache
+        etag = response.headers['ETag']
+
+        response = client.get(data['image_src'], headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+        assert client.get(f'/api/books/{book_factory(1, with_image=False)[0].id}').get_json()['image_src'] is None
+
+    def test_export_books_stream(self, client, book_factory):
+        """Тест потокового экспорта с id экспорта для следующего инкрементального"""
+        book_factory(2)
+
+        response = client.get('/export-books')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/zip'
+        export_id = response.headers['X-Export-Id']
+        response.get_data()
+
+        response = client.get(f'/export-books?since={export_id}')
+        assert response.status_code == 200
+        assert 'delta' in response.headers['Content-Disposition']
+
+        response = client.get('/export-books?since=not-a-date')
+        assert response.status_code == 400
+
+    def test_export_books_cache(self, client, book_factory):
+        """Тест: повторный полный экспорт неизменившегося каталога отдается из кеша"""
+        books = book_factory(2)
+
+        first = client.get('/export-books')
+        assert first.headers['X-Export-Cache'] == 'miss'
+        archive = first.get_data()
+
+        second = client.get('/export-books')
+        assert second.headers['X-Export-Cache'] == 'hit'
+        assert second.headers['X-Export-Id'] == first.headers['X-Export-Id']
+        assert second.get_data() == archive
+
+        BookService.delete_book(books[0].id)
+
+        third = client.get('/export-books')
+        assert third.headers['X-Export-Cache'] == 'miss'
+        third.get_data()
+
+    def test_export_books_formats(self, client, book_factory):
+        """Тест выбора формата экспорта"""
+        book_factory(2)
+
+        response = client.get('/export-books?format=ndjson')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.headers['Content-Disposition'].endswith('.ndjson')
+        assert len(response.get_data().splitlines()) == 2
+
+        response = client.get('/export-books?format=xml')
+        assert response.status_code == 400
+
+    def test_export_filters_match_index(self, client, book_factory):
+        """Тест: экспорт по фильтрам выгружает те же книги, что показывает таблица"""
+        book_factory(1, class_from=5, class_to=7)
+        book_factory(2, class_from=6, class_to=6)
+        book_factory(1, class_from=6, class_to=6, subject='Физика')
+
+        for query in ('class=6', 'class=6&subject=Математика', 'class=5'):
+            rows = client.get(f'/books/rows?{query}').get_data(as_text=True)
+            row_ids = [int(book_id) for book_id in re.findall(r'id="row-(\d+)"', rows)]
+
+            response = client.get(f'/export-books?format=ndjson&{query}')
+            exported_ids = [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()]
+            assert exported_ids == row_ids
+
+    def test_export_job(self, client, book_factory):
+        """Тест фонового экспорта: запуск, прогресс и скачивание"""
+        book_factory(2)
+
+        response = client.post('/api/exports', json={'format': 'ndjson'})
+        assert response.status_code == 202
+        location = response.headers['Location']
+
+        deadline = time.monotonic() + 10
+        while True:
+            job = client.get(location).get_json()
+            if job['status'] not in ('pending', 'running') or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+
+        assert job['status'] == 'completed'
+        assert job['progress'] == 1.0
+
+        response = client.get(f'{location}/download')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert len(response.get_data().splitlines()) == 2
+        response.close()
+
+        assert client.post('/api/exports', json={'format': 'xml'}).status_code == 400
+        assert client.get('/api/exports/999/download').status_code == 404
+
+    def test_export_books_parts(self, client, book_factory):
+        """Тест экспорта по частям: манифест, скачивание части и смена версии"""
+        books = book_factory(6)
+
+        response = client.get('/export-books/parts?max_size=2500')
+        assert response.status_code == 200
+        manifest = response.get_json()
+        assert manifest['parts_count'] > 1
+        assert manifest['books_count'] == 6
+
+        part_url = manifest['parts'][-1]['url']
+        response = client.get(part_url)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/zip'
+        assert len(response.get_data()) <= 2500
+
+        BookService.delete_book(books[0].id)
+        response = client.get(part_url)
+        assert response.status_code == 409
+
+        assert client.get('/export-books/parts?format=ndjson').status_code == 400
+
+    def test_import_books(self, client, book_factory):
+        """Тест импорта архива экспорта"""
+        book_factory(2)
+        archive = client.get('/export-books').get_data()
+
+        response = client.post('/import-books', data={'file': (io.BytesIO(archive), 'books.zip')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+        report = response.get_json()
+        assert report['updated'] == 2
+        assert report['errors'] == []
+
+        response = client.post('/import-books', data=b'PK not a zip', content_type='application/zip')
+        assert response.status_code == 400
+
+    def test_books_pages(self, client, book_factory):
+        """Тест постраничного списка книг"""
+        book_factory(3)
+
+        page = client.get('/api/books?limit=2&with_total=1').get_json()
+        assert len(page['items']) == 2
+        assert page['total'] == 3
+        assert 'image_data_base64' not in page['items'][0]
+
+        page = client.get(f"/api/books?limit=2&cursor={page['next_cursor']}").get_json()
+        assert len(page['items']) == 1
+        assert page['next_cursor'] is None
+
+        assert client.get('/api/books?cursor=broken').status_code == 400
+        assert client.get('/api/books?limit=0').status_code == 400
+
+    def test_books_list(self, client, book_factory):
+        """Тест: без limit и cursor возвращается массив всех книг"""
+        books = book_factory(3)
+        book_ids = [book.id for book in books]
+
+        data = client.get('/api/books').get_json()
+        assert [item['id'] for item in data] == book_ids
+        assert 'image_data_base64' not in data[0]
+
+    def test_books_fields(self, client, book_factory):
+        """Тест выборки полей книг в списках API"""
+        book_factory(2, subject='Физика')
+
+        page = client.get('/api/books?limit=10&fields=id,name').get_json()
+        assert [set(item) for item in page['items']] == [{'id', 'name'}, {'id', 'name'}]
+        data = client.get('/api/books?fields=id,name').get_json()
+        assert [set(item) for item in data] == [{'id', 'name'}, {'id', 'name'}]
+
+        data = client.get('/api/books/search?q=Физика&fields=name').get_json()
+        assert set(data['items'][0]) == {'name', 'rank', 'snippet'}
+
+        assert client.get('/api/books?fields=id,unknown').status_code == 400
+        assert client.get('/api/books/search?q=Физика&fields=unknown').status_code == 400
+
+    def test_response_compression(self, client, book_factory):
+        """Тест сжатия текстовых ответов gzip"""
+        books = book_factory(20, subject='Физика')
+        book_id = books[0].id
+        gzip_headers = {'Accept-Encoding': 'gzip, deflate'}
+
+        response = client.get('/api/books', headers=gzip_headers)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.vary
+        assert len(json.loads(gzip.decompress(response.data))) == 20
+
+        response = client.get('/api/books?stream=1', headers=gzip_headers)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert len(gzip.decompress(response.data).splitlines()) == 20
+
+        assert 'Content-Encoding' not in client.get('/api/books').headers
+        assert 'Content-Encoding' not in client.get('/api/books?limit=1&fields=id', headers=gzip_headers).headers
+        assert 'Content-Encoding' not in client.get(f'/api/books/{book_id}/image', headers=gzip_headers).headers
+        assert 'Content-Encoding' not in client.get('/api/books', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+
+    def test_books_stream(self, client, book_factory):
+        """Тест потоковых ответов NDJSON"""
+        books = book_factory(3, subject='Физика')
+        book_ids = [book.id for book in books]
+
+        response = client.get('/api/books?stream=1&fields=id,subject')
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line) for line in lines] == [{'id': book_id, 'subject': 'Физика'} for book_id in book_ids]
+
+        response = client.get('/api/books/search?q=Физика', headers={'Accept': 'application/x-ndjson'})
+        items = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert sorted(item['id'] for item in items) == book_ids
+        assert '<mark>' in items[0]['snippet']
+        assert 'image_data_base64' not in items[0]
+
+        assert client.get('/api/books?stream=1&fields=unknown').status_code == 400
+        assert client.get('/api/books', headers={'Accept': 'application/json'}).mimetype == 'application/json'
+
+    def test_index_rows_pages(self, app, client, book_factory):
+        """Тест постраничной загрузки строк таблицы главной страницы"""
+        books = book_factory(3, subject='Математика') + book_factory(2, subject='Физика')
+        book_ids = [book.id for book in books]
+        app.config['INDEX_PAGE_SIZE'] = 2
+        try:
+            page = client.get('/').get_data(as_text=True)
+            assert f'id="row-{book_ids[1]}"' in page
+            assert f'id="row-{book_ids[2]}"' not in page
+            assert 'Показано: 2 из 5' in page
+            assert 'loading="lazy"' in page
+
+            response = client.get('/books/rows?subject=Физика')
+            assert response.headers['X-Total-Count'] == '2'
+            assert response.headers['X-Next-Cursor'] == ''
+            rows = response.get_data(as_text=True)
+            assert [f'id="row-{book_id}"' in rows for book_id in book_ids] == [False] * 3 + [True] * 2
+
+            response = client.get('/books/rows')
+            response = client.get(f"/books/rows?cursor={response.headers['X-Next-Cursor']}")
+            assert f'id="row-{book_ids[2]}"' in response.get_data(as_text=True)
+
+            assert client.get('/books/rows?cursor=broken').status_code == 400
+            assert client.get('/books/rows?class=x').status_code == 400
+        finally:
+            app.config['INDEX_PAGE_SIZE'] = 50
+
+    def test_book_facets(self, client, book_factory):
+        """Тест фасетов фильтров главной страницы"""
+        book_factory(2, subject='Математика')
+        book_factory(1, subject='Физика')
+
+        data = client.get('/api/books/facets?subject=Физика').get_json()
+        assert data['total'] == 1
+        assert {item['value']: item['count'] for item in data['facets']['subject']} == {'Математика': 2, 'Физика': 1}
+
+        assert client.get('/api/books/facets?class=x').status_code == 400
+        assert 'Математика (2)' in client.get('/').get_data(as_text=True)
+
+        client.get('/api/books/facets?subject=Физика')
+        stats = client.get('/api/cache/stats').get_json()
+        assert stats['backend'] == 'memory'
+        assert stats['namespaces']['facets']['hits'] >= 1
+
+    def test_book_characteristics(self, client, book_factory):
+        """Тест поиска по характеристикам и их правки через API"""
+        books = book_factory(2)
+        response = client.put(f'/api/books/{books[0].id}', json={'characteristics': {'Год издания': '2023'}})
+        assert response.status_code == 200
+
+        response = client.get('/api/books/characteristics/Год издания?value=2023')
+        assert [book['id'] for book in response.get_json()] == [books[0].id]
+
+        response = client.get('/api/books/characteristics/Год издания/values?with_counts=1')
+        assert response.get_json()['values'] == [{'value': '2023', 'count': 1}]
+
+        book = client.get(f'/api/books/{books[0].id}').get_json()
+        assert book['characteristics'] == {'Год издания': '2023'}
+
+    def test_book_changes(self, client, book_factory):
+        """Тест ленты изменений через API"""
+        book_id, url = [(book.id, book.url) for book in book_factory(2)][0]
+
+        page = client.get('/api/books/changes').get_json()
+        assert [change['op'] for change in page['changes']] == ['upsert', 'upsert']
+
+        client.post('/delete', data={'book_id': book_id})
+        page = client.get(f"/api/books/changes?since={page['next_cursor']}").get_json()
+        assert page['changes'] == [{'id': book_id, 'url': url, 'op': 'delete', 'at': page['changes'][0]['at']}]
+
+        assert client.get('/api/books/changes?since=broken').status_code == 400
+
+    def test_book_stats(self, client, book_factory):
+        """Тест статистики каталога"""
+        book_factory(2, program='Основное общее образование')
+
+        stats = client.get('/api/books/stats?top=5').get_json()
+        assert stats['total_books'] == 2
+        assert stats['columns']['program']['top'] == [{'value': 'Основное общее образование', 'count': 2}]
+
+        assert client.get('/api/books/stats?top=x').status_code == 400
+
+    def test_search_books(self, client, book_factory):
+        """Тест полнотекстового поиска через API"""
+        book_factory(2, name='Русский язык')
+        book_factory(1)
+
+        response = client.get('/api/books/search?q=русского языка&limit=1&with_total=1')
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['items']) == 1
+        assert page['items'][0]['name'] == 'Русский язык'
+        assert '<mark>' in page['items'][0]['snippet']
+        assert page['total'] == 2
+
+        response = client.get(f"/api/books/search?q=русского языка&limit=1&cursor={page['next_cursor']}")
+        assert len(response.get_json()['items']) == 1
+        assert response.get_json()['next_cursor'] is None
+
+        assert client.get('/api/books/search').status_code == 400
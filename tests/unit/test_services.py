@@ -1,6 +1,17 @@
+import base64
+import hashlib
+import io
+import json
+import zipfile
+import os
+from datetime import datetime, timedelta
+
 import pytest
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
 from unittest.mock import Mock, patch
-from services import BookService, ExportService
+from services import BookService, ChangeFeedService, ExportJobService, ExportService, ExportOptions, FacetService, ImageService, ImportService, OrjsonProvider, ReadCache, SearchService, StatsService, ImageUploadError, ImageTooLargeError, InvalidCursorError
+from models import BookBase, BookCharacteristick, ExportJob
 
 
 class TestBookService:
@@ -29,6 +40,156 @@ class TestBookService:
         assert book2.id == book1.id
         assert book2.name == 'Updated Book Name'
 
+    def test_create_or_update_book_image_hash(self, db_session):
+        """Тест: обложка из сырых данных сохраняется с хешем"""
+        raw_data = {
+            'url': 'https://example.com/book/1',
+            BookCharacteristick.NAME: 'Test Book',
+            BookCharacteristick.AUTHORS: 'Test Author',
+            'image_data_base64': base64.b64encode(PNG_HEADER).decode('ascii'),
+            'image_type': 'png',
+        }
+        book = BookService.create_or_update_book(raw_data)
+        assert book.image_hash == hashlib.sha256(PNG_HEADER).hexdigest()
+        assert book.image_type == 'png'
+
+        image_data = PNG_HEADER + b'\x00' * 16
+        raw_data['image_data_base64'] = base64.b64encode(image_data).decode('ascii')
+        book = BookService.create_or_update_book(raw_data)
+        assert book.image_data == image_data
+        assert book.image_hash == hashlib.sha256(image_data).hexdigest()
+
+    def test_upsert_books(self, db_session, book_factory):
+        """Тест пакетной записи: вставка, обновление без затирания, повторы и ошибки"""
+        existing = book_factory(1)[0]
+        original_hash = existing.image_hash
+
+        rows = [
+            {'url': existing.url, 'name': 'Новое название', 'authors': None},
+            {'url': 'https://example.com/new/1', 'name': 'Новая книга', 'authors': 'Автор'},
+            {'url': 'https://example.com/new/2', 'name': 'Без авторов'},
+            {'name': 'Без URL', 'authors': 'Автор'},
+            {'url': 'https://example.com/new/1', 'description': 'Описание'},
+        ]
+        outcomes = BookService.upsert_books(rows)
+
+        assert [outcome['status'] for outcome in outcomes] == ['updated', 'duplicate', 'error', 'error', 'inserted']
+        assert outcomes[0]['id'] == existing.id
+
+        db_session.session.expire_all()
+        book = BookService.get_book(existing.id)
+        assert book.name == 'Новое название'
+        assert book.authors == 'Test Author'
+        assert book.image_hash == original_hash
+
+        book = BookService.get_book_by_url('https://example.com/new/1')
+        assert book.id == outcomes[4]['id']
+        assert book.description == 'Описание'
+        assert book.created_at is not None
+        assert BookService.count_books() == 2
+
+    def test_create_or_update_many(self, db_session):
+        """Тест пакетной записи сырых данных парсера"""
+        raw_items = [{
+            'url': f'https://example.com/raw/{index}',
+            BookCharacteristick.NAME: f'Учебник {index}',
+            BookCharacteristick.AUTHORS: 'Автор',
+            BookCharacteristick.SUBJECT: 'Математика',
+            BookCharacteristick.CLASSES: '5-6',
+        } for index in range(5)]
+
+        outcomes = BookService.create_or_update_many(raw_items)
+        assert {outcome['status'] for outcome in outcomes} == {'inserted'}
+
+        outcomes = BookService.create_or_update_many(raw_items, chunk_size=2)
+        assert {outcome['status'] for outcome in outcomes} == {'updated'}
+        assert BookService.get_book(outcomes[0]['id']).class_to == 6
+
+    def test_characteristics(self, db_session):
+        """Тест хранения и поиска всех характеристик со страницы учебника"""
+        raw_items = [{
+            'url': f'https://example.com/raw/{index}',
+            BookCharacteristick.NAME: f'Учебник {index}',
+            BookCharacteristick.AUTHORS: 'Автор',
+            BookCharacteristick.SUBJECT: 'Математика',
+            'ISBN': f'978-5-{index}',
+            'Год издания': '2023' if index < 2 else '2024',
+        } for index in range(3)]
+        outcomes = BookService.create_or_update_many(raw_items)
+        book_ids = [outcome['id'] for outcome in outcomes]
+
+        book = BookService.get_book(book_ids[0])
+        assert book.characteristics == {'Авторы': 'Автор', 'Предмет': 'Математика', 'ISBN': '978-5-0',
+                                        'Год издания': '2023'}
+
+        books = BookService.get_books_by_characteristic('Год издания', '2023')
+        assert [book.id for book in books] == book_ids[:2]
+        assert BookService.get_unique_characteristic_values('Год издания') == ['2023', '2024']
+        assert BookService.get_unique_characteristic_values('Год издания', with_counts=True) == [
+            ('2023', 2), ('2024', 1)
+        ]
+
+        # Правка характеристик обновляет и соответствующие поля книги
+        assert BookService.update_book_characteristics(book_ids[2], {
+            BookCharacteristick.SUBJECT: 'Алгебра', 'Год издания': '2023', 'image_url': None,
+        })
+        book = BookService.get_book(book_ids[2])
+        assert book.subject == 'Алгебра'
+        assert book.get_characteristic('Предмет') == 'Алгебра'
+        assert BookService.get_unique_characteristic_values('Год издания') == ['2023']
+        assert not BookService.update_book_characteristics(0, {})
+
+        BookService.delete_book(book_ids[0])
+        assert [book.id for book in BookService.get_books_by_characteristic('Год издания', '2023')] == book_ids[1:]
+
+    def test_get_books_page(self, db_session, book_factory):
+        """Тест постраничного чтения книг по курсору"""
+        books = book_factory(5)
+
+        page = BookService.get_books_page(limit=2, with_total=True)
+        assert [book.id for book in page['books']] == [books[0].id, books[1].id]
+        assert page['total'] == 5
+
+        page = BookService.get_books_page(limit=2, cursor=page['next_cursor'])
+        page = BookService.get_books_page(limit=2, cursor=page['next_cursor'])
+        assert [book.id for book in page['books']] == [books[4].id]
+        assert page['next_cursor'] is None
+        assert 'total' not in page
+
+        with pytest.raises(InvalidCursorError):
+            BookService.get_books_page(cursor='broken')
+
+    def test_get_books_page_fields(self, db_session, book_factory):
+        """Тест выборки только нужных полей книг"""
+        books = book_factory(3, series=None)
+
+        fields = BookBase.parse_fields('name, series,name')
+        assert fields == ('name', 'series')
+        assert BookBase.parse_fields('') is None
+        with pytest.raises(ValueError):
+            BookBase.parse_fields('name,image_data')
+
+        page = BookService.get_books_page(limit=2, fields=fields)
+        assert set(page['books'][0]._fields) == {'id', 'name', 'series'}
+        assert BookBase.serialize(page['books'][0], fields) == books[0].to_dict(fields=fields)
+        assert BookBase.serialize(page['books'][0], fields) == {'name': books[0].name, 'series': ''}
+
+        page = BookService.get_books_page(limit=2, cursor=page['next_cursor'], fields=fields)
+        assert [row.id for row in page['books']] == [books[2].id]
+
+    def test_stream_books(self, db_session, book_factory):
+        """Тест потокового чтения книг пачками"""
+        books = book_factory(5, with_image=False) + book_factory(2, with_image=False, subject='Физика')
+
+        rows = list(BookService.stream_books(fields=('name',), batch_size=2))
+        assert [row.id for row in rows] == [book.id for book in books]
+        assert set(rows[0]._fields) == {'id', 'name'}
+
+        query = BookService.build_filters_query({'subject': 'Физика'})
+        assert [BookBase.serialize(row, ('id', 'subject')) for row in BookService.stream_books(query)] == [
+            {'id': book.id, 'subject': 'Физика'} for book in books[5:]
+        ]
+
     @patch('services.requests.get')
     def test_download_and_save_image_success(self, mock_get, db_session):
         """Тест успешного скачивания изображения"""
@@ -73,4 +234,728 @@ class TestExportService:
         # Проверяем наличие данных
         assert 'Test Book' in csv_content
         assert 'Second Book' in csv_content
-        assert 'Author One' in csv_content
\ No newline at end of file
+        assert 'Author One' in csv_content
+
+    def test_stream_books_zip(self, book_factory):
+        """Тест потокового экспорта в ZIP пачками"""
+        book_factory(5)
+
+        chunks = list(ExportService.stream_books_zip(batch_size=2))
+        assert len(chunks) > 1
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zip_file:
+            names = zip_file.namelist()
+            csv_rows = zip_file.read('books_import.csv').decode('utf-8-sig').splitlines()
+
+        assert names[0] == 'books_import.csv'
+        assert len(names) == 6
+        assert len(csv_rows) == 6
+
+    def test_stream_books_zip_compression(self, book_factory):
+        """Тест: CSV сжимается, обложки хранятся без сжатия"""
+        book_factory(3)
+
+        archive = b''.join(ExportService.stream_books_zip())
+
+        with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+            assert zip_file.testzip() is None
+            infos = zip_file.infolist()
+
+        assert infos[0].compress_type == zipfile.ZIP_DEFLATED
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in infos[1:])
+
+    def test_stream_books_zip_delta(self, book_factory):
+        """Тест инкрементального экспорта от предыдущего экспорта"""
+        books = book_factory(3)
+        book_ids = [book.id for book in books]
+
+        full_export = ExportService.start_export()
+        b''.join(ExportService.stream_books_zip(export=full_export))
+        assert full_export.completed_at is not None
+        assert full_export.books_count == 3
+
+        # Меняем обложку одной книги и удаляем другую
+        ImageService.save_image_stream(book_ids[0], iter([PNG_HEADER]))
+        BookService.delete_book(book_ids[1])
+
+        since = ExportService.resolve_since(str(full_export.id))
+        assert since == full_export.watermark
+
+        delta_export = ExportService.start_export(since)
+        archive = b''.join(ExportService.stream_books_zip(export=delta_export))
+
+        with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+            csv_rows = zip_file.read('books_import.csv').decode('utf-8-sig').splitlines()
+            manifest = json.loads(zip_file.read('export_manifest.json'))
+
+        assert len(csv_rows) == 2
+        assert 'https://example.com/book/0' in csv_rows[1]
+        assert manifest['export']['export_id'] == delta_export.id
+        assert manifest['export']['mode'] == 'delta'
+        assert [item['url'] for item in manifest['deleted']] == ['https://example.com/book/1']
+
+    def test_stream_books_zip_filtered(self, book_factory):
+        """Тест экспорта с фильтрами главной страницы"""
+        book_factory(3)
+        book_factory(2, subject='Физика', class_from=7, class_to=9)
+
+        options = ExportOptions.from_args({'subject': 'Физика', 'class': '7'})
+        archive = b''.join(ExportService.stream_books_zip(options.build_query()))
+
+        with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+            csv_rows = zip_file.read('books_import.csv').decode('utf-8-sig').splitlines()
+
+        assert len(csv_rows) == 3
+        assert all('Физика' in row for row in csv_rows[1:])
+
+        assert not BookService.has_books(ExportOptions.from_args({'class': '8'}).build_query())
+        assert BookService.has_books(ExportOptions.from_args({'class_min': '8', 'class_max': '8'}).build_query())
+        options = ExportOptions.from_args({'class_min': '10'})
+        assert not BookService.has_books(options.build_query())
+
+        with pytest.raises(ValueError):
+            ExportOptions.from_args({'class': 'пятый'})
+
+    def test_stream_books_ndjson(self, book_factory):
+        """Тест экспорта в NDJSON со ссылкой на обложку и со встроенной обложкой"""
+        books = book_factory(3)
+
+        lines = b''.join(ExportService.stream_books('ndjson')).decode('utf-8').splitlines()
+        records = [json.loads(line) for line in lines]
+        assert [record['id'] for record in records] == [book.id for book in books]
+        assert records[0]['image_hash'] == books[0].image_hash
+        assert 'image_data' not in records[0]
+
+        lines = b''.join(ExportService.stream_books('ndjson', embed_images=True)).decode('utf-8').splitlines()
+        record = json.loads(lines[0])
+        assert base64.b64decode(record['image_data']) == books[0].image_data
+
+    @pytest.mark.parametrize('export_format', ['parquet', 'arrow'])
+    def test_stream_books_columnar(self, book_factory, export_format):
+        """Тест экспорта в Parquet и Arrow"""
+        pa = pytest.importorskip('pyarrow')
+        books = book_factory(5)
+
+        data = b''.join(ExportService.stream_books(export_format, batch_size=2, embed_images=True))
+        if export_format == 'parquet':
+            import pyarrow.parquet as pq
+            table = pq.read_table(io.BytesIO(data))
+        else:
+            table = pa.ipc.open_stream(data).read_all()
+
+        assert table.num_rows == 5
+        assert table.column('name').to_pylist() == [book.name for book in books]
+        assert table.column('image_data').to_pylist()[0] == books[0].image_data
+
+    def test_export_options_format(self):
+        """Тест разбора формата экспорта"""
+        options = ExportOptions.from_args({'format': 'NDJSON', 'images': 'embed'})
+        assert options.format == 'ndjson'
+        assert options.embed_images
+        assert options.mimetype == 'application/x-ndjson'
+
+        with pytest.raises(ValueError):
+            ExportOptions.from_args({'format': 'xml'})
+        with pytest.raises(ValueError):
+            ExportOptions.from_args({'images': 'inline'})
+
+    def test_plan_parts(self, book_factory):
+        """Тест разбиения экспорта на части не больше заданного размера"""
+        books = book_factory(10)
+        max_size = 3000
+
+        parts = ExportService.plan_parts(max_size=max_size, batch_size=4)
+        assert len(parts) > 1
+        assert sum(part['books_count'] for part in parts) == 10
+        assert parts[0]['first_id'] == books[0].id
+        assert parts[-1]['last_id'] == books[-1].id
+
+        exported_rows = []
+        for part in parts:
+            archive = b''.join(ExportService.stream_books_zip(ExportService.build_part_query(None, part)))
+            assert len(archive) <= max_size
+
+            with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+                csv_rows = zip_file.read('books_import.csv').decode('utf-8-sig').splitlines()[1:]
+                # Каждая часть содержит обложки своих книг
+                assert len(zip_file.namelist()) == len(csv_rows) + 1
+            exported_rows.extend(csv_rows)
+
+        assert len(exported_rows) == 10
+
+    def test_resolve_since_invalid(self, db_session):
+        """Тест: неизвестный экспорт или некорректная дата"""
+        with pytest.raises(ValueError):
+            ExportService.resolve_since('999')
+        with pytest.raises(ValueError):
+            ExportService.resolve_since('yesterday')
+
+    def test_stream_books_zip_query_count(self, db_session, book_factory):
+        """Тест: число запросов экспорта зависит от числа пачек, а не книг"""
+        book_factory(40)
+
+        def count_queries(batch_size):
+            statements = []
+
+            def before_cursor_execute(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(db_session.engine, 'before_cursor_execute', before_cursor_execute)
+            try:
+                for _ in ExportService.stream_books_zip(batch_size=batch_size):
+                    pass
+            finally:
+                event.remove(db_session.engine, 'before_cursor_execute', before_cursor_execute)
+            return len(statements)
+
+        # На пачку: чтение книг в CSV, повторное чтение и одна выборка изображений
+        assert count_queries(batch_size=10) <= 3 * 5
+        assert count_queries(batch_size=100) <= 3
+
+PNG_HEADER = b'\x89PNG\r\n\x1a\n' + b'\x00' * 8
+
+
+
+class TestExportJobService:
+    """Тесты для ExportJobService"""
+
+    def test_run_job(self, app, db_session, book_factory):
+        """Тест выполнения задачи экспорта с прогрессом"""
+        book_factory(3)
+
+        job = ExportJobService.create_job(ExportOptions(format='ndjson', images='embed'))
+        ExportJobService.run_job(app, job.id)
+        # Задача выполнялась в другой сессии
+        db_session.session.expire_all()
+
+        job = ExportJobService.get_job(job.id)
+        assert job.status == 'completed'
+        assert job.books_total == job.books_written == 3
+        assert job.images_total == job.images_written == 3
+        assert job.bytes_written == os.path.getsize(job.file_path)
+        assert job.progress == 1.0
+        assert job.export_id is not None
+
+    def test_expire_jobs(self, app, db_session, book_factory):
+        """Тест удаления файлов после истечения срока хранения"""
+        book_factory(1)
+
+        job = ExportJobService.create_job(ExportOptions())
+        ExportJobService.run_job(app, job.id)
+        db_session.session.expire_all()
+        job = ExportJobService.get_job(job.id)
+        file_path = job.file_path
+        assert zipfile.is_zipfile(file_path)
+
+        job.expires_at = datetime.now() - timedelta(seconds=1)
+        db_session.session.commit()
+
+        assert ExportJobService.expire_jobs() == 1
+        assert job.status == 'expired'
+        assert not os.path.exists(file_path)
+
+    def test_failed_job(self, app, db_session, book_factory):
+        """Тест: ошибка экспорта сохраняется в задаче"""
+        book_factory(1)
+        job = ExportJobService.create_job(ExportOptions())
+
+        with patch.object(ExportService, 'stream_books', side_effect=RuntimeError('disk full')):
+            ExportJobService.run_job(app, job.id)
+        # Задача выполнялась в другой сессии
+        db_session.session.expire_all()
+
+        job = ExportJobService.get_job(job.id)
+        assert job.status == 'failed'
+        assert job.error == 'disk full'
+        assert job.file_path is None
+
+    def test_interrupted_jobs(self, app, db_session):
+        """Тест: задачи другого процесса без сигнала жизни помечаются failed"""
+        def partial_file(name):
+            file_path = os.path.join(ExportJobService.get_directory(), name)
+            with open(file_path, 'wb') as f:
+                f.write(b'partial')
+            return file_path
+
+        stale_path = partial_file('export_interrupted.zip')
+        alive_path = partial_file('export_alive.zip')
+        stale_at = datetime.now() - ExportJobService.get_heartbeat_timeout() - timedelta(seconds=1)
+        running = ExportJob(status='running', params='{}', file_path=stale_path, owner='host:1:dead',
+                            heartbeat_at=stale_at)
+        pending = ExportJob(status='pending', params='{}')
+        # Задача другого работающего процесса
+        alive = ExportJob(status='running', params='{}', file_path=alive_path, owner='host:2:alive',
+                          heartbeat_at=datetime.now())
+        db_session.session.add_all([running, pending, alive])
+        db_session.session.commit()
+        # Задача текущего процесса ожидает выполнения в пуле
+        current = ExportJobService.create_job(ExportOptions())
+        current.heartbeat_at = stale_at
+        db_session.session.commit()
+
+        job = ExportJobService.get_job(running.id)
+        assert job.status == 'failed'
+        assert job.file_path is None
+        assert job.completed_at is not None
+        assert not os.path.exists(stale_path)
+        assert ExportJobService.get_job(pending.id).status == 'failed'
+        assert ExportJobService.get_job(alive.id).status == 'running'
+        assert os.path.exists(alive_path)
+        assert ExportJobService.get_job(current.id).status == 'pending'
+
+    def test_job_failed_while_running(self, app, db_session, book_factory):
+        """Тест: задача, помеченная failed во время выполнения, не становится completed"""
+        book_factory(1)
+        job = ExportJobService.create_job(ExportOptions(format='ndjson'))
+        job_id = job.id
+        stream_books = ExportService.stream_books
+
+        def fail_job(*args, **kwargs):
+            for chunk in stream_books(*args, **kwargs):
+                yield chunk
+            # Другой процесс посчитал задачу прерванной
+            ExportJob.query.filter(ExportJob.id == job_id).update(
+                {'status': 'failed', 'file_path': None}, synchronize_session=False
+            )
+
+        with patch.object(ExportService, 'stream_books', side_effect=fail_job):
+            ExportJobService.run_job(app, job_id)
+        db_session.session.expire_all()
+
+        job = ExportJobService.get_job(job_id)
+        assert job.status == 'failed'
+        assert job.file_path is None
+        file_name = f'export_{job_id}.{ExportOptions(format="ndjson").extension}'
+        assert not os.path.exists(os.path.join(ExportJobService.get_directory(), file_name))
+
+
+class TestImportService:
+    """Тесты для ImportService"""
+
+    def test_import_exported_archive(self, db_session, book_factory):
+        """Тест: архив экспорта импортируется обратно вместе с обложками"""
+        books = book_factory(5, class_to=6)
+        expected = {book.url: (book.name, book.class_to, book.image_hash) for book in books}
+        archive = b''.join(ExportService.stream_books_zip())
+
+        for book in books:
+            BookService.delete_book(book.id)
+
+        report = ImportService.import_file(io.BytesIO(archive), batch_size=2)
+        assert report.rows_total == 5
+        assert report.inserted == 5
+        assert report.images == 5
+        assert report.errors_count == 0
+        assert report.rows_per_second > 0
+
+        db_session.session.expire_all()
+        for url, values in expected.items():
+            book = BookService.get_book_by_url(url)
+            assert (book.name, book.class_to, book.image_hash) == values
+            assert book.image_type == 'jpeg'
+
+        # Повторный импорт обновляет книги, а не создает дубли
+        report = ImportService.import_file(io.BytesIO(archive))
+        assert report.updated == 5
+        assert BookService.count_books() == 5
+
+    def test_import_shared_image_name(self, db_session, book_factory):
+        """Тест: обложки книг с одинаковым image_name не путаются при импорте"""
+        books = book_factory(3, image_name='Matematika_5_1')
+        expected = {book.url: book.image_hash for book in books}
+        archive = b''.join(ExportService.stream_books_zip())
+
+        with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+            assert len(set(zip_file.namelist())) == 4
+
+        for book in books:
+            BookService.delete_book(book.id)
+
+        report = ImportService.import_file(io.BytesIO(archive))
+        assert report.images == 3
+        assert report.errors_count == 0
+        db_session.session.expire_all()
+        for url, image_hash in expected.items():
+            book = BookService.get_book_by_url(url)
+            assert book.image_hash == image_hash
+            assert book.image_name == 'Matematika_5_1'
+
+    def test_import_duplicate_image_entries(self, db_session):
+        """Тест: повторяющееся имя обложки в архиве — ошибка строки, а не чужая обложка"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zip_file:
+            zip_file.writestr('books_import.csv', (
+                '\ufeffImage,Name,Authors,UrlResurse\r\n'
+                'Matematika_5_1.png,Книга 1,Автор,https://example.com/csv/1\r\n'
+                'Matematika_5_1.png,Книга 2,Автор,https://example.com/csv/2\r\n'
+                'Fizika_7_1.png,Книга 3,Автор,https://example.com/csv/3\r\n'
+            ).encode('utf-8'))
+            with pytest.warns(UserWarning):
+                zip_file.writestr('Matematika_5_1.png', PNG_HEADER + b'\x01')
+                zip_file.writestr('Matematika_5_1.png', PNG_HEADER + b'\x02')
+            zip_file.writestr('Fizika_7_1.png', PNG_HEADER + b'\x03')
+
+        report = ImportService.import_file(io.BytesIO(buffer.getvalue()))
+        assert report.inserted == 1
+        assert report.images == 1
+        assert [error['row'] for error in report.errors] == [2, 3]
+        assert 'Matematika_5_1.png' in report.errors[0]['error']
+
+    def test_import_csv_errors(self, db_session):
+        """Тест ошибок по строкам при импорте CSV"""
+        csv_data = (
+            '\ufeffName,Authors,ClassFrom,UrlResurse\r\n'
+            'Книга,Автор,5,https://example.com/csv/1\r\n'
+            'Без авторов,,5,https://example.com/csv/2\r\n'
+            'Книга,Автор,пятый,https://example.com/csv/3\r\n'
+        ).encode('utf-8')
+
+        report = ImportService.import_file(io.BytesIO(csv_data))
+        assert report.inserted == 1
+        assert report.errors_count == 2
+        assert [error['row'] for error in report.errors] == [4, 3]
+
+        with pytest.raises(ValueError):
+            ImportService.import_file(io.BytesIO('Name,Authors\r\n'.encode('utf-8')))
+
+
+
+class TestFacetService:
+    """Тесты для FacetService"""
+
+    def test_get_facets(self, db_session, book_factory):
+        """Тест подсчета значений фильтров с учетом выбранных"""
+        book_factory(2, subject='Математика', class_from=5)
+        book_factory(1, subject='Математика', class_from=6)
+        book_factory(1, subject='Физика', class_from=7)
+
+        facets = FacetService.get_facets()
+        assert facets['subject'] == [{'value': 'Математика', 'count': 3}, {'value': 'Физика', 'count': 1}]
+        assert [item['value'] for item in facets['class']] == [5, 6, 7]
+
+        # Фасет не ограничивается собственным фильтром
+        selected = FacetService.parse_selected({'subject': 'Математика', 'class': '5'})
+        facets = FacetService.get_facets(selected)
+        assert facets['class'] == [{'value': 5, 'count': 2}, {'value': 6, 'count': 1}]
+        assert facets['subject'] == [{'value': 'Математика', 'count': 2}]
+        assert FacetService.count(selected) == 2
+
+        with pytest.raises(ValueError):
+            FacetService.parse_selected({'class': 'пятый'})
+
+
+class TestChangeFeedService:
+    """Тесты для ChangeFeedService"""
+
+    def test_get_changes(self, db_session, book_factory):
+        """Тест ленты изменений с продолжением по курсору"""
+        books = book_factory(3)
+
+        page = ChangeFeedService.get_changes(limit=2)
+        assert [change['id'] for change in page['changes']] == [books[0].id, books[1].id]
+        assert page['has_more']
+        page = ChangeFeedService.get_changes(page['next_cursor'], limit=2)
+        assert [change['id'] for change in page['changes']] == [books[2].id]
+        assert not page['has_more']
+
+        # Изменения после синхронизации: обложка, характеристики и удаление
+        cursor = page['next_cursor']
+        assert ChangeFeedService.get_changes(cursor)['changes'] == []
+        ImageService.save_image_stream(books[1].id, [PNG_HEADER + b'\x00' * 16])
+        BookService.update_book_characteristics(books[0].id, {'ISBN': '978-5'})
+        BookService.delete_book(books[2].id)
+
+        page = ChangeFeedService.get_changes(cursor)
+        assert [(change['id'], change['op']) for change in page['changes']] == [
+            (books[1].id, 'upsert'), (books[0].id, 'upsert'), (books[2].id, 'delete'),
+        ]
+        assert ChangeFeedService.get_changes(page['next_cursor'])['changes'] == []
+
+        with pytest.raises(InvalidCursorError):
+            ChangeFeedService.get_changes('broken')
+
+    def test_change_committed_after_cursor(self, db_session, book_factory):
+        """Тест: изменение с более ранним updated_at, зафиксированное после курсора, не теряется"""
+        books = book_factory(2)
+        book_id = books[0].id
+        cursor = ChangeFeedService.get_changes()['next_cursor']
+
+        # Транзакция взяла время до выдачи курсора, а зафиксирована после
+        book = db_session.session.get(BookBase, book_id)
+        book.name = 'Изменено'
+        book.updated_at = datetime.now() - timedelta(hours=1)
+        db_session.session.commit()
+
+        page = ChangeFeedService.get_changes(cursor)
+        assert [(change['id'], change['op']) for change in page['changes']] == [(book_id, 'upsert')]
+
+
+class TestReadCache:
+    """Тесты для ReadCache"""
+
+    def test_invalidated_by_writes(self, db_session, sample_book):
+        """Тест: записи через BookService и ImageService сбрасывают кеш"""
+        assert BookService.book_exists(sample_book.url)
+        assert BookService.book_exists(sample_book.url)
+        assert BookService.get_unique_values('subject') == ['Математика']
+
+        book = BookService.get_book(sample_book.id)
+        book.subject = 'Физика'
+        db_session.session.commit()
+        # Изменение в обход BookService кеш не сбрасывает
+        assert BookService.get_unique_values('subject') == ['Математика']
+
+        ImageService.save_image_stream(sample_book.id, [PNG_HEADER + b'\x00' * 16])
+        assert BookService.get_unique_values('subject') == ['Физика']
+        assert BookService.get_book(sample_book.id).image_data.startswith(PNG_HEADER)
+
+        BookService.delete_book(sample_book.id)
+        assert not BookService.book_exists(sample_book.url)
+        assert BookService.get_book(sample_book.id) is None
+
+        stats = ReadCache.get_stats()
+        assert stats['namespaces']['book_exists'] == {'hits': 1, 'misses': 2, 'hit_ratio': 0.3333}
+
+    def test_lru_and_ttl(self, app, monkeypatch):
+        """Тест вытеснения по числу записей и времени жизни"""
+        loads = []
+
+        def load(value):
+            loads.append(value)
+            return value
+
+        with app.app_context():
+            ReadCache.clear()
+            monkeypatch.setitem(app.config, 'READ_CACHE_MAX_ENTRIES', 2)
+            for value in (1, 2, 1, 3, 2):
+                assert ReadCache.get_or_load('test', value, lambda: load(value)) == value
+            # 2 вытеснена при добавлении 3, так как 1 использовалась позже
+            assert loads == [1, 2, 3, 2]
+
+            monkeypatch.setitem(app.config, 'READ_CACHE_TTL', 0)
+            ReadCache.get_or_load('test', 4, lambda: load(4))
+            ReadCache.get_or_load('test', 4, lambda: load(4))
+            assert loads[-2:] == [4, 4]
+
+            monkeypatch.setitem(app.config, 'READ_CACHE_MAX_ENTRIES', 0)
+            ReadCache.get_or_load('test', 3, lambda: load(3))
+            assert loads[-1] == 3
+            assert not ReadCache.get_stats()['enabled']
+
+
+    def test_shared_backend(self, app, db_session, sample_book, monkeypatch):
+        """Тест общего кеша в Redis: значения хранятся в JSON"""
+        class FakeRedis:
+            def __init__(self):
+                self.data = {}
+
+            def get(self, key):
+                return self.data.get(key)
+
+            def set(self, key, value, ex=None):
+                self.data[key] = value
+
+            def incr(self, key):
+                self.data[key] = int(self.data.get(key) or 0) + 1
+
+        url = 'redis://cache.test/0'
+        client = FakeRedis()
+        monkeypatch.setattr('services.read_cache.redis', Mock(RedisError=Exception))
+        monkeypatch.setitem(app.config, 'READ_CACHE_REDIS_URL', url)
+        monkeypatch.setitem(ReadCache._redis_clients, url, client)
+        book_id = sample_book.id
+
+        assert BookService.get_book(book_id).name == 'Test Book'
+        key = ReadCache._make_key('get_book', book_id, 0)
+        assert json.loads(client.data[key])['name'] == 'Test Book'
+
+        # Другой процесс: пустой локальный кеш, значение из Redis
+        ReadCache.clear()
+        db_session.session.expunge_all()
+        book = BookService.get_book(book_id)
+        assert book.name == 'Test Book'
+        assert book.created_at == sample_book.created_at
+        assert ReadCache.get_stats()['namespaces']['get_book']['hits'] == 1
+
+        # Запись в одном процессе сбрасывает кеш во всех
+        BookService.update_book_characteristics(book_id, {'Предмет': 'Физика'})
+        assert client.data[f'{ReadCache.KEY_PREFIX}:generation'] == 1
+
+        # Значение не в JSON (например, pickle) считается промахом и не исполняется
+        ReadCache.clear()
+        key = ReadCache._make_key('book_exists', sample_book.url, 1)
+        client.data[key] = b'\x80\x04\x95'
+        assert BookService.book_exists(sample_book.url) is True
+        assert client.data[key] == b'true'
+
+
+class TestStatsService:
+    """Тесты для StatsService"""
+
+    def test_materialized_stats(self, db_session, book_factory):
+        """Тест: статистика обновляется триггерами и совпадает с подсчетом по books"""
+        books = book_factory(3, subject='Математика', publisher='Просвещение')
+        book_factory(2, subject='Физика', class_from=7)
+        book_factory(1, subject=None)
+
+        stats = StatsService.get_stats()
+        assert stats['total_books'] == 6
+        assert stats['columns']['subject'] == {
+            'count': 5, 'nulls': 1, 'distinct': 2,
+            'top': [{'value': 'Математика', 'count': 3}, {'value': 'Физика', 'count': 2}],
+        }
+        assert stats['columns']['class']['top'][0] == {'value': 5, 'count': 4}
+        assert stats['columns']['publisher']['nulls'] == 3
+
+        BookService.delete_book(books[0].id)
+        books[1].subject = 'Физика'
+        db_session.session.commit()
+
+        stats = StatsService.get_stats(top=1)
+        assert stats['columns']['subject']['top'] == [{'value': 'Физика', 'count': 3}]
+        assert stats['columns']['subject']['distinct'] == 2
+        assert stats == StatsService._compute(1)
+
+        StatsService.rebuild()
+        assert StatsService.get_stats(top=1) == stats
+
+
+class TestSearchService:
+    """Тесты для SearchService"""
+
+    def test_build_match_query(self):
+        """Тест стемминга и экранирования запроса"""
+        assert SearchService.stem('Учебники') == 'учебник'
+        assert SearchService.stem('математике') == 'математик'
+        assert SearchService.stem('мир') == 'мир'
+        assert SearchService.build_match_query('учебники "NEAR(" физики') == '"учебник"* "near"* "физик"*'
+        assert SearchService.build_match_query(' !? ') is None
+
+    def test_search_ranking_and_snippet(self, db_session, book_factory):
+        """Тест поиска с учетом словоформ, ранжирования и подсветки"""
+        in_name = book_factory(1, name='Физика. Учебник для 7 класса')[0]
+        in_description = book_factory(1, name='Сборник задач', description='Задачи по физике <b>и</b> химии')[0]
+        book_factory(1, name='Математика')
+
+        results = SearchService.search('физика')['results']
+        assert [result['book'].id for result in results] == [in_name.id, in_description.id]
+        assert '<mark>Физика</mark>' in results[0]['snippet']
+        assert '&lt;b&gt;' in results[1]['snippet']
+
+        # Индекс следует за изменениями книг
+        BookService.delete_book(in_name.id)
+        in_description.name = 'Физика в задачах'
+        db_session.session.commit()
+        results = SearchService.search('физ')['results']
+        assert [result['book'].id for result in results] == [in_description.id]
+
+    def test_search_cursor(self, db_session, book_factory):
+        """Тест постраничного поиска по курсору"""
+        books = book_factory(5, name='Физика')
+        book_factory(1, name='Физика', description='Физика для физиков')
+
+        found = []
+        cursor = None
+        while True:
+            page = SearchService.search('физика', limit=2, cursor=cursor)
+            found.extend(result['book'].id for result in page['results'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        assert len(found) == 6 and len(set(found)) == 6
+        assert set(book.id for book in books) < set(found)
+        with pytest.raises(InvalidCursorError):
+            SearchService.search('физика', cursor='broken')
+
+    def test_filters_use_index(self, db_session, book_factory):
+        """Тест: фильтр q главной страницы использует полнотекстовый индекс"""
+        book_factory(2, description='Учебники по информатике')
+        book_factory(1)
+
+        assert len(BookService.build_filters_query({'q': 'учебник информатика'}).all()) == 2
+
+
+class TestImageService:
+    def test_detect_image_type(self):
+        """Тест определения формата по сигнатуре"""
+        assert ImageService.detect_image_type(b'\xff\xd8\xff\xe0' + b'\x00' * 8) == 'jpeg'
+        assert ImageService.detect_image_type(PNG_HEADER) == 'png'
+        assert ImageService.detect_image_type(b'RIFF\x00\x00\x00\x00WEBP') == 'webp'
+        assert ImageService.detect_image_type(b'<html></html>') is None
+
+    def test_save_image_stream(self, sample_book):
+        """Тест потоковой записи изображения блоками"""
+        image_data = PNG_HEADER + b'x' * 100_000
+        chunks = (image_data[i:i + 4096] for i in range(0, len(image_data), 4096))
+
+        assert ImageService.save_image_stream(sample_book.id, chunks) is True
+
+        book = BookService.get_book(sample_book.id)
+        assert book.image_data == image_data
+        assert book.image_type == 'png'
+        assert book.image_hash == hashlib.sha256(image_data).hexdigest()
+
+    def test_save_image_stream_too_large(self, sample_book):
+        """Тест ограничения размера изображения"""
+        chunks = iter([PNG_HEADER, b'x' * 100])
+
+        with pytest.raises(ImageTooLargeError):
+            ImageService.save_image_stream(sample_book.id, chunks, max_size=64)
+
+    def test_save_image_stream_unsupported_type(self, sample_book):
+        """Тест отклонения данных, не являющихся изображением"""
+        with pytest.raises(ImageUploadError):
+            ImageService.save_image_stream(sample_book.id, iter([b'<html><body></body></html>']))
+
+    def test_iter_base64(self):
+        """Тест поблочного декодирования base64"""
+        image_data = PNG_HEADER + bytes(range(256)) * 10
+        encoded = base64.b64encode(image_data).decode('ascii')
+
+        assert b''.join(ImageService.iter_base64(encoded, chunk_size=100)) == image_data
+
+    def test_save_image_stream_transcode(self, app, sample_book):
+        """Тест перекодирования обложки в WebP с сохранением оригинала"""
+        Image = pytest.importorskip('PIL.Image')
+        buffer = io.BytesIO()
+        Image.effect_noise((64, 64), 20).convert('RGB').save(buffer, format='PNG')
+        image_data = buffer.getvalue()
+
+        app.config.update(IMAGE_TRANSCODE_FORMAT='webp', IMAGE_KEEP_ORIGINAL=True)
+        try:
+            ImageService.save_image_stream(sample_book.id, iter([image_data]))
+            book = BookService.get_book(sample_book.id)
+            assert book.image_data == image_data
+            assert book.image_compact_type == 'webp'
+            assert ImageService.detect_image_type(book.image_compact_data) == 'webp'
+            assert ImageService.select_rendition(book, [('image/webp', 1)])[1] == 'webp'
+            assert ImageService.select_rendition(book, [('*/*', 1)])[1] == 'png'
+
+            app.config['IMAGE_KEEP_ORIGINAL'] = False
+            ImageService.save_image_stream(sample_book.id, iter([image_data]))
+            book = BookService.get_book(sample_book.id)
+            assert book.image_type == 'webp'
+            assert book.image_compact_data is None
+        finally:
+            app.config.update(IMAGE_TRANSCODE_FORMAT='', IMAGE_KEEP_ORIGINAL=True)
+
+
+@pytest.mark.skipif(not OrjsonProvider.is_available(), reason='orjson не установлен')
+class TestOrjsonProvider:
+    """Тесты JSON провайдера на orjson"""
+
+    def test_matches_default_provider(self, app):
+        """Тест совпадения результата со стандартным провайдером"""
+        provider = OrjsonProvider(app)
+        data = {'name': 'Книга', 'b': [1, 2.5, None], 'a': datetime(2024, 1, 2, 3, 4, 5)}
+
+        assert json.loads(provider.dumps(data)) == json.loads(DefaultJSONProvider(app).dumps(data))
+        assert provider.loads(provider.dumps({'name': 'Книга'})) == {'name': 'Книга'}
+
+        response = provider.response(items=[{'id': 1}])
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.get_data()) == {'items': [{'id': 1}]}
+
+        with pytest.raises(TypeError):
+            provider.dumps({'value': object()})